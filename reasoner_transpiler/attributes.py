@@ -1,8 +1,15 @@
 import json
 import os
+from collections import ChainMap
 from pathlib import Path
+from types import MappingProxyType
+from typing import Optional
+from weakref import WeakKeyDictionary
 
-from .biolink import bmt, is_biolink_slot, is_biolink_class, get_slot_uri, get_class_uri
+from .biolink import BiolinkModel, get_biolink_model
+from .degree import DEGREE_PROPERTY
+from .shared_tables import SharedTable
+from .subclass_closure import DESCENDANT_COUNTS_PROPERTY, DESCENDANTS_PROPERTY
 
 DIR_PATH = Path(__file__).parent
 
@@ -20,11 +27,36 @@ DEFAULT_ATTRIBUTE_TYPE = {
 
 ATTRIBUTE_SKIP_LIST = []
 
+# node properties stored on the graph only for querying, never returned as attributes, see subclass_closure.py and
+# degree.py
+QUERY_NODE_PROPERTIES = [DESCENDANTS_PROPERTY, DESCENDANT_COUNTS_PROPERTY, DEGREE_PROPERTY]
+
 PRIMARY_KNOWLEDGE_SOURCE = "primary_knowledge_source"
 AGGREGATOR_KNOWLEDGE_SOURCE = "aggregator_knowledge_source"
 
 PROVENANCE_TAG = os.environ.get('PROVENANCE_TAG', 'reasoner-transpiler')
 
+# biolink model -> immutable registry of attribute types - see get_attribute_types()
+_ATTRIBUTE_TYPE_REGISTRIES = WeakKeyDictionary()
+
+
+def get_attribute_types(biolink_version: Optional[str] = None, biolink_model: Optional[BiolinkModel] = None):
+    """Get the attribute types for every element of a biolink model version, overridden by ATTRIBUTE_TYPES.
+
+    The registry is built once per biolink model and custom attribute types setting, and can't be modified,
+    so it is safe to share between concurrent requests. Pass the biolink_model if it was already looked up.
+    """
+    biolink = biolink_model or get_biolink_model(biolink_version)
+    registry = _ATTRIBUTE_TYPE_REGISTRIES.get(biolink)
+    if registry is None:
+        if isinstance(biolink.attribute_types, SharedTable):
+            # chained rather than merged, so the shared biolink tables are not copied into every process
+            registry = MappingProxyType(ChainMap(dict(ATTRIBUTE_TYPES), biolink.attribute_types))
+        else:
+            registry = MappingProxyType({**biolink.attribute_types, **ATTRIBUTE_TYPES})
+        _ATTRIBUTE_TYPE_REGISTRIES[biolink] = registry
+    return registry
+
 
 # This function takes EDGE_SOURCE_PROPS properties from results, converts them into proper
 # TRAPI dictionaries, and assigns the proper upstream ids to each resource. It does not currently attempt to avoid
@@ -64,13 +96,18 @@ def construct_sources_tree(primary_knowledge_source, aggregator_knowledge_source
     return formatted_sources
 
 
-def transform_attributes(result_entity, node=False):
+def transform_attributes(result_entity, node=False, biolink_version=None, biolink_model=None):
 
     # construct a valid TRAPI entity to return in trapi_entity
     trapi_entity = {}
+    # transforming many entities, look the model up once and pass it as biolink_model
+    biolink = biolink_model or get_biolink_model(biolink_version)
 
     for attribute in ATTRIBUTE_SKIP_LIST:
         result_entity.pop(attribute, None)
+    if node:
+        for attribute in QUERY_NODE_PROPERTIES:
+            result_entity.pop(attribute, None)
 
     # an "attributes" attribute in neo4j should be a list of json strings,
     # attempt to start the attributes section of transformed attributes with its contents,
@@ -104,44 +141,19 @@ def transform_attributes(result_entity, node=False):
         trapi_entity["sources"] = construct_sources_tree(primary_knowledge_source, aggregator_knowledge_sources)
 
         # find and format attributes that are qualifiers
-        qualifiers = [key for key in result_entity if bmt.is_qualifier(key)]
+        qualifiers = [key for key in result_entity if key in biolink.qualifiers]
         if qualifiers:
             trapi_entity["qualifiers"] = [{"qualifier_type_id": f"biolink:{qualifier}",
                                           "qualifier_value": result_entity.pop(qualifier)}
                                           for qualifier in qualifiers]
 
-    # for attributes that aren't in ATTRIBUTE_TYPES, see if they are valid biolink attributes
-    # TODO this is still inefficient - we should really map all the possible attributes on start up
-    for attribute in result_entity:
-        if attribute not in ATTRIBUTE_TYPES:
-            bmt_element = bmt.get_element(attribute)
-            if not bmt_element:
-                ATTRIBUTE_TYPES[attribute] = DEFAULT_ATTRIBUTE_TYPE
-            else:
-                # This looks in the biolink model for the slot_uri or class_uri depending on if the element
-                # is a slot or a class and attempts to populate the attribute_type_id and value_type_id with something
-                # useful. Technically classes probably shouldn't be included as attribute_type_id but examples exist
-                # and it seems better than having a default value that also isn't compliant.
-                attribute_type_id = f'biolink:{attribute}'
-                value_type_id = None
-                if is_biolink_slot(bmt_element):
-                    bl_slot_uri = get_slot_uri(bmt_element)
-                    value_type_id = bl_slot_uri if bl_slot_uri != attribute_type_id else None
-                elif is_biolink_class(bmt_element):
-                    attribute_type_id = get_class_uri(bmt_element)
-                attribute_mapping = {
-                    'attribute_type_id': attribute_type_id,
-                    **({'value_type_id': value_type_id} if value_type_id else {})
-                }
-                # add it to ATTRIBUTE_TYPES, so we don't need to check biolink again
-                ATTRIBUTE_TYPES[attribute] = attribute_mapping
-
     # format the rest of the attributes, look up their attribute type and value type
+    attribute_types = get_attribute_types(biolink_model=biolink)
     trapi_attributes.extend([
         {'original_attribute_name': key,
          'value': value,
-         # ATTRIBUTE_TYPES is a mapping for things like attribute_type_id, value_type_id or other TRAPI fields
-         **ATTRIBUTE_TYPES.get(key)}
+         # attribute_types is a mapping for things like attribute_type_id, value_type_id or other TRAPI fields
+         **attribute_types.get(key, DEFAULT_ATTRIBUTE_TYPE)}
         for key, value in result_entity.items()
     ])
     if trapi_attributes:
@@ -152,6 +164,7 @@ def transform_attributes(result_entity, node=False):
 def set_custom_attribute_types(attribute_types: dict):
     global ATTRIBUTE_TYPES
     ATTRIBUTE_TYPES = attribute_types
+    _ATTRIBUTE_TYPE_REGISTRIES.clear()
 
 
 def set_custom_attribute_skip_list(skip_list: list):
@@ -162,4 +175,5 @@ def set_custom_attribute_skip_list(skip_list: list):
 def reset_custom_attribute_types():
     global ATTRIBUTE_TYPES
     ATTRIBUTE_TYPES = get_attribute_types_from_config()
+    _ATTRIBUTE_TYPE_REGISTRIES.clear()
 
@@ -1,19 +1,362 @@
+import hashlib
+import logging
 import os
-from bmt import Toolkit
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from types import MappingProxyType
+from typing import NamedTuple, Optional, Tuple
 
-from bmt.toolkit import ClassDefinition
-from bmt.toolkit import SlotDefinition
+from .biolink_snapshot import build_snapshot_from_toolkit, get_schema_url, get_predicate_map_url, \
+    get_snapshot_path, read_snapshot
+from .shared_tables import SharedTable, open_shared_tables, write_shared_tables
+from .util import snake_case
+
+LOGGER = logging.getLogger(__name__)
 
 BIOLINK_MODEL_VERSION = os.environ.get('BL_VERSION', '4.2.6-rc5')
-BIOLINK_MODEL_SCHEMA_URL = f"https://raw.githubusercontent.com/biolink/biolink-model/v{BIOLINK_MODEL_VERSION}/biolink-model.yaml"
-PREDICATE_MAP_URL = f"https://raw.githubusercontent.com/biolink/biolink-model/v{BIOLINK_MODEL_VERSION}/predicate_mapping.yaml"
+BIOLINK_MODEL_SCHEMA_URL = get_schema_url(BIOLINK_MODEL_VERSION)
+PREDICATE_MAP_URL = get_predicate_map_url(BIOLINK_MODEL_VERSION)
+
+# Keep the biolink model tables in a memory-mapped file shared by every process on the host,
+# instead of in python objects owned by each process.
+SHARED_TABLES = os.environ.get('BL_SHARED_TABLES', '').lower() in ('1', 'true', 'yes')
+SHARED_TABLES_DIR = Path(os.environ.get('BL_SHARED_TABLES_DIR',
+                                        Path(tempfile.gettempdir()) / "reasoner_transpiler"))
+# bump when build_biolink_tables() changes, so stale shared tables files are not reused
+TABLES_FORMAT_VERSION = 1
+
+
+def _normalize_name(name: str):
+    """Normalize an element name so that "biolink:gene_product", "GeneProduct" and "gene product" are equal."""
+    return name.removeprefix("biolink:").lower().replace(" ", "").replace("_", "")
+
+
+def get_attribute_type(attribute: str, element: dict):
+    """Get the TRAPI attribute_type_id and value_type_id for a graph property named after a biolink element."""
+    # This looks in the biolink model for the slot_uri or class_uri depending on if the element
+    # is a slot or a class and attempts to populate the attribute_type_id and value_type_id with something
+    # useful. Technically classes probably shouldn't be included as attribute_type_id but examples exist
+    # and it seems better than having a default value that also isn't compliant.
+    attribute_type_id = f'biolink:{attribute}'
+    value_type_id = None
+    if is_biolink_slot(element):
+        bl_slot_uri = get_slot_uri(element)
+        value_type_id = bl_slot_uri if bl_slot_uri != attribute_type_id else None
+    elif is_biolink_class(element):
+        attribute_type_id = get_class_uri(element)
+    return {
+        'attribute_type_id': attribute_type_id,
+        **({'value_type_id': value_type_id} if value_type_id else {})
+    }
+
+
+class PredicateExpansion(NamedTuple):
+    """The predicates a query predicate expands to in cypher."""
+    # canonical and/or symmetric descendants of the predicate
+    predicates: Tuple[str, ...]
+    # canonical and/or symmetric descendants of its inverse, and of the predicate itself if it is symmetric
+    inverse_predicates: Tuple[str, ...]
+    symmetric: bool
+
+
+def build_predicate_expansions(predicates, predicates_in_graph: frozenset) -> dict:
+    """Build a table of predicate CURIE -> PredicateExpansion for every predicate.
+
+    Only predicates in predicates_in_graph (space case names) are included in expansions, unless it is empty.
+    """
+    def expand(predicate_name):
+        return tuple(
+            f"biolink:{snake_case(descendant)}"
+            for descendant in predicates[predicate_name]["descendants"]
+            if ((not predicates_in_graph) or descendant in predicates_in_graph) and
+            (predicates[descendant]["canonical"] or predicates[descendant]["symmetric"])
+        )
+
+    expansions = {}
+    for predicate_name, predicate in predicates.items():
+        inverse_predicates = ()
+        if predicate["inverse"] is not None:
+            inverse_predicates += expand(predicate["inverse"])
+        # if symmetric add to inverse list so we query in both directions
+        if predicate["symmetric"]:
+            inverse_predicates += expand(predicate_name)
+        expansions[f"biolink:{snake_case(predicate_name)}"] = PredicateExpansion(
+            predicates=expand(predicate_name),
+            inverse_predicates=inverse_predicates,
+            symmetric=predicate["symmetric"],
+        )
+    return expansions
+
+
+def build_biolink_tables(snapshot: dict) -> dict:
+    """Derive the lookup tables used by BiolinkModel from a snapshot.
+
+    Every table is a mapping of str -> JSON-serializable value, so they can also be stored as shared tables.
+    """
+    elements = snapshot["elements"]
+    # Element lookups are as lenient as bmt.get_element: by name, alias, or any casing of either.
+    element_names = {_normalize_name(alias): element_name for alias, element_name in snapshot["aliases"].items()}
+    element_names.update({_normalize_name(element_name): element_name for element_name in elements})
+
+    # permissible value -> ((enum name, permissible value descendants), ...) for every enum with that value
+    qualifier_values = {}
+    for enum_name, permissible_values in snapshot["enums"].items():
+        for permissible_value, descendants in permissible_values.items():
+            qualifier_values.setdefault(permissible_value, []).append((enum_name, tuple(descendants)))
+
+    # TRAPI attribute types for graph properties named after biolink elements, by snake_case name or alias
+    attribute_elements = {}
+    for alias, element_name in snapshot["aliases"].items():
+        attribute_elements[snake_case(alias)] = elements[element_name]
+    for element_name, element in elements.items():
+        attribute_elements[snake_case(element_name)] = element
+
+    return {
+        "metadata": {"biolink_version": snapshot["biolink_version"]},
+        "predicates": snapshot["predicates"],
+        "predicate_expansions": build_predicate_expansions(snapshot["predicates"], frozenset()),
+        "qualifiers": {qualifier: True for qualifier in snapshot["qualifiers"]},
+        "enums": snapshot["enums"],
+        "qualifier_values": {permissible_value: tuple(enum_descendants)
+                             for permissible_value, enum_descendants in qualifier_values.items()},
+        "elements": elements,
+        "element_names": element_names,
+        "attribute_types": {attribute: get_attribute_type(attribute, element)
+                            for attribute, element in attribute_elements.items()},
+    }
+
+
+# shared tables hold JSON values, these restore the python types of the dict tables
+_SHARED_TABLE_VALUE_FACTORIES = {
+    "predicate_expansions": lambda value: PredicateExpansion(tuple(value[0]), tuple(value[1]), value[2]),
+    "qualifier_values": lambda value: tuple((enum_name, tuple(descendants)) for enum_name, descendants in value),
+    "attribute_types": MappingProxyType,
+}
+# shared tables looked up for every result, which keep their decoded values in each process
+_SHARED_TABLES_CACHED = ("attribute_types",)
+
+
+class BiolinkModel:
+    """Read-only view of the parts of the Biolink model used by the transpiler.
+
+    Backed by the tables from build_biolink_tables(), either as python dicts or as memory-mapped shared tables.
+    """
+
+    def __init__(self, tables: dict):
+        """Initialize."""
+        if not isinstance(tables["attribute_types"], SharedTable):
+            tables = {table_name: MappingProxyType(table) for table_name, table in tables.items()}
+            tables["attribute_types"] = MappingProxyType({
+                attribute: MappingProxyType(attribute_type)
+                for attribute, attribute_type in tables["attribute_types"].items()
+            })
+        self.version = tables["metadata"]["biolink_version"]
+        self._predicates = tables["predicates"]
+        self._qualifiers = frozenset(tables["qualifiers"])
+        # qualifier slot names as they appear as edge property keys, e.g. "object_aspect_qualifier"
+        self.qualifiers = frozenset(snake_case(qualifier) for qualifier in self._qualifiers)
+        self._enums = tables["enums"]
+        self._elements = tables["elements"]
+        self._element_names = tables["element_names"]
+        self._qualifier_value_index = tables["qualifier_values"]
+        self.attribute_types = tables["attribute_types"]
+        # predicate expansion tables, keyed by the set of predicates in the graph
+        self._predicate_expansions = {frozenset(): tables["predicate_expansions"]}
+        self._predicate_expansions_lock = threading.Lock()
+
+    @property
+    def enums(self):
+        """Get the names of all enums."""
+        return self._enums.keys()
+
+    def get_predicate(self, name: str):
+        """Get a predicate by name, a dict with descendants, inverse, symmetric and canonical, or None."""
+        predicate = self._predicates.get(name)
+        if predicate is None:
+            predicate = self._predicates.get(self._element_names.get(_normalize_name(name)))
+        return predicate
+
+    def get_descendants(self, name: str):
+        """Get the names of a predicate and all of its descendants."""
+        predicate = self.get_predicate(name)
+        if predicate is None:
+            raise ValueError(f"{name} is not a valid biolink predicate")
+        return predicate["descendants"]
+
+    def get_predicate_expansions(self, predicates_in_graph: Optional[frozenset] = None):
+        """Get an immutable table of predicate CURIE -> PredicateExpansion.
+
+        Only predicates in predicates_in_graph (space case names) are included in expansions, unless it is empty.
+        The table is built once per set of predicates in the graph.
+        """
+        predicates_in_graph = frozenset(predicates_in_graph or ())
+        expansions = self._predicate_expansions.get(predicates_in_graph)
+        if expansions is None:
+            with self._predicate_expansions_lock:
+                expansions = self._predicate_expansions.get(predicates_in_graph)
+                if expansions is None:
+                    expansions = MappingProxyType(build_predicate_expansions(self._predicates,
+                                                                             predicates_in_graph))
+                    self._predicate_expansions[predicates_in_graph] = expansions
+        return expansions
+
+    def expand_predicate(self, predicate: str, predicates_in_graph: Optional[frozenset] = None):
+        """Get the PredicateExpansion for a predicate CURIE, or None if it is not a valid predicate."""
+        expansions = self.get_predicate_expansions(predicates_in_graph)
+        expansion = expansions.get(predicate)
+        if expansion is None:
+            # not the usual CURIE form of the predicate, fall back to a lenient name lookup
+            predicate_name = self._element_names.get(_normalize_name(predicate))
+            if predicate_name in self._predicates:
+                expansion = expansions[f"biolink:{snake_case(predicate_name)}"]
+        return expansion
+
+    def is_qualifier(self, name: str):
+        return name.removeprefix("biolink:").replace("_", " ") in self._qualifiers
+
+    def is_permissible_value_of_enum(self, enum_name: str, value):
+        return value in self._enums.get(enum_name, {})
+
+    def get_permissible_value_descendants(self, permissible_value, enum_name: str):
+        return self._enums[enum_name][permissible_value]
+
+    def get_qualifier_value_enums(self, qualifier_value):
+        """Get ((enum name, permissible value descendants), ...) for every enum with qualifier_value as a value."""
+        return self._qualifier_value_index.get(qualifier_value, ())
+
+    def get_element(self, name: str):
+        """Get an element by name or alias.
+
+        Returns a dict holding the element slot_uri or class_uri (empty for other elements), or None.
+        """
+        element_name = self._element_names.get(_normalize_name(name))
+        if element_name is None:
+            return None
+        return self._elements[element_name]
+
+
+def load_biolink_snapshot(biolink_version: str = BIOLINK_MODEL_VERSION, snapshot_dir=None) -> dict:
+    """Load the Biolink model snapshot, falling back to building it with the bmt Toolkit."""
+    snapshot_path = get_snapshot_path(biolink_version, snapshot_dir)
+    if snapshot_path.exists():
+        return read_snapshot(snapshot_path)
+    LOGGER.warning("No biolink snapshot found at %s, building one from the biolink model toolkit..", snapshot_path)
+    return build_snapshot_from_toolkit(biolink_version)
+
+
+def get_shared_tables_path(biolink_version: str = BIOLINK_MODEL_VERSION, snapshot_dir=None,
+                           shared_tables_dir=None) -> Path:
+    """Get the path of the shared tables file for a Biolink model version and its snapshot."""
+    snapshot_path = get_snapshot_path(biolink_version, snapshot_dir)
+    snapshot_digest = hashlib.sha1(snapshot_path.read_bytes()).hexdigest()[:16] \
+        if snapshot_path.exists() else "toolkit"
+    return Path(shared_tables_dir or SHARED_TABLES_DIR) / \
+        f"biolink_tables_{TABLES_FORMAT_VERSION}_{biolink_version}_{snapshot_digest}.bin"
+
+
+def load_biolink_model(biolink_version: str = BIOLINK_MODEL_VERSION, snapshot_dir=None,
+                       shared_tables: Optional[bool] = None, shared_tables_dir=None) -> BiolinkModel:
+    """Load the Biolink model.
+
+    With shared_tables (defaults to the BL_SHARED_TABLES environment variable) the tables are written once to a
+    file in shared_tables_dir and memory-mapped, so every worker process on the host shares one copy of them.
+    """
+    if shared_tables is None:
+        shared_tables = SHARED_TABLES
+    if not shared_tables:
+        return BiolinkModel(build_biolink_tables(load_biolink_snapshot(biolink_version, snapshot_dir)))
+    tables_path = get_shared_tables_path(biolink_version, snapshot_dir, shared_tables_dir)
+    if not tables_path.exists():
+        write_shared_tables(tables_path, build_biolink_tables(load_biolink_snapshot(biolink_version, snapshot_dir)))
+    return BiolinkModel(open_shared_tables(tables_path, _SHARED_TABLE_VALUE_FACTORIES, _SHARED_TABLES_CACHED))
+
+
+# Biolink models are loaded on first use, so that importing the transpiler stays cheap. Several versions can be
+# loaded at once, the least recently used ones are evicted when there are more than BIOLINK_MODEL_CACHE_SIZE.
+BIOLINK_MODEL_CACHE_SIZE = int(os.environ.get('BL_MODEL_CACHE_SIZE', 4))
+_BIOLINK_MODELS = OrderedDict()
+_BIOLINK_MODELS_LOCK = threading.Lock()
+# a lock for each version being loaded, so that loading one version doesn't block getting the others
+_BIOLINK_MODEL_LOAD_LOCKS = {}
+
+
+def set_biolink_model_cache_size(cache_size: int):
+    global BIOLINK_MODEL_CACHE_SIZE
+    BIOLINK_MODEL_CACHE_SIZE = cache_size
+
+
+def reset_biolink_model_cache_size():
+    global BIOLINK_MODEL_CACHE_SIZE
+    BIOLINK_MODEL_CACHE_SIZE = int(os.environ.get('BL_MODEL_CACHE_SIZE', 4))
+
+
+def _evict_biolink_models():
+    """Evict the least recently used biolink models, if there are too many, locking only then."""
+    if len(_BIOLINK_MODELS) > max(BIOLINK_MODEL_CACHE_SIZE, 1):
+        with _BIOLINK_MODELS_LOCK:
+            while len(_BIOLINK_MODELS) > max(BIOLINK_MODEL_CACHE_SIZE, 1):
+                _BIOLINK_MODELS.popitem(last=False)
+
+
+def _get_loaded_biolink_model(biolink_version: str) -> Optional[BiolinkModel]:
+    """Get a loaded biolink model without locking, None if it isn't loaded."""
+    biolink_model = _BIOLINK_MODELS.get(biolink_version)
+    if biolink_model is not None:
+        try:
+            # atomic under the GIL, like get()
+            _BIOLINK_MODELS.move_to_end(biolink_version)
+        except KeyError:
+            # evicted in the meantime, the model can still be used
+            pass
+        _evict_biolink_models()
+    return biolink_model
+
+
+def get_biolink_model(biolink_version: Optional[str] = None) -> BiolinkModel:
+    """Get the biolink model for a version (defaults to BL_VERSION), loading it on first use.
+
+    Getting a loaded model doesn't lock. Each version is loaded once, outside of the lock of the loaded models.
+    """
+    biolink_version = biolink_version or BIOLINK_MODEL_VERSION
+    biolink_model = _get_loaded_biolink_model(biolink_version)
+    if biolink_model is not None:
+        return biolink_model
+    with _BIOLINK_MODELS_LOCK:
+        load_lock = _BIOLINK_MODEL_LOAD_LOCKS.setdefault(biolink_version, threading.Lock())
+    with load_lock:
+        # another thread may have loaded it while this one waited
+        biolink_model = _get_loaded_biolink_model(biolink_version)
+        if biolink_model is not None:
+            return biolink_model
+        biolink_model = load_biolink_model(biolink_version)
+        with _BIOLINK_MODELS_LOCK:
+            _BIOLINK_MODELS[biolink_version] = biolink_model
+            _BIOLINK_MODEL_LOAD_LOCKS.pop(biolink_version, None)
+        _evict_biolink_models()
+    return biolink_model
+
+
+def get_loaded_biolink_versions():
+    """Get the versions of the loaded biolink models, from least to most recently used."""
+    with _BIOLINK_MODELS_LOCK:
+        return list(_BIOLINK_MODELS)
+
+
+def warm_up(*biolink_versions: str) -> BiolinkModel:
+    """Load biolink models now instead of on the first query, e.g. when a server starts.
 
-bmt = Toolkit(schema=BIOLINK_MODEL_SCHEMA_URL, predicate_map=PREDICATE_MAP_URL)
-ALL_BIOLINK_ENUMS = bmt.view.all_enums().keys()
+    Loads the BL_VERSION model if no versions are given, returns the last model loaded.
+    """
+    biolink_model = None
+    for biolink_version in biolink_versions or (BIOLINK_MODEL_VERSION,):
+        biolink_model = get_biolink_model(biolink_version)
+    return biolink_model
 
 
 def is_biolink_slot(obj):
-    return isinstance(obj, SlotDefinition)
+    return "slot_uri" in obj
 
 
 def get_slot_uri(obj):
@@ -21,7 +364,7 @@ def get_slot_uri(obj):
 
 
 def is_biolink_class(obj):
-    return isinstance(obj, ClassDefinition)
+    return "class_uri" in obj
 
 
 def get_class_uri(obj):
@@ -0,0 +1,135 @@
+"""Build and read precomputed Biolink model snapshots.
+
+A snapshot is a small gzipped JSON document holding everything the transpiler needs from the Biolink model
+(predicates, descendants, inverses, symmetric/canonical flags, qualifiers, enum permissible value trees and
+slot/class URIs), so that it can be loaded without building a bmt Toolkit.
+
+Build one for a given Biolink model version with:
+
+    python -m reasoner_transpiler.biolink_snapshot 4.2.6-rc5
+"""
+import gzip
+import json
+import os
+from pathlib import Path
+
+SNAPSHOT_FORMAT_VERSION = 1
+# snapshots shipped with the package, built by setup.py
+PACKAGE_SNAPSHOT_DIR = Path(__file__).parent / "biolink_snapshots"
+SNAPSHOT_DIR = Path(os.environ.get('BL_SNAPSHOT_DIR', PACKAGE_SNAPSHOT_DIR))
+
+
+def get_schema_url(biolink_version: str):
+    return f"https://raw.githubusercontent.com/biolink/biolink-model/v{biolink_version}/biolink-model.yaml"
+
+
+def get_predicate_map_url(biolink_version: str):
+    return f"https://raw.githubusercontent.com/biolink/biolink-model/v{biolink_version}/predicate_mapping.yaml"
+
+
+def get_snapshot_path(biolink_version: str, snapshot_dir=None) -> Path:
+    """Get the path of the snapshot file for a Biolink model version."""
+    return Path(snapshot_dir or SNAPSHOT_DIR) / f"biolink_model_{biolink_version}.json.gz"
+
+
+def build_snapshot(toolkit, biolink_version: str) -> dict:
+    """Extract the parts of the Biolink model used by the transpiler from a bmt Toolkit."""
+    from bmt.toolkit import ClassDefinition, SlotDefinition
+
+    predicates = {}
+    for predicate in toolkit.get_descendants("related to"):
+        element = toolkit.get_element(predicate)
+        predicates[predicate] = {
+            "descendants": toolkit.get_descendants(predicate),
+            "inverse": element.inverse,
+            "symmetric": bool(element.symmetric),
+            "canonical": bool(element.annotations.get("canonical_predicate", False)),
+        }
+
+    qualifiers = sorted(slot for slot in toolkit.view.all_slots() if toolkit.is_qualifier(slot))
+
+    enums = {
+        enum_name: {
+            permissible_value: toolkit.get_permissible_value_descendants(permissible_value=permissible_value,
+                                                                         enum_name=enum_name)
+            for permissible_value in enum_definition.permissible_values
+        }
+        for enum_name, enum_definition in toolkit.view.all_enums().items()
+    }
+
+    # slot_uri/class_uri for every element, used to assign attribute type ids to graph properties
+    elements = {}
+    for element_name in toolkit.view.all_elements():
+        element = toolkit.get_element(element_name)
+        if isinstance(element, SlotDefinition):
+            elements[element_name] = {"slot_uri": str(element.slot_uri)}
+        elif isinstance(element, ClassDefinition):
+            elements[element_name] = {"class_uri": str(element.class_uri)}
+        else:
+            elements[element_name] = {}
+
+    aliases = {
+        alias: element_name
+        for element_name, element_aliases in toolkit.view.all_aliases().items()
+        for alias in element_aliases
+    }
+
+    return {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "biolink_version": biolink_version,
+        "predicates": predicates,
+        "qualifiers": qualifiers,
+        "enums": enums,
+        "elements": elements,
+        "aliases": aliases,
+    }
+
+
+def build_snapshot_from_toolkit(biolink_version: str, schema=None, predicate_map=None) -> dict:
+    """Build a snapshot by loading the Biolink model with a bmt Toolkit."""
+    from bmt import Toolkit
+    toolkit = Toolkit(schema=schema or get_schema_url(biolink_version),
+                      predicate_map=predicate_map or get_predicate_map_url(biolink_version))
+    return build_snapshot(toolkit, biolink_version)
+
+
+def write_snapshot(snapshot: dict, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(path, "wt", encoding="utf-8") as stream:
+        json.dump(snapshot, stream, separators=(",", ":"), sort_keys=True)
+
+
+def read_snapshot(path) -> dict:
+    with gzip.open(path, "rt", encoding="utf-8") as stream:
+        snapshot = json.load(stream)
+    if snapshot.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported biolink snapshot format in {path}: {snapshot.get('format_version')}")
+    return snapshot
+
+
+def main(args=None):
+    import argparse
+    from .biolink import BIOLINK_MODEL_VERSION
+    parser = argparse.ArgumentParser(description="Build a precomputed Biolink model snapshot.")
+    parser.add_argument("biolink_version", nargs="?", default=BIOLINK_MODEL_VERSION,
+                        help="Biolink model version, defaults to the BL_VERSION environment variable")
+    parser.add_argument("--output", help="output file, defaults to the package biolink_snapshots directory")
+    parser.add_argument("--schema", help="biolink-model.yaml path or url, defaults to the released version")
+    parser.add_argument("--predicate-map", help="predicate_mapping.yaml url, defaults to the released version")
+    parser.add_argument("--skip-existing", action="store_true", help="don't rebuild the snapshot if it exists")
+    args = parser.parse_args(args)
+
+    output = args.output or get_snapshot_path(args.biolink_version)
+    if args.skip_existing and Path(output).exists():
+        print(f"Biolink {args.biolink_version} snapshot {output} exists")
+        return
+    snapshot = build_snapshot_from_toolkit(args.biolink_version,
+                                           schema=args.schema,
+                                           predicate_map=args.predicate_map)
+    write_snapshot(snapshot, output)
+    print(f"Wrote biolink {args.biolink_version} snapshot to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,19 @@
 import json
 
 from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple, Union
 
 from .attributes import transform_attributes, PROVENANCE_TAG
-from .matching import match_query
+from .biolink import get_biolink_model, warm_up
+from .cypher_ast import CallSubquery, Raw
+from .exceptions import UnsupportedError
+from .hints import as_hint_policy, get_query_prefix
+from .matching import cypher_value, get_capped_bindings, get_result_key_qnode_id, match_query, QueryParameters
+from .query_cache import get_query_fingerprint, QueryTemplate, QUERY_CACHE
+
+# cypher variables of batch queries, see compile_batch_query()
+BATCH_INDEX = "__batch_index"
+BATCH_PARAMETERS = "__batch"
 
 
 def nest_op(operator, *args):
@@ -25,22 +35,41 @@ def assemble_results(qnodes, qedges, **kwargs):
     else:
         raise ValueError(f"Unknown dialect {dialect}. Only neo4j and memgraph are supported.")
 
+    batch = kwargs.get("batch", False)
+    stream = kwargs.get("stream", False)
+    if batch and stream:
+        raise UnsupportedError('Streamed results are not supported for batch queries.')
     clauses = []
 
     for qnode in qnodes.values():
         if qnode.get("set_interpretation", "") == "MANY":
             raise NotImplementedError(f'This feature is currently not implemented: set_interpretation=MANY')
 
-    # TODO - implement pagination (SKIP and LIMIT)
-    #  right now SKIP and LIMIT are unsupported and this will throw NotImplementedError if they are requested
-    pagination(**kwargs)
+    clauses.extend(pagination(qnodes, qedges, **kwargs))
 
     nodes = [f"`{qnode_id}`.id" for qnode_id, qnode in qnodes.items()]
     edges = [f"{id_function}(`{qedge_id}`)" if not qedge.get('_subclass', False)
              #else f"[x in `{qedge_id}` | {id_function}(x)]"
+             # resolved subclass edges are not matched, transform_result gets them from the qgraph
+             else "[]" if qedge.get('_resolved', False)
              else (f" CASE WHEN size(`{qedge_id}`) = 1 THEN [{id_function}(head(`{qedge_id}`))] ELSE [] END ")
              for qedge_id, qedge in qedges.items()]
-    if nodes or edges:
+    if stream and (nodes or edges):
+        # return a row for each path instead of collecting them, shaped like the collected record so that rows can
+        # be transformed as they arrive, see transform_result_stream()
+        stream_nodes = ", ".join(f"`{qnode_id}`" for qnode_id in qnodes)
+        stream_edges = ", ".join([
+            f"[{id_function}(`{qedge_id}`), startNode(`{qedge_id}`).id, "
+            f"type(`{qedge_id}`), endNode(`{qedge_id}`).id, properties(`{qedge_id}`)]"
+            if not qedge.get('_subclass', False) else
+            f"CASE WHEN size(`{qedge_id}`) = 1 THEN [[{id_function}(head(`{qedge_id}`)), "
+            f"startNode(head(`{qedge_id}`)).id, type(head(`{qedge_id}`)), endNode(head(`{qedge_id}`)).id, "
+            f"properties(head(`{qedge_id}`))]] ELSE [] END" if not qedge.get('_resolved', False) else "[]"
+            for qedge_id, qedge in qedges.items()
+        ])
+        return_clause = f"RETURN [node IN [{stream_nodes}] WHERE node IS NOT NULL] AS nodes, " \
+                        f"[{stream_edges}] AS edges, [[{', '.join(nodes + edges)}]] AS paths"
+    elif nodes or edges:
         nodes_assemble = " + ".join([
             f"collect(`{qnode_id}`)"
             for qnode_id, qnode in qnodes.items()
@@ -56,10 +85,13 @@ def assemble_results(qnodes, qedges, **kwargs):
             f"collect( CASE WHEN size(`{qedge_id}`)= 1 THEN [ [{id_function}(head(`{qedge_id}`)), startNode(head(`{qedge_id}`)).id, "
             f"type(head(`{qedge_id}`)), endNode(head(`{qedge_id}`)).id, properties(head(`{qedge_id}`))]] ELSE [ ] END)"
             for qedge_id, qedge in qedges.items()
+            if not qedge.get('_resolved', False)
         ])
         if not edges_assemble:
             edges_assemble = '[]'
-        assemble_clause = f"WITH {nodes_assemble} AS raw_nodes, " \
+        # batch queries collect the results of each qgraph of the batch separately, see compile_batch_query()
+        group_by = f"{BATCH_INDEX}, " if batch else ""
+        assemble_clause = f"WITH {group_by}{nodes_assemble} AS raw_nodes, " \
                           f"{edges_assemble} AS raw_edges, collect(DISTINCT ["
         if nodes:
             assemble_clause += ', '.join(nodes)
@@ -71,7 +103,13 @@ def assemble_results(qnodes, qedges, **kwargs):
         assemble_clause += "CALL { WITH raw_nodes UNWIND raw_nodes AS node RETURN collect(DISTINCT node) AS nodes } "
         assemble_clause += "CALL { WITH raw_edges UNWIND raw_edges AS edge RETURN collect(DISTINCT edge) AS edges } "
         clauses.append(assemble_clause)
-        return_clause = "RETURN nodes, edges, paths"
+        if batch:
+            return_clause = f"RETURN collect({BATCH_INDEX}) AS batch_indexes, collect(nodes) AS nodes, " \
+                            "collect(edges) AS edges, collect(paths) AS paths"
+        else:
+            return_clause = "RETURN nodes, edges, paths"
+    elif batch:
+        return_clause = 'RETURN [] as batch_indexes, [] as nodes, [] as edges, [] as paths'
     else:
         return_clause = 'RETURN [] as nodes, [] as edges, [] as paths'
 
@@ -79,76 +117,216 @@ def assemble_results(qnodes, qedges, **kwargs):
     return clauses
 
 
-def pagination(skip=None, limit=None, **kwargs):
-    """Get pagination clauses."""
-    clauses = []
+def check_count_option(name, value):
+    if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+        raise ValueError(f"{name} must be a non-negative integer, not {value!r}.")
+
+
+def get_result_keys(qnodes):
+    """Get the node bindings of a result by qnode id, like ResultTransformer.add_paths.
+
+    See matching.get_result_key_qnode_id().
+    """
+    return {
+        qnode_id: f"`{get_result_key_qnode_id(qnode_id, qnodes)}`.id"
+        for qnode_id, qnode in qnodes.items()
+        if not qnode.get("_superclass", False)
+    }
+
+
+def group_results(qids, keys, prefix, batch=False):
+    """Get a WITH clause grouping the rows (paths) of each result, as {prefix}_rows with {prefix}_key0.. keys."""
+    group_by = f"{BATCH_INDEX}, " if batch else ""
+    return f"WITH {group_by}" + ", ".join(f"{key} AS {prefix}_key{index}" for index, key in enumerate(keys)) \
+        + ", collect([" + ", ".join(f"`{qid}`" for qid in qids) + f"]) AS {prefix}_rows"
+
+
+def ungroup_results(qids, prefix, batch=False):
+    """Get the clauses unwinding {prefix}_rows back to a row (path) for each result."""
+    carry = f"{BATCH_INDEX}, " if batch else ""
+    return [
+        f"UNWIND {prefix}_rows AS {prefix}_row",
+        f"WITH {carry}" + ", ".join(f"{prefix}_row[{index}] AS `{qid}`" for index, qid in enumerate(qids)),
+    ]
+
+
+def cap_results_per_node(query, max_results_per_node=None, order_results_by=None, parameters=None, batch=False,
+                         dialect=None, **kwargs):
+    """Get the clauses matching a query, keeping at most max_results_per_node results for each node bound to a pinned
+    qnode.
+
+    Hub nodes are capped instead of being dropped like with max_connectivity. The results kept are those with the
+    highest order_results_by property on the qedges of the pinned qnode, then the lowest node ids.
+
+    The nodes of pinned qnodes are bound first (see matching.get_capped_bindings), and the rest of the query is
+    matched in a CALL subquery for each of them, which collects, orders and limits the results of that one node. The
+    results of a node are capped for each node of the pinned qnodes bound before it.
+    """
+    if max_results_per_node is None:
+        return query.compile(dialect=dialect)
+    check_count_option("max_results_per_node", max_results_per_node)
+    qnodes = query.qgraph["nodes"]
+    qedges = query.qgraph["edges"]
+    keys = list(get_result_keys(qnodes).values())
+    bindings = get_capped_bindings(query.qgraph)
+    match_clauses = [clause.render(dialect) for clause in query.clauses.clauses]
+    clauses = match_clauses[len(bindings):]
+    max_results = cypher_value(max_results_per_node, parameters, ("max_results_per_node",))
+    order_property = None
+    if order_results_by is not None:
+        order_property = order_results_by.removeprefix("biolink:").replace("`", "``")
+    batch_imports = [BATCH_INDEX, BATCH_PARAMETERS] if batch else []
+    # from the innermost subquery out
+    for index in reversed(range(len(bindings))):
+        imports = [qid for binding in bindings[:index + 1] for qid in binding.qids]
+        qids = [qid for qid in [*qnodes, *qedges] if qid not in imports]
+        scores = []
+        if order_property is not None:
+            scores = [
+                f"max(`{qedge_id}`.`{order_property}`)"
+                for qedge_id, qedge in qedges.items()
+                if not qedge.get("_subclass", False) and bindings[index].qnode_id in (qedge["subject"], qedge["object"])
+            ]
+        clauses.append(
+            "WITH " + ", ".join(f"{key} AS __cap_key{key_index}" for key_index, key in enumerate(keys))
+            + ", collect([" + ", ".join(f"`{qid}`" for qid in qids) + "]) AS __cap_rows"
+            + "".join(f", {score} AS __cap_score{score_index}" for score_index, score in enumerate(scores))
+        )
+        clauses.append("ORDER BY " + ", ".join([
+            *(f"__cap_score{score_index} IS NULL, __cap_score{score_index} DESC" for score_index in range(len(scores))),
+            *(f"__cap_key{key_index}" for key_index in range(len(keys))),
+        ]) + f" LIMIT {max_results}")
+        clauses.append("UNWIND __cap_rows AS __cap_row")
+        clauses.append("RETURN " + ", ".join(
+            f"__cap_row[{row_index}] AS `{qid}`" for row_index, qid in enumerate(qids)
+        ))
+        clauses = [
+            match_clauses[index],
+            CallSubquery([
+                Raw("WITH " + ", ".join([*batch_imports, *(f"`{qid}`" for qid in imports)])),
+                *(Raw(clause) for clause in clauses),
+            ]).render(dialect),
+        ]
+    return clauses
+
+
+def pagination(qnodes, qedges, skip=None, limit=None, parameters=None, batch=False, **kwargs):
+    """Get pagination clauses.
+
+    Pages are made of results, not paths: paths are grouped by their node bindings, like transform_result does,
+    and the groups are ordered by the ids of their nodes, so that consecutive pages do not overlap.
+    """
+    if skip is None and limit is None:
+        return []
+    if batch:
+        raise UnsupportedError('SKIP and LIMIT are not supported for batch queries.')
+    check_count_option("skip", skip)
+    check_count_option("limit", limit)
+
+    keys = list(get_result_keys(qnodes).values())
+    qids = [*qnodes, *qedges]
+    if not keys:
+        return []
+    clauses = [
+        group_results(qids, keys, "__page"),
+        "ORDER BY " + ", ".join(f"__page_key{index}" for index in range(len(keys))),
+    ]
     if skip is not None:
-        raise NotImplementedError(f'SKIP is not currently implemented.')
-        # clauses.append(f"SKIP {skip}")
+        clauses.append(f"SKIP {cypher_value(skip, parameters, ('skip',))}")
     if limit is not None:
-        raise NotImplementedError(f'LIMIT is not currently implemented.')
-        # clauses.append(f"LIMIT {limit}")
+        clauses.append(f"LIMIT {cypher_value(limit, parameters, ('limit',))}")
+    clauses.extend(ungroup_results(qids, "__page"))
     return clauses
 
 
-def get_query(qgraph, **kwargs):
+def get_query(qgraph, parameterized=False, **kwargs):
     """Generate a Cypher query to extract the answer maps for a question.
 
-    Returns the query as a string.
+    Returns the query as a string. Pass biolink_version to use a Biolink model version other than BL_VERSION.
+    With parameterized=True, returns a (query, parameters) tuple instead, where the literal values from the qgraph
+    (ids, categories, constraints, qualifier values, max_connectivity) are bound as $parameters, so that queries
+    of the same shape have the same text and can reuse the database's cached query plan.
+
+    get_query adds superclass qnodes and subclass qedges to qgraph, which transform_result needs to bind results
+    to it. Use compile_query to leave the qgraph as it is.
     """
+    if "hint_policy" in kwargs:
+        # the same policy given as True, a dict or a HintPolicy compiles to the same query
+        kwargs["hint_policy"] = as_hint_policy(kwargs["hint_policy"])
+    if parameterized:
+        # queries of the same shape compile to the same parameterized query, reuse it when cached
+        fingerprint = None
+        if QUERY_CACHE.max_size > 0:
+            fingerprint = get_query_fingerprint(qgraph, kwargs)
+            template = QUERY_CACHE.get(fingerprint)
+            if template is not None:
+                return template.apply(qgraph, kwargs)
+        qnode_ids = list(qgraph["nodes"])
+        kwargs["parameters"] = QueryParameters(kwargs.get("parameter_prefix", "$"))
     # commented this out because now we rely on the altering the qgraph to transform results into TRAPI,
     # leaving as a reminder in case that breaks something
     # qgraph = copy.deepcopy(qgraph)
     clauses = []
     query = match_query(qgraph, **kwargs)
-    clauses.extend(query.compile())
+    clauses.extend(cap_results_per_node(query, **kwargs))
     where_clause = query.where_clause()
     if where_clause:
         if not clauses[-1].startswith("WITH"):
-            clauses.append(query.with_clause())
+            clauses.append(query.with_clause(dialect=kwargs.get("dialect")))
         clauses.append(where_clause)
 
     if not kwargs.pop("reasoner", True):
-        clauses.append(query.return_clause())
         # add SKIP and LIMIT sub-clauses
-        clauses.extend(pagination(**kwargs))
+        clauses.extend(pagination(query.qgraph["nodes"], query.qgraph["edges"], **kwargs))
+        clauses.append(query.return_clause(dialect=kwargs.get("dialect")))
     else:
         clauses.extend(assemble_results(
             query.qgraph["nodes"],
             query.qgraph["edges"],
             **kwargs,
         ))
-
+    prefix = get_query_prefix(query.qgraph, **kwargs)
+    if prefix:
+        clauses.insert(0, prefix)
+
+    if parameterized:
+        parameters = kwargs["parameters"]
+        if fingerprint is not None:
+            QUERY_CACHE.put(fingerprint, QueryTemplate(" ".join(clauses), parameters, qnode_ids, qgraph))
+        return " ".join(clauses), dict(parameters)
     return " ".join(clauses)
 
 
-def transform_result(cypher_record,
-                     qgraph: dict):
-
-    nodes, edges, paths = unpack_bolt_record(cypher_record)
-
-    # Construct the knowledge_graph["nodes"] section of the TRAPI response
-    kg_nodes = {}
-    for cypher_node in nodes:
-        # Convert the list of unique result nodes from cypher results to dictionaries
-        node = convert_bolt_node_to_dict(cypher_node)
-        # Convert nodes to TRAPI format
-        # id, name, and labels are removed before transform_attributes
-        node_id = node.pop('id')
-        kg_nodes[node_id] = {
-            'name': node.pop('name'),
-            'categories': sorted(node.pop('labels'))}
-        kg_nodes[node_id].update(**transform_attributes(node, node=True))
-
-    # Convert the list of unique edges from cypher results to dictionaries
-    # then convert them to TRAPI format, constructing the knowledge_graph["edges"] section of the TRAPI response.
-    # Also make a mapping of the neo4j element_id to the edge id to be used in the TRAPI edge bindings
-    # the edge id used in TRAPI is the 'id' property on the edge if there is one, otherwise assigned integers 0,1,2..
-    kg_edges, element_id_to_edge_id = transform_edges_list(edges)
-
-    results = {}  # results are grouped by unique sets of result node ids
-    aux_graphs = {}  # auxiliary_graphs
+def copy_qgraph(qgraph):
+    """Copy the parts of a qgraph that get_query changes, so that the caller's qgraph is left as it is."""
+    def copy_qgraph_element(element):
+        element = dict(element)
+        for constraints_key in ("constraints", "attribute_constraints"):
+            # convert_constraints removes the biolink: prefix from constraint ids
+            if isinstance(element.get(constraints_key), list):
+                element[constraints_key] = [dict(constraint) if isinstance(constraint, dict) else constraint
+                                            for constraint in element[constraints_key]]
+        return element
+
+    return {
+        **qgraph,
+        "nodes": {qnode_id: copy_qgraph_element(qnode) for qnode_id, qnode in qgraph["nodes"].items()},
+        "edges": {qedge_id: copy_qgraph_element(qedge) for qedge_id, qedge in qgraph["edges"].items()},
+    }
 
+
+class QueryBindings(NamedTuple):
+    """What transform_result needs to know about the qgraph a query was compiled from to bind results to it."""
+    qnodes_with_set_interpretation_all: Set[str]
+    qnodes_with_superclass_nodes: Set[str]
+    # qedge id -> [(subject or object, subclass qedge id, superclass qnode id), ..]
+    qedges_with_attached_subclass_edges: Dict[str, List[Tuple[str, str, str]]]
+    # qedges matched in the opposite direction, from object to subject
+    inverted_qedge_ids: Set[str]
+
+
+def get_query_bindings(qgraph: dict) -> QueryBindings:
+    """Get the QueryBindings for a qgraph as rewritten by get_query."""
     qgraph_nodes = qgraph["nodes"]
     qnodes_with_set_interpretation_all = {qnode_id for qnode_id, qnode in qgraph_nodes.items()
                                           if qnode.get('set_interpretation', 'BATCH') == 'ALL'}
@@ -166,173 +344,394 @@ def transform_result(cypher_record,
                 qedges_with_attached_subclass_edges[qedge_id].append(
                     ('object', f'{qedge["object"]}_subclass_edge',  f'{qedge["object"]}_superclass'))
 
-    # Each path is an array of nodes and edges like [n1, n2, n3, e1, e2, e3],
-    # where nodes are node_ids from the graph and edges are element_ids of relationships from the graph.
-    for path in paths:
-        # Map results/paths to their corresponding qnodes and qedges
-        qnode_id_to_results = {qnode_id: (qnode, result_node_id) for (qnode_id, qnode), result_node_id in
-                               zip(qgraph_nodes.items(), path[:len(qgraph_nodes)])}
-        qedge_id_to_results = {qedge_id: (qedge, result_edge_id) for (qedge_id, qedge), result_edge_id in
-                               zip(qgraph_edges.items(), path[-len(qgraph_edges):])}
-
-        # results are grouped by unique sets of nodes, concatenating node ids to this string generates the key
-        result_key = ""
-
-        # create TRAPI node bindings
-        edge_bindings = {}
-        node_bindings = {}
-        for qnode_id, (qnode, result_node_id) in qnode_id_to_results.items():
-
-            # don't return superclass qnodes in the node bindings
-            if qnode.get('_superclass', False):
-                continue
-            # if there isn't a result for this node set an empty node binding
-            if not result_node_id:
-                node_bindings[qnode_id] = []
-                continue
+    inverted_qedge_ids = {qedge_id for qedge_id, qedge in qgraph_edges.items()
+                          if qedge.get("_cypher_inverted", False)}
+    return QueryBindings(qnodes_with_set_interpretation_all,
+                         qnodes_with_superclass_nodes,
+                         dict(qedges_with_attached_subclass_edges),
+                         inverted_qedge_ids)
 
-            # create a node binding
-            if qnode_id in qnodes_with_set_interpretation_all:
-                # if qnode has set_interpretation=ALL there won't be any superclass bindings
-                node_bindings[qnode_id] = [{'id': result_node_id, 'attributes': []}]
-
-            elif qnode_id in qnodes_with_superclass_nodes:
-                # If the qnode has a superclass node, and it has a different result node id,
-                # use the superclass result node id instead, because it's the actual query id.
-                # We used to include the query_id property here to show that, but now we're making a support graph
-                # that can represent the underlying subclass edge(s).
-                superclass_qnode, superclass_result_id = qnode_id_to_results[f'{qnode_id}_superclass']
-                node_bindings[qnode_id] = \
-                    [{'id': result_node_id if superclass_result_id == result_node_id else superclass_result_id,
-                      'attributes': []}]
-            else:
-                # Otherwise, create a normal node binding.
-                node_bindings[qnode_id] = \
-                    [{'id': result_node_id,
-                      'attributes': []}]
-
-            # add the result node id to the result key
-            result_key += node_bindings[qnode_id][0]['id']
-
-        # Create TRAPI edge bindings
-        for qedge_id, (qedge, path_edge) in qedge_id_to_results.items():
-
-            # skip empty results
-            if ((not path_edge) and (not path_edge == 0)):
-                continue
-            # don't return subclass qedges in the edge bindings
-            if qedge.get("_subclass", False):
+
+class CompiledQuery:
+    """A compiled cypher query, with the rewritten qgraph and binding metadata used to transform its results.
+
+    Compiled queries are not modified after they are created, so they can be shared between threads and requests.
+    """
+
+    def __init__(self, query: str, qgraph: dict, parameters: Optional[dict] = None,
+                 biolink_version: Optional[str] = None):
+        """Initialize."""
+        self.query = query
+        # None unless the query is parameterized
+        self.parameters = parameters
+        # the qgraph with superclass qnodes and subclass qedges added, see match_query()
+        self.qgraph = qgraph
+        self.bindings = get_query_bindings(qgraph)
+        self.biolink_version = biolink_version
+
+    def __str__(self):
+        return self.query
+
+
+def compile_query(qgraph, parameterized=False, **kwargs) -> CompiledQuery:
+    """Compile a qgraph to a CompiledQuery, without changing the qgraph.
+
+    Takes the same arguments as get_query. Pass the CompiledQuery to transform_result to transform the results.
+    """
+    compiled_qgraph = copy_qgraph(qgraph)
+    query = get_query(compiled_qgraph, parameterized=parameterized, **kwargs)
+    parameters = None
+    if parameterized:
+        query, parameters = query
+    return CompiledQuery(query, compiled_qgraph, parameters, kwargs.get("biolink_version"))
+
+
+class CompiledBatchQuery:
+    """One cypher query for a batch of same-shape qgraphs, with the CompiledQuery of each qgraph of the batch."""
+
+    def __init__(self, query: str, compiled_queries: List[CompiledQuery]):
+        """Initialize."""
+        self.query = query
+        self.compiled_queries = compiled_queries
+        # the parameters of each qgraph of the batch, in batch order
+        self.parameters = {"batch": [compiled_query.parameters for compiled_query in compiled_queries]}
+
+    def __len__(self):
+        return len(self.compiled_queries)
+
+    def __str__(self):
+        return self.query
+
+
+def compile_batch_query(qgraphs, **kwargs) -> CompiledBatchQuery:
+    """Compile qgraphs of the same shape to one query, run once for all of them with UNWIND $batch.
+
+    Takes the same arguments as compile_query, the query is always parameterized and returns one record with
+    batch_indexes, nodes, edges and paths lists. Pass it to transform_batch_result to get a TRAPI response for
+    each qgraph.
+    """
+    if not qgraphs:
+        raise ValueError("A batch needs at least one qgraph.")
+    if not kwargs.pop("reasoner", True):
+        raise ValueError("Batch queries are only supported with reasoner=True.")
+    kwargs.pop("parameterized", None)
+    compiled_queries = [
+        compile_query(qgraph, parameterized=True, batch=True, parameter_prefix=f"{BATCH_PARAMETERS}.", **kwargs)
+        for qgraph in qgraphs
+    ]
+    query = compiled_queries[0].query
+    for batch_index, compiled_query in enumerate(compiled_queries):
+        if compiled_query.query != query:
+            raise ValueError(f"The qgraphs of a batch must have the same shape, qgraph {batch_index} does not "
+                             f"have the shape of qgraph 0.")
+    unwind_clause = f"UNWIND range(0, size($batch) - 1) AS {BATCH_INDEX} " \
+                    f"WITH {BATCH_INDEX}, $batch[{BATCH_INDEX}] AS {BATCH_PARAMETERS}"
+    # hints in front of the query stay in front of UNWIND
+    prefix = get_query_prefix(compiled_queries[0].qgraph, **kwargs)
+    if prefix:
+        return CompiledBatchQuery(f"{prefix} {unwind_clause} {query[len(prefix) + 1:]}", compiled_queries)
+    return CompiledBatchQuery(f"{unwind_clause} {query}", compiled_queries)
+
+
+class ResultTransformer:
+    """Builds a TRAPI response from cypher results, which can be added all at once or a part at a time.
+
+    Nodes and edges are converted to TRAPI the first time they are added and paths are merged into the results as
+    they are added, so streamed rows (see get_query(stream=True)) can be dropped once they are added.
+    """
+
+    def __init__(self, qgraph: Union[dict, CompiledQuery], biolink_version: Optional[str] = None):
+        """Initialize with the CompiledQuery from compile_query, or a qgraph that was passed to get_query."""
+        if isinstance(qgraph, CompiledQuery):
+            self.compiled_query = qgraph
+            self.qgraph = qgraph.qgraph
+            self.bindings = qgraph.bindings
+            self.biolink_version = biolink_version or qgraph.biolink_version
+        else:
+            self.compiled_query = None
+            self.qgraph = qgraph
+            self.bindings = get_query_bindings(qgraph)
+            self.biolink_version = biolink_version
+        # looked up once for every node and edge
+        self.biolink_model = get_biolink_model(self.biolink_version)
+        self.kg_nodes = {}
+        self.kg_edges = {}
+        self.element_id_to_edge_id = {}
+        self.results = {}  # results are grouped by unique sets of result node ids
+        self.aux_graphs = {}  # auxiliary_graphs
+
+    def add(self, cypher_record):
+        """Add a cypher record with nodes, edges and paths."""
+        nodes, edges, paths = unpack_bolt_record(cypher_record)
+        self.add_nodes(nodes)
+        self.add_edges(edges)
+        self.add_paths(paths)
+
+    def add_nodes(self, nodes):
+        # Construct the knowledge_graph["nodes"] section of the TRAPI response
+        kg_nodes = self.kg_nodes
+        for cypher_node in nodes:
+            # nodes can be added more than once when results are streamed
+            if cypher_node["id"] in kg_nodes:
                 continue
+            # Convert the list of unique result nodes from cypher results to dictionaries
+            node = convert_bolt_node_to_dict(cypher_node)
+            # Convert nodes to TRAPI format
+            # id, name, and labels are removed before transform_attributes
+            node_id = node.pop('id')
+            kg_nodes[node_id] = {
+                'name': node.pop('name'),
+                'categories': sorted(node.pop('labels'))}
+            kg_nodes[node_id].update(**transform_attributes(node, node=True, biolink_model=self.biolink_model))
+
+    def add_edges(self, edges):
+        # Convert the list of unique edges from cypher results to dictionaries
+        # then convert them to TRAPI format, constructing the knowledge_graph["edges"] section of the TRAPI response.
+        # Also make a mapping of the neo4j element_id to the edge id to be used in the TRAPI edge bindings
+        # the edge id used in TRAPI is the 'id' property on the edge if there is one, otherwise assigned 0,1,2..
+        transform_edges_list(edges, self.biolink_version, self.kg_edges, self.element_id_to_edge_id,
+                             self.biolink_model)
+
+    def add_paths(self, paths):
+        kg_edges = self.kg_edges
+        element_id_to_edge_id = self.element_id_to_edge_id
+        results = self.results
+        aux_graphs = self.aux_graphs
+        bindings = self.bindings
+
+        qgraph_nodes = self.qgraph["nodes"]
+        qnodes_with_set_interpretation_all = bindings.qnodes_with_set_interpretation_all
+        qnodes_with_superclass_nodes = bindings.qnodes_with_superclass_nodes
+
+        qgraph_edges = self.qgraph["edges"]
+        qedges_with_attached_subclass_edges = bindings.qedges_with_attached_subclass_edges
+
+        # Each path is an array of nodes and edges like [n1, n2, n3, e1, e2, e3],
+        # where nodes are node_ids from the graph and edges are element_ids of relationships from the graph.
+        for path in paths:
+            # Map results/paths to their corresponding qnodes and qedges
+            qnode_id_to_results = {qnode_id: (qnode, result_node_id) for (qnode_id, qnode), result_node_id in
+                                   zip(qgraph_nodes.items(), path[:len(qgraph_nodes)])}
+            qedge_id_to_results = {qedge_id: (qedge, result_edge_id) for (qedge_id, qedge), result_edge_id in
+                                   zip(qgraph_edges.items(), path[-len(qgraph_edges):])}
+
+            # results are grouped by unique sets of nodes, concatenating node ids to this string generates the key
+            result_key = ""
+
+            # create TRAPI node bindings
+            edge_bindings = {}
+            node_bindings = {}
+            for qnode_id, (qnode, result_node_id) in qnode_id_to_results.items():
+
+                # don't return superclass qnodes in the node bindings
+                if qnode.get('_superclass', False):
+                    continue
+                # if there isn't a result for this node set an empty node binding
+                if not result_node_id:
+                    node_bindings[qnode_id] = []
+                    continue
+
+                # create a node binding
+                if qnode_id in qnodes_with_set_interpretation_all:
+                    # if qnode has set_interpretation=ALL there won't be any superclass bindings
+                    node_bindings[qnode_id] = [{'id': result_node_id, 'attributes': []}]
+
+                elif qnode_id in qnodes_with_superclass_nodes:
+                    # If the qnode has a superclass node, and it has a different result node id,
+                    # use the superclass result node id instead, because it's the actual query id.
+                    # We used to include the query_id property here to show that, but now we're making a support graph
+                    # that can represent the underlying subclass edge(s).
+                    superclass_qnode, superclass_result_id = qnode_id_to_results[f'{qnode_id}_superclass']
+                    node_bindings[qnode_id] = \
+                        [{'id': result_node_id if superclass_result_id == result_node_id else superclass_result_id,
+                          'attributes': []}]
+                else:
+                    # Otherwise, create a normal node binding.
+                    node_bindings[qnode_id] = \
+                        [{'id': result_node_id,
+                          'attributes': []}]
+
+                # add the result node id to the result key
+                result_key += node_bindings[qnode_id][0]['id']
+
+            # Create TRAPI edge bindings
+            for qedge_id, (qedge, path_edge) in qedge_id_to_results.items():
+
+                # skip empty results
+                if ((not path_edge) and (not path_edge == 0)):
+                    continue
+                # don't return subclass qedges in the edge bindings
+                if qedge.get("_subclass", False):
+                    continue
+
+                # find the knowledge graph edge id for the element id from the path edge
+                edge_element_id = path_edge
+                graph_edge_id = element_id_to_edge_id[edge_element_id]
+
+                # Check to see if the edge has subclass edges that are connected to it
+                subclass_edge_ids = []
+                superclass_node_ids = {}
+                for (subclass_subject_or_object, subclass_qedge_id, superclass_qnode_id) in \
+                        qedges_with_attached_subclass_edges.get(qedge_id, []):
+                    # If so, check to see if there are results for it
+                    qedge, subclass_edge_element_ids = qedge_id_to_results[subclass_qedge_id]
+                    if qedge.get("_resolved", False):
+                        subclass_edge_element_ids = self.resolved_subclass_edge_ids(qedge, qnode_id_to_results)
+                    if subclass_edge_element_ids:
+                        # If path_edge is Truthy, it means the subclass was used in the result.
+                        # For subclass edges, path result is a list of element ids, due to being a variable length edge.
+                        # make a list of the subclass edges plus the result edge from the query.
+                        subclass_edge_ids.extend([element_id_to_edge_id[ele_id]
+                                                  for ele_id in subclass_edge_element_ids])
+
+                        qnode, superclass_result_node_id = qnode_id_to_results[superclass_qnode_id]
+                        superclass_node_ids[subclass_subject_or_object] = superclass_result_node_id
+
+                if subclass_edge_ids:
+                    # make a composite id with all of their kg edge ids
+                    composite_edge_ids = [graph_edge_id] + subclass_edge_ids
+                    composite_edge_id = "_".join(composite_edge_ids)
+                    aux_graph_id = f"aux_{composite_edge_id}"
+                    if aux_graph_id not in aux_graphs:
+                        aux_graphs[aux_graph_id] = {
+                            "edges": composite_edge_ids,
+                            "attributes": []
+                        }
+                    if composite_edge_id not in kg_edges:
+                        real_edge = kg_edges[graph_edge_id]
+                        # When the cypher edge was inverted (non-canonical predicate), qgraph
+                        # subject/object are swapped relative to the real edge's subject/object,
+                        # so we need to swap the superclass_node_ids keys to match.
+                        if qedge_id in bindings.inverted_qedge_ids:
+                            swap = {"subject": "object", "object": "subject"}
+                            resolved_superclass_node_ids = {swap[k]: v for k, v in superclass_node_ids.items()}
+                        else:
+                            resolved_superclass_node_ids = superclass_node_ids
+                        inferred_result_edge = {"subject": real_edge["subject"],
+                                                "predicate": real_edge["predicate"],
+                                                "object": real_edge["object"],
+                                                "attributes": [
+                                                    {
+                                                        "attribute_type_id": "biolink:knowledge_level",
+                                                        "value": "logical_entailment"
+                                                    },
+                                                    {
+                                                        "attribute_type_id": "biolink:agent_type",
+                                                        "value": "automated_agent",
+                                                    },
+                                                    {
+                                                        "attribute_type_id": "biolink:support_graphs",
+                                                        "value": [aux_graph_id]
+                                                    }
+                                                ],
+                                                "sources": [
+                                                    {
+                                                        "resource_id": PROVENANCE_TAG,
+                                                        "resource_role": "primary_knowledge_source"
+                                                    }
+                                                ],
+                                                **resolved_superclass_node_ids}
+                        kg_edges[composite_edge_id] = inferred_result_edge
+
+                    # make an edge binding with the inferred subclass edge
+                    edge_bindings[qedge_id] = [{'id': composite_edge_id, 'attributes': []}]
+                else:
+                    # if no subclass edges for this edge make a normal edge binding
+                    edge_bindings[qedge_id] = [{'id': graph_edge_id, 'attributes': []}]
+
+            if result_key != '':  # avoid adding results for the default node binding key ''
+                # if we haven't encountered this specific group of result nodes before, create a new result
+                if result_key not in results:
+                    results[result_key] = {'node_bindings': node_bindings,
+                                           'analyses': [{'edge_bindings': edge_bindings,
+                                                         'resource_id': PROVENANCE_TAG}]}
+                else:
+                    # otherwise append new edge bindings to the existing result
+                    for qedge_id, edge_binding_list in edge_bindings.items():
+                        results[result_key]['analyses'][0]['edge_bindings'][qedge_id].extend(
+                            [new_edge_bind for new_edge_bind in edge_binding_list if new_edge_bind['id'] not in
+                             [existing_edge_bind['id'] for existing_edge_bind in
+                              results[result_key]['analyses'][0]['edge_bindings'][qedge_id]]])
+
+    def resolved_subclass_edge_ids(self, subclass_qedge, qnode_id_to_results):
+        """Get the element ids of the subclass_of edge of a path from a resolved subclass qedge, see hierarchy.py."""
+        _, subclass_node_id = qnode_id_to_results[subclass_qedge["subject"]]
+        _, superclass_node_id = qnode_id_to_results[subclass_qedge["object"]]
+        # like the variable length edge, only direct subclasses have a subclass_of edge
+        edge = subclass_qedge["_subclass_edges"].get(superclass_node_id, {}).get(subclass_node_id)
+        if edge is None:
+            return []
+        transform_edges_list([edge], self.biolink_version, self.kg_edges, self.element_id_to_edge_id,
+                             self.biolink_model)
+        return [edge[0]]
+
+    def response(self):
+        """Get the TRAPI response for the results added so far."""
+        # Strip internal flags added during query generation, compiled queries are left as they are
+        if self.compiled_query is None:
+            for qedge in self.qgraph["edges"].values():
+                qedge.pop("_cypher_inverted", None)
+
+        knowledge_graph = {
+            'nodes': self.kg_nodes,
+            'edges': self.kg_edges
+        }
+        transformed_results = {
+            'results': list(self.results.values()),  # convert the results dictionary to a flattened list
+            'knowledge_graph': knowledge_graph,
+            'auxiliary_graphs': self.aux_graphs
+        }
+        return transformed_results
 
-            # find the knowledge graph edge id for the element id from the path edge
-            edge_element_id = path_edge
-            graph_edge_id = element_id_to_edge_id[edge_element_id]
-
-            # Check to see if the edge has subclass edges that are connected to it
-            subclass_edge_ids = []
-            superclass_node_ids = {}
-            main_qedge = qedge  # Save before inner loop reassigns qedge
-            for (subclass_subject_or_object, subclass_qedge_id, superclass_qnode_id) in \
-                    qedges_with_attached_subclass_edges.get(qedge_id, []):
-                # If so, check to see if there are results for it
-                qedge, subclass_edge_element_ids = qedge_id_to_results[subclass_qedge_id]
-                if subclass_edge_element_ids:
-                    # If path_edge is Truthy, it means the subclass was used in the result.
-                    # For subclass edges, path result is a list of element ids, due to being a variable length edge.
-                    # make a list of the subclass edges plus the result edge from the query.
-                    subclass_edge_ids.extend([element_id_to_edge_id[ele_id] for ele_id in subclass_edge_element_ids])
-
-                    qnode, superclass_result_node_id = qnode_id_to_results[superclass_qnode_id]
-                    superclass_node_ids[subclass_subject_or_object] = superclass_result_node_id
-
-            if subclass_edge_ids:
-                # make a composite id with all of their kg edge ids
-                composite_edge_ids = [graph_edge_id] + subclass_edge_ids
-                composite_edge_id = "_".join(composite_edge_ids)
-                aux_graph_id = f"aux_{composite_edge_id}"
-                if aux_graph_id not in aux_graphs:
-                    aux_graphs[aux_graph_id] = {
-                        "edges": composite_edge_ids,
-                        "attributes": []
-                    }
-                if composite_edge_id not in kg_edges:
-                    real_edge = kg_edges[graph_edge_id]
-                    # When the cypher edge was inverted (non-canonical predicate), qgraph
-                    # subject/object are swapped relative to the real edge's subject/object,
-                    # so we need to swap the superclass_node_ids keys to match.
-                    if main_qedge.get("_cypher_inverted", False):
-                        swap = {"subject": "object", "object": "subject"}
-                        resolved_superclass_node_ids = {swap[k]: v for k, v in superclass_node_ids.items()}
-                    else:
-                        resolved_superclass_node_ids = superclass_node_ids
-                    inferred_result_edge = {"subject": real_edge["subject"],
-                                            "predicate": real_edge["predicate"],
-                                            "object": real_edge["object"],
-                                            "attributes": [
-                                                {
-                                                    "attribute_type_id": "biolink:knowledge_level",
-                                                    "value": "logical_entailment"
-                                                },
-                                                {
-                                                    "attribute_type_id": "biolink:agent_type",
-                                                    "value": "automated_agent",
-                                                },
-                                                {
-                                                    "attribute_type_id": "biolink:support_graphs",
-                                                    "value": [aux_graph_id]
-                                                }
-                                            ],
-                                            "sources": [
-                                                {
-                                                    "resource_id": PROVENANCE_TAG,
-                                                    "resource_role": "primary_knowledge_source"
-                                                }
-                                            ],
-                                            **resolved_superclass_node_ids}
-                    kg_edges[composite_edge_id] = inferred_result_edge
-
-                # make an edge binding with the inferred subclass edge
-                edge_bindings[qedge_id] = [{'id': composite_edge_id, 'attributes': []}]
-            else:
-                # if no subclass edges for this edge make a normal edge binding
-                edge_bindings[qedge_id] = [{'id': graph_edge_id, 'attributes': []}]
-
-        if result_key != '':  # avoid adding results for the default node binding key ''
-            # if we haven't encountered this specific group of result nodes before, create a new result
-            if result_key not in results:
-                results[result_key] = {'node_bindings': node_bindings,
-                                       'analyses': [{'edge_bindings': edge_bindings,
-                                                     'resource_id': PROVENANCE_TAG}]}
-            else:
-                # otherwise append new edge bindings to the existing result
-                for qedge_id, edge_binding_list in edge_bindings.items():
-                    results[result_key]['analyses'][0]['edge_bindings'][qedge_id].extend(
-                        [new_edge_bind for new_edge_bind in edge_binding_list if new_edge_bind['id'] not in
-                         [existing_edge_bind['id'] for existing_edge_bind in
-                          results[result_key]['analyses'][0]['edge_bindings'][qedge_id]]])
-
-    # Strip internal flags added during query generation
-    for qedge in qgraph["edges"].values():
-        qedge.pop("_cypher_inverted", None)
-
-    knowledge_graph = {
-        'nodes': kg_nodes,
-        'edges': kg_edges
-    }
-    transformed_results = {
-        'results': list(results.values()),  # convert the results dictionary to a flattened list
-        'knowledge_graph': knowledge_graph,
-        'auxiliary_graphs': aux_graphs
+
+def transform_result(cypher_record,
+                     qgraph: Union[dict, CompiledQuery],
+                     biolink_version: Optional[str] = None):
+    """Transform the cypher results of a query into a TRAPI response.
+
+    qgraph is the CompiledQuery from compile_query, or a qgraph that was passed to get_query (which changes it).
+    """
+    transformer = ResultTransformer(qgraph, biolink_version)
+    transformer.add(cypher_record)
+    return transformer.response()
+
+
+def transform_result_stream(cypher_records,
+                            qgraph: Union[dict, CompiledQuery],
+                            biolink_version: Optional[str] = None):
+    """Transform the cypher records of a query compiled with stream=True into a TRAPI response.
+
+    Records are consumed one at a time, so only the TRAPI response and the record being added are kept in memory.
+    """
+    transformer = ResultTransformer(qgraph, biolink_version)
+    for cypher_record in cypher_records:
+        transformer.add(cypher_record)
+    return transformer.response()
+
+
+def transform_batch_result(cypher_record, compiled_batch_query: CompiledBatchQuery):
+    """Transform the cypher record of a batch query into a list of TRAPI responses, one for each qgraph."""
+    results_by_batch_index = {
+        batch_index: {"nodes": nodes, "edges": edges, "paths": paths}
+        for batch_index, nodes, edges, paths in zip(cypher_record["batch_indexes"], cypher_record["nodes"],
+                                                    cypher_record["edges"], cypher_record["paths"])
     }
-    return transformed_results
+    empty_result = {"nodes": [], "edges": [], "paths": []}
+    return [
+        transform_result(results_by_batch_index.get(batch_index, empty_result), compiled_query)
+        for batch_index, compiled_query in enumerate(compiled_batch_query.compiled_queries)
+    ]
 
 
-def transform_edges_list(edges):
+def transform_edges_list(edges, biolink_version=None, kg_edges=None, element_id_to_edge_id=None, biolink_model=None):
     # See convert_bolt_edge_to_dict() for details on the contents of edges,
     # it is a list of lists (which can also be lists), representing unique edges from the graph
-    kg_edges = {}
-    element_id_to_edge_id = {}
-    edge_index = 1
+    # kg_edges and element_id_to_edge_id are updated in place when given, to add edges streamed in several parts
+    if kg_edges is None:
+        kg_edges = {}
+    if element_id_to_edge_id is None:
+        element_id_to_edge_id = {}
+    edge_index = len(element_id_to_edge_id) + 1
     for cypher_edge_result in edges:
         # skip an empty list
         if len(cypher_edge_result) == 0:
@@ -359,7 +758,7 @@ def transform_edges_list(edges):
             # transform the edge into TRAPI and return:
             # edge_id - the edge id that will be used for edges in the TRAPI knowledge graph and edge bindings
             # trapi_edge - a dictionary that represents an edge in the knowledge_graph part of the TRAPI response
-            edge_id, trapi_edge = convert_bolt_edge_to_trapi(cypher_edge)
+            edge_id, trapi_edge = convert_bolt_edge_to_trapi(cypher_edge, biolink_version, biolink_model)
             if not edge_id:
                 edge_id = f'e_{edge_index}'
             # make a mapping that will be used to look up the edge id by element id later
@@ -393,7 +792,7 @@ def convert_jolt_node_to_dict(jolt_node):
 # [elementId(edge_1), startNode(edge_1).id, type(edge_1), endNode(edge_1).id, properties(edge_1)]
 # This is done to prevent including often redundant node and edge properties on nodes and edges in pathway results.
 # See the cypher generated in the edges_assemble clause in assemble_results() for more details.
-def convert_bolt_edge_to_trapi(bolt_edge):
+def convert_bolt_edge_to_trapi(bolt_edge, biolink_version=None, biolink_model=None):
     if not bolt_edge:
         print(f'Tried to convert a missing edge: {bolt_edge}')
         return None, None
@@ -410,7 +809,8 @@ def convert_bolt_edge_to_trapi(bolt_edge):
     edge_id = edge_props.pop('id', None)
 
     # convert all remaining attributes to TRAPI format, constructing the attributes and sources sections
-    converted_edge.update(transform_attributes(edge_props, node=False))
+    converted_edge.update(transform_attributes(edge_props, node=False, biolink_version=biolink_version,
+                                               biolink_model=biolink_model))
 
     # return the edge id if there was one, and a TRAPI edge
     return edge_id, converted_edge
@@ -0,0 +1,389 @@
+"""Cypher clauses and expressions as trees, rendered for neo4j or memgraph.
+
+match_query builds the MATCH clauses of a query as CypherNodes instead of strings, so they can be compared, walked
+(e.g. for the $parameters they use) and rewritten before they are rendered. Nodes are immutable: equal trees compare
+and hash equal, and each node renders once per dialect, the text is memoized on the node.
+
+Expressions that are not modelled (WHERE conditions built by the references, CASE expressions) are Raw text.
+"""
+from typing import Iterator, Optional, Tuple
+
+from .exceptions import UnsupportedError
+
+
+def cypher_prop_string(value):
+    """Convert property value to cypher string representation."""
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, str):
+        return "\"{0}\"".format(
+            value.replace("\"", "\\\"")
+        )
+    if isinstance(value, (float, int)):
+        return str(value)
+    raise UnsupportedError(f"Unsupported property type: {type(value).__name__}.")
+
+
+def unquote(name: str) -> str:
+    """Remove the backticks around a variable name, if it has them."""
+    return name[1:-1] if len(name) > 1 and name.startswith("`") and name.endswith("`") else name
+
+
+class CypherNode:
+    """A node of a cypher tree."""
+
+    # the renderer method for the node type, render_<kind>
+    kind = None
+    # the names of the attributes holding the node's value and children
+    fields: Tuple[str, ...] = ()
+
+    def _key(self):
+        return (type(self),) + tuple(getattr(self, field) for field in self.fields)
+
+    def __eq__(self, other):
+        return isinstance(other, CypherNode) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"{type(self).__name__}(" + ", ".join(repr(getattr(self, field)) for field in self.fields) + ")"
+
+    def children(self) -> Iterator["CypherNode"]:
+        for field in self.fields:
+            value = getattr(self, field)
+            for item in (value if isinstance(value, tuple) else (value,)):
+                if isinstance(item, CypherNode):
+                    yield item
+                elif isinstance(item, tuple):
+                    # (key, value) pairs of property maps
+                    yield from (element for element in item if isinstance(element, CypherNode))
+
+    def replace(self, **changes) -> "CypherNode":
+        """Get a copy of the node with some fields changed, for rewrites."""
+        node = object.__new__(type(self))
+        node.__dict__.update({field: getattr(self, field) for field in self.fields})
+        node.__dict__.update({field: tuple(value) if isinstance(value, list) else value
+                              for field, value in changes.items()})
+        return node
+
+    def walk(self) -> Iterator["CypherNode"]:
+        """Iterate over the node and its descendants, depth first."""
+        yield self
+        for child in self.children():
+            yield from child.walk()
+
+    def render(self, dialect: Optional[str] = None) -> str:
+        """Render the node as cypher for a dialect, neo4j by default."""
+        dialect = (dialect or "neo4j").lower()
+        rendered = self.__dict__.setdefault("_rendered", {})
+        if dialect not in rendered:
+            rendered[dialect] = getattr(get_renderer(dialect), f"render_{self.kind}")(self)
+        return rendered[dialect]
+
+    def __str__(self):
+        return self.render()
+
+
+class Raw(CypherNode):
+    """Cypher text, an expression or clause that is not modelled."""
+    kind = "raw"
+    fields = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class Literal(CypherNode):
+    """A literal property value."""
+    kind = "literal"
+    fields = ("value",)
+
+    def __init__(self, value):
+        cypher_prop_string(value)
+        self.value = value
+
+    def _key(self):
+        # 1 and True are equal but render differently
+        return super()._key() + (type(self.value),)
+
+
+class Parameter(CypherNode):
+    """A $parameter, see matching.QueryParameters."""
+    kind = "parameter"
+    fields = ("name", "prefix")
+
+    def __init__(self, name: str, prefix: str = "$"):
+        self.name = name
+        self.prefix = prefix
+
+
+class PropertyMap(CypherNode):
+    """The {key: value, ..} map of a node or relationship pattern."""
+    kind = "property_map"
+    fields = ("items",)
+
+    def __init__(self, items=()):
+        self.items = tuple((key, value) for key, value in items)
+
+
+class NodePattern(CypherNode):
+    """A node pattern, a bare (`name`) references a bound node."""
+    kind = "node_pattern"
+    fields = ("name", "labels", "properties", "anonymous")
+
+    def __init__(self, name: str, labels=(), properties: Optional[PropertyMap] = None, anonymous: bool = False):
+        self.name = unquote(name)
+        self.labels = tuple(labels)
+        self.properties = properties
+        self.anonymous = anonymous
+
+
+class RelationshipPattern(CypherNode):
+    """A relationship pattern, variable length with a (min, max) length, None for no bound.
+
+    breadth_first variable length patterns only need the shortest path between their nodes, memgraph expands them
+    breadth first.
+    """
+    kind = "relationship_pattern"
+    fields = ("name", "types", "length", "properties", "directed", "breadth_first")
+
+    def __init__(self, name: str, types=(), length: Optional[tuple] = None, properties: Optional[PropertyMap] = None,
+                 directed: bool = False, breadth_first: bool = False):
+        self.name = unquote(name)
+        self.types = tuple(types)
+        self.length = None if length is None else tuple(length)
+        self.properties = properties
+        self.directed = directed
+        self.breadth_first = breadth_first
+
+
+class PathPattern(CypherNode):
+    """Node and relationship patterns, alternating."""
+    kind = "path_pattern"
+    fields = ("elements",)
+
+    def __init__(self, *elements: CypherNode):
+        self.elements = elements
+
+
+class IndexHint(CypherNode):
+    kind = "index_hint"
+    fields = ("variable", "label", "property")
+
+    def __init__(self, variable: str, label: str, property_: str = "id"):
+        self.variable = unquote(variable)
+        self.label = label
+        self.property = property_
+
+
+class JoinHint(CypherNode):
+    kind = "join_hint"
+    fields = ("variable",)
+
+    def __init__(self, variable: str):
+        self.variable = unquote(variable)
+
+
+class Where(CypherNode):
+    """WHERE the conditions and the qualifier conditions of a MATCH clause are all true."""
+    kind = "where"
+    fields = ("conditions", "qualifier_conditions")
+
+    def __init__(self, conditions=(), qualifier_conditions: Optional[CypherNode] = None):
+        self.conditions = tuple(conditions)
+        self.qualifier_conditions = qualifier_conditions
+
+
+class Exists(CypherNode):
+    """A condition that a pattern matches."""
+    kind = "exists"
+    fields = ("pattern",)
+
+    def __init__(self, pattern: CypherNode):
+        self.pattern = pattern
+
+
+class MatchClause(CypherNode):
+    kind = "match_clause"
+    fields = ("patterns", "hints", "where", "optional")
+
+    def __init__(self, patterns, hints=(), where: Optional[Where] = None, optional: bool = False):
+        self.patterns = tuple(patterns)
+        self.hints = tuple(hints)
+        self.where = where
+        self.optional = optional
+
+
+class WithClause(CypherNode):
+    kind = "with_clause"
+    fields = ("items",)
+
+    def __init__(self, items):
+        self.items = tuple(items)
+
+
+class ReturnClause(CypherNode):
+    kind = "return_clause"
+    fields = ("items",)
+
+    def __init__(self, items):
+        self.items = tuple(items)
+
+
+class CallSubquery(CypherNode):
+    kind = "call_subquery"
+    fields = ("clauses",)
+
+    def __init__(self, clauses):
+        self.clauses = tuple(clauses)
+
+
+class Union(CypherNode):
+    kind = "union"
+    fields = ("queries",)
+
+    def __init__(self, queries):
+        self.queries = tuple(queries)
+
+
+class Clauses(CypherNode):
+    """Clauses run one after the other."""
+    kind = "clauses"
+    fields = ("clauses",)
+
+    def __init__(self, clauses):
+        self.clauses = tuple(clauses)
+
+
+def parameter_names(node: CypherNode):
+    """Get the names of the $parameters used in a tree, in order."""
+    return list(dict.fromkeys(child.name for child in node.walk() if isinstance(child, Parameter)))
+
+
+def variable(name: str) -> str:
+    """Quote a variable name."""
+    return f"`{name}`"
+
+
+class Neo4jRenderer:
+    """Renders cypher trees for neo4j."""
+
+    dialect = "neo4j"
+
+    def render(self, node) -> str:
+        return node if isinstance(node, str) else node.render(self.dialect)
+
+    def render_raw(self, node: Raw):
+        return node.text
+
+    def render_literal(self, node: Literal):
+        return cypher_prop_string(node.value)
+
+    def render_parameter(self, node: Parameter):
+        return f"{node.prefix}{node.name}"
+
+    def render_property_map(self, node: PropertyMap):
+        return "{" + ", ".join(f"`{key}`: {self.render(value)}" for key, value in node.items) + "}"
+
+    def render_node_pattern(self, node: NodePattern):
+        elements = []
+        if not node.anonymous:
+            elements.append(variable(node.name))
+        elements.extend(f":`{label}`" for label in node.labels)
+        elements = ["".join(elements)]
+        if node.properties is not None:
+            elements.append(self.render(node.properties))
+        return "({})".format(" ".join(elements))
+
+    def render_relationship_pattern(self, node: RelationshipPattern):
+        elements = [":" + "|".join(f"`{relationship_type}`" for relationship_type in node.types)
+                    if node.types else ""]
+        if node.length is not None:
+            elements.append(self.render_length(node))
+        if node.properties is not None:
+            elements.append(" " + self.render(node.properties))
+        return "-[{0}{1}]-".format(variable(node.name), "".join(elements)) + (">" if node.directed else "")
+
+    def render_length(self, node: RelationshipPattern):
+        return "*{}..{}".format(
+            node.length[0] if node.length[0] is not None else "",
+            node.length[1] if node.length[1] is not None else "",
+        )
+
+    def render_path_pattern(self, node: PathPattern):
+        return "".join(self.render(element) for element in node.elements)
+
+    def render_index_hint(self, node: IndexHint):
+        return f"USING INDEX {variable(node.variable)}:`{node.label}`({node.property})"
+
+    def render_join_hint(self, node: JoinHint):
+        return f"USING JOIN ON {variable(node.variable)}"
+
+    def render_where(self, node: Where):
+        conditions = ""
+        if len(node.conditions) > 1:
+            conditions = " ( " + " AND ".join(f"({self.render(condition)})" for condition in node.conditions) + " ) "
+        elif node.conditions:
+            conditions = " ( " + self.render(node.conditions[0]) + " ) "
+        qualifier_conditions = ""
+        if node.qualifier_conditions is not None:
+            qualifier_conditions = f"({self.render(node.qualifier_conditions)})"
+        return "WHERE " + conditions + (" AND " if conditions and qualifier_conditions else "") + qualifier_conditions
+
+    def render_exists(self, node: Exists):
+        return f"EXISTS {{ {self.render(node.pattern)} }}"
+
+    def render_match_clause(self, node: MatchClause):
+        query = ("OPTIONAL MATCH " if node.optional else "MATCH ") + ", ".join(self.render(pattern)
+                                                                               for pattern in node.patterns)
+        if node.hints:
+            query += " " + " ".join(self.render(hint) for hint in node.hints)
+        if node.where is not None and (node.where.conditions or node.where.qualifier_conditions is not None):
+            query += " " + self.render(node.where)
+        return query
+
+    def render_with_clause(self, node: WithClause):
+        return "WITH " + ", ".join(node.items)
+
+    def render_return_clause(self, node: ReturnClause):
+        return "RETURN " + ", ".join(node.items)
+
+    def render_call_subquery(self, node: CallSubquery):
+        return "CALL {{{query}}}".format(query=" ".join(self.render(clause) for clause in node.clauses))
+
+    def render_union(self, node: Union):
+        return " UNION ".join(self.render(query) for query in node.queries)
+
+    def render_clauses(self, node: Clauses):
+        return " ".join(self.render(clause) for clause in node.clauses)
+
+
+class MemgraphRenderer(Neo4jRenderer):
+    """Renders cypher trees for memgraph."""
+
+    dialect = "memgraph"
+
+    def render_exists(self, node: Exists):
+        return f"exists({self.render(node.pattern)})"
+
+    def render_length(self, node: RelationshipPattern):
+        # BFS doesn't return zero length paths, patterns that can match them are expanded depth first
+        minimum, maximum = node.length
+        if not node.breadth_first or minimum is not None and minimum < 1:
+            return super().render_length(node)
+        bounds = ("" if minimum in (None, 1) else str(minimum)) + ".." + ("" if maximum is None else str(maximum))
+        return "*BFS" if bounds == ".." else f"*BFS {bounds}"
+
+
+RENDERERS = {
+    "neo4j": Neo4jRenderer(),
+    "memgraph": MemgraphRenderer(),
+}
+
+
+def get_renderer(dialect: Optional[str] = None):
+    dialect = (dialect or "neo4j").lower()
+    if dialect not in RENDERERS:
+        raise ValueError(f"Unknown dialect {dialect}. Only neo4j and memgraph are supported.")
+    return RENDERERS[dialect]
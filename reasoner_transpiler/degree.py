@@ -0,0 +1,53 @@
+"""Degree of each node stored as a node property, so max_connectivity can filter on a range index.
+
+By default max_connectivity counts the relationships of each candidate node while the query runs. With
+use_degree_property=True, get_query compares the node_degree property instead, which a range index on it can answer.
+Compute the property from a graph export, in the CSV or JSON formats of the test databases, and load it with
+DEGREE_QUERY:
+
+python -m reasoner_transpiler.degree edges.csv --nodes nodes.csv -o degrees.json
+
+The index advisor recommends the index for workloads using it.
+"""
+import json
+from collections import Counter
+from typing import Dict, Iterable, Tuple
+
+from .hierarchy import load_graph_records
+
+DEGREE_PROPERTY = "node_degree"
+
+DEGREE_QUERY = "UNWIND $degrees AS row MATCH (n {id: row.id}) " \
+               f"SET n.{DEGREE_PROPERTY} = row.{DEGREE_PROPERTY} RETURN count(*)"
+
+
+def count_degrees(edges: Iterable[Tuple[str, str]], node_ids: Iterable[str] = ()) -> Dict[str, int]:
+    """Count the relationships of each node from (subject, object) pairs, node_ids without any get 0."""
+    degrees = Counter({node_id: 0 for node_id in node_ids})
+    for subject, object_ in edges:
+        # like COUNT { (n)-[]-() } a relationship from a node to itself counts twice
+        degrees[subject] += 1
+        degrees[object_] += 1
+    return dict(degrees)
+
+
+def main(args=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Compute the degree property of the nodes of a graph.")
+    parser.add_argument("edges", help="CSV file with subject and object columns, or a JSON list of edges")
+    parser.add_argument("--nodes", default=None, help="CSV or JSON nodes file, to include nodes without edges")
+    parser.add_argument("-o", "--output", default=None, help="JSON file for the degrees, printed if not given")
+    args = parser.parse_args(args)
+
+    node_ids = [node["id"] for node in load_graph_records(args.nodes)] if args.nodes else []
+    degrees = count_degrees(((edge["subject"], edge["object"]) for edge in load_graph_records(args.edges)), node_ids)
+    rows = [{"id": node_id, DEGREE_PROPERTY: degree} for node_id, degree in degrees.items()]
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(rows, output_file, indent=2)
+    else:
+        print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
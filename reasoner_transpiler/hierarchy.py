@@ -0,0 +1,231 @@
+"""In-process index of the subclass_of edges of the graph, to resolve subclasses without querying the database.
+
+With resolve_subclasses=True, get_query expands the ids of pinned qnodes into their descendants, up to subclass_depth,
+from the loaded SubclassHierarchy and matches them with a plain id filter instead of a variable length subclass_of
+traversal. The subclass_of edges of direct subclasses are kept in the compiled qgraph, so transform_result builds the
+same superclass node bindings and auxiliary graphs.
+
+When the sorted ids of the nodes with subclasses are loaded as SubclassParents, pinned qnodes whose ids are all leaves
+get no superclass qnode and subclass qedge, since their subclass expansion is empty.
+
+Build a hierarchy snapshot, or with --parents the ids of the nodes with subclasses, from the edges of a graph, in the
+CSV or JSON formats of the test databases, with:
+
+python -m reasoner_transpiler.hierarchy edges.csv -o hierarchy.json
+python -m reasoner_transpiler.hierarchy edges.csv --parents -o parents.json
+"""
+import bisect
+import csv
+import json
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+SUBCLASS_HIERARCHY_FILE = os.environ.get('SUBCLASS_HIERARCHY_FILE')
+SUBCLASS_PARENTS_FILE = os.environ.get('SUBCLASS_PARENTS_FILE')
+SUBCLASS_OF = "biolink:subclass_of"
+
+
+def load_graph_records(path) -> List[dict]:
+    """Load nodes or edges from a CSV file with a header and a JSON props column, or a JSON list of objects."""
+    with open(path, newline="") as records_file:
+        if str(path).endswith(".json"):
+            return json.load(records_file)
+        records = []
+        # quotes are escaped with backslashes, like neo4j LOAD CSV reads them
+        for row in csv.DictReader(records_file, escapechar="\\"):
+            props = row.pop("props", None)
+            records.append({**row, **(json.loads(props) if props else {})})
+        return records
+
+
+class SubclassHierarchy:
+    """Index of the direct subclasses of each node, with the subclass_of edge between them."""
+
+    def __init__(self, edges: Iterable[dict]):
+        """Initialize from edge objects with subject, predicate, object and other properties, like id."""
+        # parent -> child -> the edge as returned by cypher queries, see convert_bolt_edge_to_trapi()
+        self._children = defaultdict(dict)
+        for edge in edges:
+            if edge["predicate"] != SUBCLASS_OF:
+                continue
+            props = {key: value for key, value in edge.items() if key not in ("subject", "predicate", "object")}
+            self._children[edge["object"]][edge["subject"]] = [
+                f"{SUBCLASS_OF}:{edge['subject']}:{edge['object']}",
+                edge["subject"],
+                SUBCLASS_OF,
+                edge["object"],
+                props,
+            ]
+
+    @classmethod
+    def load(cls, path):
+        """Load the subclass_of edges of a CSV or JSON edges file."""
+        return cls(load_graph_records(path))
+
+    def edges(self) -> List[dict]:
+        return [{"subject": subject, "predicate": predicate, "object": object_, **props}
+                for children in self._children.values()
+                for _, subject, predicate, object_, props in children.values()]
+
+    def parents(self) -> "SubclassParents":
+        return SubclassParents(self._children)
+
+    def descendants(self, node_id: str, depth: int) -> List[str]:
+        """Get the ids of the subclasses of a node up to depth, ordered by depth, not including itself."""
+        seen = {node_id}
+        descendants = []
+        level = [node_id]
+        for _ in range(depth):
+            level = sorted({child for parent in level for child in self._children.get(parent, ()) if child not in seen})
+            if not level:
+                break
+            seen.update(level)
+            descendants.extend(level)
+        return descendants
+
+    def resolve(self, ids: List[str], depth: int):
+        """Resolve the subclasses of ids up to depth.
+
+        Returns the ids matching ids or their subclasses, the queried and subclass ids of each (queried id, matching
+        id) pair, and the subclass_of edges of direct subclasses by queried id and subclass id.
+        """
+        subclass_ids = []
+        pair_queried_ids = []
+        pair_subclass_ids = []
+        subclass_edges: Dict[str, Dict[str, list]] = {}
+        for queried_id in ids:
+            for subclass_id in [queried_id] + self.descendants(queried_id, depth):
+                if subclass_id not in subclass_ids:
+                    subclass_ids.append(subclass_id)
+                pair_queried_ids.append(queried_id)
+                pair_subclass_ids.append(subclass_id)
+            if depth > 0 and queried_id in self._children:
+                subclass_edges[queried_id] = dict(self._children[queried_id])
+        return subclass_ids, pair_queried_ids, pair_subclass_ids, subclass_edges
+
+
+class SubclassParents:
+    """Sorted array of the ids of the nodes with subclasses."""
+
+    def __init__(self, ids: Iterable[str]):
+        """Initialize from the ids of the nodes with subclasses."""
+        self._ids = sorted(set(ids))
+
+    @classmethod
+    def load(cls, path):
+        """Load a JSON list of ids."""
+        with open(path) as parents_file:
+            return cls(json.load(parents_file))
+
+    @property
+    def ids(self) -> List[str]:
+        return self._ids
+
+    def __contains__(self, node_id):
+        index = bisect.bisect_left(self._ids, node_id)
+        return index < len(self._ids) and self._ids[index] == node_id
+
+    def __len__(self):
+        return len(self._ids)
+
+    def are_leaves(self, ids) -> bool:
+        """Check that none of ids (one id or a list) have subclasses, so their subclass expansion is empty."""
+        return not any(node_id in self for node_id in (ids if isinstance(ids, list) else [ids]))
+
+
+_SUBCLASS_HIERARCHY = None
+_SUBCLASS_HIERARCHY_LOADED = False
+_SUBCLASS_HIERARCHY_LOCK = threading.Lock()
+
+
+def get_subclass_hierarchy() -> Optional[SubclassHierarchy]:
+    """Get the subclass hierarchy, loading SUBCLASS_HIERARCHY_FILE the first time if it is set, or None."""
+    global _SUBCLASS_HIERARCHY, _SUBCLASS_HIERARCHY_LOADED
+    if not _SUBCLASS_HIERARCHY_LOADED:
+        with _SUBCLASS_HIERARCHY_LOCK:
+            if not _SUBCLASS_HIERARCHY_LOADED:
+                _SUBCLASS_HIERARCHY = SubclassHierarchy.load(SUBCLASS_HIERARCHY_FILE) \
+                    if SUBCLASS_HIERARCHY_FILE else None
+                _SUBCLASS_HIERARCHY_LOADED = True
+    return _SUBCLASS_HIERARCHY
+
+
+def set_subclass_hierarchy(hierarchy):
+    """Set the subclass hierarchy, from a SubclassHierarchy or a list of edge objects."""
+    global _SUBCLASS_HIERARCHY, _SUBCLASS_HIERARCHY_LOADED
+    if hierarchy is not None and not isinstance(hierarchy, SubclassHierarchy):
+        hierarchy = SubclassHierarchy(hierarchy)
+    _SUBCLASS_HIERARCHY = hierarchy
+    _SUBCLASS_HIERARCHY_LOADED = True
+
+
+def load_subclass_hierarchy(path):
+    set_subclass_hierarchy(SubclassHierarchy.load(path))
+
+
+def reset_subclass_hierarchy():
+    """Forget the subclass hierarchy, SUBCLASS_HIERARCHY_FILE is loaded again the next time it is needed."""
+    global _SUBCLASS_HIERARCHY, _SUBCLASS_HIERARCHY_LOADED
+    _SUBCLASS_HIERARCHY = None
+    _SUBCLASS_HIERARCHY_LOADED = False
+
+
+_SUBCLASS_PARENTS = None
+_SUBCLASS_PARENTS_LOADED = False
+_SUBCLASS_PARENTS_LOCK = threading.Lock()
+
+
+def get_subclass_parents() -> Optional[SubclassParents]:
+    """Get the ids of the nodes with subclasses, loading SUBCLASS_PARENTS_FILE the first time if it is set, or None."""
+    global _SUBCLASS_PARENTS, _SUBCLASS_PARENTS_LOADED
+    if not _SUBCLASS_PARENTS_LOADED:
+        with _SUBCLASS_PARENTS_LOCK:
+            if not _SUBCLASS_PARENTS_LOADED:
+                _SUBCLASS_PARENTS = SubclassParents.load(SUBCLASS_PARENTS_FILE) if SUBCLASS_PARENTS_FILE else None
+                _SUBCLASS_PARENTS_LOADED = True
+    return _SUBCLASS_PARENTS
+
+
+def set_subclass_parents(parents):
+    """Set the ids of the nodes with subclasses, from SubclassParents, a SubclassHierarchy or a list of ids."""
+    global _SUBCLASS_PARENTS, _SUBCLASS_PARENTS_LOADED
+    if isinstance(parents, SubclassHierarchy):
+        parents = parents.parents()
+    elif parents is not None and not isinstance(parents, SubclassParents):
+        parents = SubclassParents(parents)
+    _SUBCLASS_PARENTS = parents
+    _SUBCLASS_PARENTS_LOADED = True
+
+
+def load_subclass_parents(path):
+    set_subclass_parents(SubclassParents.load(path))
+
+
+def reset_subclass_parents():
+    """Forget the ids of the nodes with subclasses, SUBCLASS_PARENTS_FILE is loaded again the next time it is needed."""
+    global _SUBCLASS_PARENTS, _SUBCLASS_PARENTS_LOADED
+    _SUBCLASS_PARENTS = None
+    _SUBCLASS_PARENTS_LOADED = False
+
+
+def main(args=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Build a subclass hierarchy snapshot from the edges of a graph.")
+    parser.add_argument("edges", help="CSV file with subject, predicate, object and props columns, or a JSON list")
+    parser.add_argument("--parents", action="store_true", help="only the ids of the nodes with subclasses")
+    parser.add_argument("-o", "--output", default=None, help="JSON file for the snapshot, printed if not given")
+    args = parser.parse_args(args)
+
+    hierarchy = SubclassHierarchy.load(args.edges)
+    snapshot = hierarchy.parents().ids if args.parents else hierarchy.edges()
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(snapshot, output_file, indent=2)
+    else:
+        print(json.dumps(snapshot, indent=2))
+
+
+if __name__ == "__main__":
+    main()
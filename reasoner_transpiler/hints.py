@@ -0,0 +1,107 @@
+"""Planner hints chosen for each pattern of a query, following a HintPolicy.
+
+use_hints=True adds USING INDEX to every MATCH with a pinned qnode. With hint_policy, get_query chooses hints for each
+pattern instead:
+* index hints on pinned qnodes, USING INDEX in the MATCH clauses of neo4j queries, and a USING INDEX directive in
+  front of memgraph queries for the labels of all pinned qnodes
+* join hints on qnodes without ids between two pinned qnodes, USING JOIN ON in the MATCH clause that reaches them
+  the second time, neo4j only
+* a runtime for large queries, with at least runtime_min_qedges qedges (not counting subclass qedges) or, with
+  runtime_unpinned, without pinned qnodes, CYPHER runtime=... in front of the query, neo4j only
+
+hint_policy is a HintPolicy, a dict of its fields or True for the default policy. Hints only depend on the shape of
+the qgraph, so queries of the same shape get the same hints and can share a compiled query.
+"""
+import re
+from collections import defaultdict
+from typing import List, NamedTuple, Optional
+
+from .planner import GENERIC_LABEL
+from .util import ensure_list
+
+SUPERCLASS_SUFFIX = "_superclass"
+
+
+class HintPolicy(NamedTuple):
+    index: bool = True  # index hints on pinned qnodes
+    join: bool = True  # join hints on qnodes between pinned qnodes
+    runtime: Optional[str] = None  # neo4j runtime for large queries, e.g. "parallel", None to keep the default
+    runtime_min_qedges: int = 3
+    runtime_unpinned: bool = True  # queries without pinned qnodes are large
+
+
+def as_hint_policy(policy) -> Optional[HintPolicy]:
+    """Get the HintPolicy of a hint_policy argument, None for no hints."""
+    if policy is None or policy is False:
+        return None
+    if policy is True:
+        return HintPolicy()
+    if isinstance(policy, dict):
+        policy = HintPolicy(**policy)
+    if not isinstance(policy, HintPolicy):
+        raise TypeError(f"Unsupported hint_policy type: {type(policy).__name__}.")
+    if policy.runtime is not None and not re.fullmatch(r"[a-z]+", policy.runtime):
+        raise ValueError(f"Unsupported runtime: {policy.runtime}.")
+    return policy
+
+
+def get_dialect(kwargs) -> str:
+    return (kwargs.get("dialect") or "neo4j").lower()
+
+
+def use_match_clause_hints(kwargs) -> bool:
+    """Check whether hints are added to MATCH clauses, they are in front of the query for memgraph."""
+    return as_hint_policy(kwargs.get("hint_policy")) is not None and get_dialect(kwargs) == "neo4j"
+
+
+def is_pinned(qnode_id: str, qgraph_nodes: dict) -> bool:
+    """Check whether a qnode has ids, or a superclass qnode with its ids."""
+    if qnode_id not in qgraph_nodes:
+        return False
+    return qgraph_nodes[qnode_id].get("ids") is not None or qnode_id + SUPERCLASS_SUFFIX in qgraph_nodes
+
+
+def get_join_qnode_ids(qgraph: dict) -> List[str]:
+    """Get the qnodes without ids connected to two or more pinned qnodes, not counting subclass qedges."""
+    qgraph_nodes = qgraph["nodes"]
+    neighbours = defaultdict(set)
+    for qedge in qgraph["edges"].values():
+        if qedge.get("_subclass", False):
+            continue
+        neighbours[qedge["subject"]].add(qedge["object"])
+        neighbours[qedge["object"]].add(qedge["subject"])
+    return [
+        qnode_id for qnode_id in qgraph_nodes
+        if not is_pinned(qnode_id, qgraph_nodes)
+        and sum(is_pinned(neighbour, qgraph_nodes) for neighbour in neighbours[qnode_id]) >= 2
+    ]
+
+
+def is_large_query(qgraph: dict, policy: HintPolicy) -> bool:
+    qedge_count = sum(not qedge.get("_subclass", False) for qedge in qgraph["edges"].values())
+    if qedge_count >= policy.runtime_min_qedges:
+        return True
+    return policy.runtime_unpinned and not any(is_pinned(qnode_id, qgraph["nodes"]) for qnode_id in qgraph["nodes"])
+
+
+def index_label(qnode: dict) -> str:
+    """Get the label a qnode is matched with, like NodeReference."""
+    categories = ensure_list(qnode.get("categories") or [])
+    return str(categories[0]) if len(categories) == 1 else GENERIC_LABEL
+
+
+def get_query_prefix(qgraph: dict, **kwargs) -> str:
+    """Get the hints in front of the query for a qgraph after match_query changed it, an empty string for none."""
+    policy = as_hint_policy(kwargs.get("hint_policy"))
+    if policy is None:
+        return ""
+    dialect = get_dialect(kwargs)
+    if dialect == "neo4j":
+        if policy.runtime is not None and is_large_query(qgraph, policy):
+            return f"CYPHER runtime={policy.runtime}"
+        return ""
+    if policy.index:
+        labels = dict.fromkeys(index_label(qnode) for qnode in qgraph["nodes"].values() if qnode.get("ids") is not None)
+        if labels:
+            return "USING INDEX " + ", ".join(f":`{label}`(id)" for label in labels)
+    return ""
@@ -0,0 +1,130 @@
+"""Recommend the database indexes used by the queries of a workload of qgraphs.
+
+Queries filter nodes on the id, constraint and stored degree properties of their labels, and edges on the attribute
+constraint and qualifier properties of their relationship types. advise_indexes compiles each qgraph and counts the
+queries using each (label or relationship type, property) pair, which are returned as CREATE INDEX statements for neo4j
+or memgraph, the most used first.
+
+python -m reasoner_transpiler.index_advisor workload.json --dialect memgraph
+"""
+import json
+import re
+from collections import Counter
+from typing import Iterable, List, NamedTuple, Optional
+
+from .cypher import compile_query
+from .degree import DEGREE_PROPERTY
+from .matching import EdgeReference, NodeReference, convert_constraints
+
+NODE = "node"
+RELATIONSHIP = "relationship"
+
+
+class Index(NamedTuple):
+    kind: str  # NODE or RELATIONSHIP
+    token: str  # node label or relationship type
+    property: Optional[str]  # None for a label index
+
+
+class IndexAdvice(NamedTuple):
+    index: Index
+    query_count: int  # the number of queries in the workload using the index
+    ddl: str
+
+
+def get_query_indexes(qgraph: dict, **kwargs) -> set:
+    """Get the Indexes a qgraph's query can use, takes the same arguments as get_query."""
+    compiled_qgraph = compile_query(qgraph, **kwargs).qgraph
+    indexes = set()
+
+    node_references = {}
+    for qnode_id, qnode in compiled_qgraph["nodes"].items():
+        node_references[qnode_id] = reference = NodeReference(qnode_id, qnode, **kwargs)
+        for label in reference.labels:
+            indexes.add(Index(NODE, label, None))
+            if qnode.get("ids") is not None:
+                indexes.add(Index(NODE, label, "id"))
+            for key in convert_constraints(qnode.get("constraints", [])):
+                indexes.add(Index(NODE, label, key))
+            if kwargs.get("use_degree_property", False) and kwargs.get("max_connectivity", -1) > -1:
+                indexes.add(Index(NODE, label, DEGREE_PROPERTY))
+
+    for qedge_id, qedge in compiled_qgraph["edges"].items():
+        if qedge.get("_subclass", False):
+            continue
+        reference = EdgeReference(
+            qedge_id, qedge,
+            subject_categories=node_references[qedge["subject"]].categories
+            if qedge["subject"] in node_references else None,
+            object_categories=node_references[qedge["object"]].categories
+            if qedge["object"] in node_references else None,
+            **kwargs,
+        )
+        properties = list(convert_constraints(qedge.get("attribute_constraints", [])))
+        properties.extend(
+            constraint_filter["qualifier_type_id"].removeprefix("biolink:")
+            for constraint in qedge.get("qualifier_constraints", [])
+            for constraint_filter in constraint.get("qualifier_set", [])
+            if constraint_filter
+        )
+        # relationships without a type can't be indexed
+        for relationship_type in set(reference.predicates + reference.inverse_predicates):
+            for edge_property in properties:
+                indexes.add(Index(RELATIONSHIP, relationship_type, edge_property))
+    return indexes
+
+
+def index_ddl(index: Index, dialect: str = "neo4j") -> Optional[str]:
+    """Get the CREATE INDEX statement for an Index, None if the database has the index without creating it."""
+    dialect = (dialect or "neo4j").lower()
+    if dialect == "neo4j":
+        if index.property is None:
+            # neo4j has a node label lookup index by default
+            return None
+        name = re.sub(r"\W+", "_", f"{index.kind}_{index.token}_{index.property}")
+        if index.kind == NODE:
+            return f"CREATE INDEX {name} IF NOT EXISTS FOR (n:`{index.token}`) ON (n.`{index.property}`)"
+        return f"CREATE INDEX {name} IF NOT EXISTS FOR ()-[r:`{index.token}`]-() ON (r.`{index.property}`)"
+    elif dialect == "memgraph":
+        if index.kind == NODE:
+            if index.property is None:
+                return f"CREATE INDEX ON :`{index.token}`;"
+            return f"CREATE INDEX ON :`{index.token}`(`{index.property}`);"
+        return f"CREATE EDGE INDEX ON :`{index.token}`(`{index.property}`);"
+    raise ValueError(f"Unknown dialect {dialect}. Only neo4j and memgraph are supported.")
+
+
+def advise_indexes(qgraphs: Iterable[dict], dialect: str = "neo4j", **kwargs) -> List[IndexAdvice]:
+    """Get the indexes used by the queries of qgraphs, the most used first.
+
+    Takes the same arguments as get_query, the qgraphs are left as they are.
+    """
+    query_counts = Counter()
+    for qgraph in qgraphs:
+        query_counts.update(get_query_indexes(qgraph, dialect=dialect, **kwargs))
+    advice = []
+    for index, query_count in sorted(query_counts.items(), key=lambda item: (-item[1], item[0].kind,
+                                                                             item[0].token, item[0].property or "")):
+        ddl = index_ddl(index, dialect)
+        if ddl is not None:
+            advice.append(IndexAdvice(index, query_count, ddl))
+    return advice
+
+
+def main(args=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Recommend indexes for a workload of qgraphs.")
+    parser.add_argument("workload", help="JSON file with a list of qgraphs, or TRAPI messages with a query_graph")
+    parser.add_argument("--dialect", default="neo4j", choices=["neo4j", "memgraph"])
+    args = parser.parse_args(args)
+
+    with open(args.workload) as workload_file:
+        workload = json.load(workload_file)
+    qgraphs = [qgraph.get("message", qgraph).get("query_graph", qgraph) for qgraph in workload]
+    for advice in advise_indexes(qgraphs, dialect=args.dialect):
+        print(f"// used by {advice.query_count} of {len(qgraphs)} queries")
+        print(advice.ddl)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,18 @@
 """MATCHing tools."""
-from typing import Dict, List
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
-from .biolink import bmt, ALL_BIOLINK_ENUMS
+from .biolink import get_biolink_model
+from .cypher_ast import Clauses, CypherNode, IndexHint, JoinHint, Literal, MatchClause, NodePattern, Parameter, \
+    PathPattern, PropertyMap, Raw, RelationshipPattern, Where, cypher_prop_string
+from .degree import DEGREE_PROPERTY
 from .exceptions import InvalidPredicateError, InvalidQualifierError, InvalidQualifierValueError, UnsupportedError, NoPossibleResultsException
+from .hierarchy import get_subclass_hierarchy, get_subclass_parents
+from .hints import as_hint_policy, get_join_qnode_ids, is_pinned, use_match_clause_hints
+from .meta_kg import get_meta_kg
 from .nesting import Query
-from .util import ensure_list, snake_case, space_case, pascal_case
+from .planner import plan_qedges
+from .subclass_closure import descendants_expression
+from .util import ensure_list, space_case
 
 
 # A placeholder for an optional set of predicates to be used as a filter when constructing cypher queries.
@@ -15,7 +23,7 @@ PREDICATES_IN_GRAPH = None
 def set_predicates_in_graph(predicates: set):
     global PREDICATES_IN_GRAPH
     if predicates:
-        PREDICATES_IN_GRAPH = {space_case(p.removeprefix('biolink:')) for p in predicates}
+        PREDICATES_IN_GRAPH = frozenset(space_case(p.removeprefix('biolink:')) for p in predicates)
 
 
 def reset_predicates_in_graph():
@@ -23,17 +31,56 @@ def reset_predicates_in_graph():
     PREDICATES_IN_GRAPH = None
 
 
-def cypher_prop_string(value):
-    """Convert property value to cypher string representation."""
-    if isinstance(value, bool):
-        return str(value).lower()
-    if isinstance(value, str):
-        return "\"{0}\"".format(
-            value.replace("\"", "\\\"")
-        )
-    if isinstance(value, (float, int)):
-        return str(value)
-    raise UnsupportedError(f"Unsupported property type: {type(value).__name__}.")
+def check_parameter_value(value):
+    """Check that a value (or list of values) can be used in cypher, the same way as when it is inlined."""
+    for item in (value if isinstance(value, list) else [value]):
+        cypher_prop_string(item)
+
+
+class QueryParameters(dict):
+    """Literal values bound as cypher $parameters, named in the order they are bound.
+
+    sources maps parameter names to where their values come from in the qgraph, see query_cache.QueryTemplate.
+    """
+
+    def __init__(self, prefix: str = "$"):
+        """Initialize, prefix is put in front of parameter names to reference them in cypher."""
+        super().__init__()
+        self.prefix = prefix
+        self.sources = {}
+
+    def parameter(self, value, source: Optional[tuple] = None) -> Parameter:
+        """Bind a value (or list of values) to a new parameter and return it."""
+        check_parameter_value(value)
+        name = f"p{len(self)}"
+        self[name] = value
+        self.sources[name] = source
+        return Parameter(name, self.prefix)
+
+    def bind(self, value, source: Optional[tuple] = None):
+        """Bind a value (or list of values) to a new parameter and return its cypher reference."""
+        return self.parameter(value, source).render()
+
+
+def value_expression(value, parameters: Optional[QueryParameters] = None, source: Optional[tuple] = None) -> CypherNode:
+    """Get a Literal property value, or a Parameter if parameters are being bound."""
+    if parameters is None:
+        return Literal(value)
+    return parameters.parameter(value, source)
+
+
+def cypher_value(value, parameters: Optional[QueryParameters] = None, source: Optional[tuple] = None):
+    """Convert property value to a cypher literal, or to a $parameter if parameters are being bound."""
+    return value_expression(value, parameters, source).render()
+
+
+class MatchState:
+    """The nodes bound by the MATCH clauses of a query so far, and the nodes to join on when they are matched again."""
+
+    def __init__(self, join_names=()):
+        """Initialize, join_names are the names of the nodes to join on, see hints.py."""
+        self.bound = set()
+        self.join_names = set(join_names)
 
 
 def convert_constraints(constraints):
@@ -45,6 +92,10 @@ def convert_constraints(constraints):
             constraint["id"] = constraint["id"].removeprefix("biolink:")
             operator = constraint.get("operator", "===")
             if operator == "===":
+                if isinstance(constraint["value"], list):
+                    # a list can't be inlined as a property value, so it isn't bound as a $parameter either: the
+                    # query would only match properties equal to the whole list
+                    raise UnsupportedError(f'Unsupported attribute constraint: {constraint}')
                 props[constraint["id"]] = constraint["value"]
             elif operator == "==":
                 if isinstance(constraint["value"], list):
@@ -75,6 +126,7 @@ class NodeReference:
         max_connectivity = kwargs.get("max_connectivity", -1)
         self.dialect = (kwargs.get("dialect") or "neo4j").lower()
         self.anonymous = kwargs.get("anonymous", False)
+        parameters = kwargs.get("parameters")
 
         node = dict(node)  # shallow copy
         self.name = f"`{node_id}`"
@@ -90,21 +142,34 @@ class NodeReference:
             category = "biolink:NamedThing"
         if isinstance(category, list):
             self.labels = ['biolink:NamedThing']
-            self._filters.append(" OR ".join([
-                "{1} in labels({0})".format(
+            if parameters is not None:
+                self._filters.append("any(category IN {1} WHERE category IN labels({0}))".format(
                     self.name,
-                    cypher_prop_string(ci)
-                )
-                for ci in category
-            ]))
+                    parameters.bind(category, ("categories", node_id)),
+                ))
+            else:
+                self._filters.append(" OR ".join([
+                    "{1} in labels({0})".format(
+                        self.name,
+                        cypher_prop_string(ci)
+                    )
+                    for ci in category
+                ]))
         elif category is not None:
             # coerce to a string
             self.labels = [str(category)]
+        # the categories graph nodes can have, None for any, used to check the meta knowledge graph
+        self.categories = None if category == "biolink:NamedThing" else ensure_list(category)
 
         curie = node.pop("ids", None)
         if isinstance(curie, list) and len(curie) == 1:
             curie = curie[0]
-        if isinstance(curie, list):
+        if isinstance(curie, list) and parameters is not None:
+            self._filters.append("{0}.id in {1}".format(
+                self.name,
+                parameters.bind(curie, ("ids", node_id)),
+            ))
+        elif isinstance(curie, list):
             self._filters.append("{0}.id in [{1}]".format(
                 self.name,
                 ", ".join([
@@ -117,7 +182,16 @@ class NodeReference:
             props["id"] = str(curie)
 
         if max_connectivity > -1:
-            if self.dialect == "neo4j":
+            if parameters is not None:
+                max_connectivity = parameters.bind(max_connectivity, ("max_connectivity",))
+            if kwargs.get("use_degree_property", False):
+                # a range index predicate on the precomputed degree, see degree.py
+                self._filters.append("{0}.`{1}` <= {2}".format(
+                    self.name,
+                    DEGREE_PROPERTY,
+                    max_connectivity,
+                ))
+            elif self.dialect == "neo4j":
                 self._filters.append("COUNT {{ ({0})-[]-() }} < {1} + 1".format(
                     self.name,
                     max_connectivity,
@@ -139,34 +213,26 @@ class NodeReference:
         #     if key not in ("name", "set_interpretation", "constraints")
         # )
 
-        props.update(convert_constraints(node.pop("constraints", [])))
+        constraint_props = convert_constraints(node.pop("constraints", []))
+        props.update(constraint_props)
+        # where each property value comes from in the qgraph, for parameterized queries
+        prop_sources = {key: ("constraints", node_id, key) if key in constraint_props else ("id", node_id)
+                        for key in props}
 
-        self.prop_string = "{" + ", ".join([
-            f"`{key}`: {cypher_prop_string(value)}"
+        properties = PropertyMap([
+            (key, value_expression(value, parameters, prop_sources[key]))
             for key, value in props.items()
             if value is not None and not key.startswith("_")
-        ]) + "}" if props else ""
+        ]) if props else None
+        self.pattern = NodePattern(self.name, self.labels, properties, self.anonymous)
         self._hints = []
-        if curie and self.labels:
-            self._hints.append(f"USING INDEX {self.name}:`{self.labels[0]}`(id)")
-        self._num = 0
+        hint_policy = as_hint_policy(kwargs.get("hint_policy"))
+        if curie and self.labels and (hint_policy is None or hint_policy.index):
+            self._hints.append(IndexHint(self.name, self.labels[0]))
 
     def __str__(self):
-        """Return the cypher node reference."""
-        self._num += 1
-        if self._num > 1:
-            return f"({self.name})"
-        ref = "("
-        elements = []
-        if not self.anonymous:
-            elements.append(self.name)
-        if self.labels:
-            elements.append("".join(f":`{label}`" for label in self.labels))
-        elements = ["".join(elements)]
-        if self.prop_string:
-            elements.append(self.prop_string)
-        ref = "({})".format(" ".join(elements))
-        return ref
+        """Return the cypher node pattern."""
+        return self.pattern.render(self.dialect)
 
     @property
     def filters(self):
@@ -174,8 +240,6 @@ class NodeReference:
 
         To be used in a WHERE clause following the MATCH clause.
         """
-        if self._num > 1:
-            return []
         return self._filters
 
     @property
@@ -184,10 +248,18 @@ class NodeReference:
 
         To be appended to the MATCH clause.
         """
-        if self._num > 1:
-            return []
         return self._hints
 
+    def match(self, state: MatchState):
+        """Get the node pattern, filters and hints for a MATCH clause, a reference to the node if it is bound."""
+        if self.name in state.bound:
+            if self.name in state.join_names:
+                state.join_names.discard(self.name)
+                return NodePattern(self.name), [], [JoinHint(self.name)]
+            return NodePattern(self.name), [], []
+        state.bound.add(self.name)
+        return self.pattern, self._filters, self._hints
+
 
 class MissingReference(NodeReference):
     """Missing node reference object."""
@@ -195,7 +267,21 @@ class MissingReference(NodeReference):
     def __init__(self, name):  # pylint: disable=super-init-not-called
         """Initialize."""
         self.name = f"`{name}`"
-        self._num = 2
+        self.categories = None
+
+    def __str__(self):
+        return f"({self.name})"
+
+    @property
+    def filters(self):
+        return []
+
+    @property
+    def hints(self):
+        return []
+
+    def match(self, state: MatchState):
+        return NodePattern(self.name), [], []
 
 
 class EdgeReference:
@@ -207,9 +293,15 @@ class EdgeReference:
         edge,
         anonymous=False,
         invert=True,
+        subject_categories=None,
+        object_categories=None,
         **kwargs
     ):
-        """Create an edge reference."""
+        """Create an edge reference.
+
+        subject_categories and object_categories are the categories of the qnodes, None for any category, used to
+        match only the predicates between them in the meta knowledge graph.
+        """
         edge = dict(edge)  # make shallow copy
         _subject = edge.pop("subject")
         _object = edge.pop("object")
@@ -227,28 +319,28 @@ class EdgeReference:
         self.qualifier_filters = ""
         self.label = None  #What goes in the [] on the edge in cypher
         self.length = edge.pop("_length", (1, 1))
+        # subclass edges only return the edges of one hop paths, the shortest path to each superclass is enough
+        self.breadth_first = edge.get("_subclass", False)
         invert = invert and edge.pop("_invert", True)
 
         self.inverse_predicates = []
         self.directed = False # Controls whether there is an arrow on the edge in cypher
         self.symmetric = True # Whether the original top-level predicates are all symmetric
         self.cypher_invert = False # If true, then the cypher source node will be subject, if false then object
+        # look up the precomputed canonical and/or symmetric descendants of each predicate and its inverse
+        self.biolink_version = kwargs.get("biolink_version")
+        self.parameters = kwargs.get("parameters")
+        biolink = get_biolink_model(self.biolink_version)
+        predicate_expansions = []
         for predicate in self.predicates:
-            el = bmt.get_element(space_case(predicate[8:]))
-            if el:
-                inverse_predicate = el.inverse
-                if inverse_predicate is not None:
-                    self.inverse_predicates.append(f"biolink:{snake_case(inverse_predicate)}")
-
-                # if symmetric add to inverse list so we query in both directions
-                if el.symmetric:
-                    self.inverse_predicates.append(predicate)
-                else:
-                    self.symmetric = False
-            else:
+            predicate_expansion = biolink.expand_predicate(predicate, PREDICATES_IN_GRAPH)
+            if predicate_expansion is None:
                 error_message = f"Invalid predicate error: (predicate: {predicate}) is not " \
                                 f"a valid biolink model predicate."
                 raise InvalidPredicateError(error_message=error_message)
+            if not predicate_expansion.symmetric:
+                self.symmetric = False
+            predicate_expansions.append(predicate_expansion)
 
         # relationship is directed if any provided predicate is asymmetrical
         if not self.symmetric:
@@ -256,24 +348,23 @@ class EdgeReference:
 
         # get all canonical and/or symmetric descendant predicates
         self.predicates = [
-            f"biolink:{snake_case(p)}"
-            for predicate in self.predicates
-            for p in bmt.get_descendants(space_case(predicate[8:]))
-            if ((not PREDICATES_IN_GRAPH) or p in PREDICATES_IN_GRAPH) and
-            (bmt.get_element(p).annotations.get('canonical_predicate', False)
-             or ('symmetric' in bmt.get_element(p) and bmt.get_element(p).symmetric))
+            p
+            for predicate_expansion in predicate_expansions
+            for p in predicate_expansion.predicates
         ]
         # get all canonical and/or symmetric descendant predicates of inverse predicates if invert flag is true
         # otherwise get rid of all inverse predicates
         self.inverse_predicates = [
-            f"biolink:{snake_case(p)}"
-            for predicate in self.inverse_predicates
-            for p in bmt.get_descendants(space_case(predicate[8:]))
-            if ((not PREDICATES_IN_GRAPH) or p in PREDICATES_IN_GRAPH) and
-            (bmt.get_element(p).annotations.get('canonical_predicate', False)
-             or ('symmetric' in bmt.get_element(p) and bmt.get_element(p).symmetric))
+            p
+            for predicate_expansion in predicate_expansions
+            for p in predicate_expansion.inverse_predicates
         ] if invert else []
 
+        meta_kg = get_meta_kg()
+        # variable length edges, like subclass edges, can match paths with edges of other categories or no edges
+        if meta_kg is not None and self.length == (1, 1):
+            self.__prune_predicates(meta_kg, queried_predicates, subject_categories, object_categories)
+
         unique_preds = list(set(self.predicates + self.inverse_predicates))
         if queried_predicates and not unique_preds:
             raise NoPossibleResultsException(f'A query was made with the following predicates, '
@@ -281,6 +372,7 @@ class EdgeReference:
                                              f'{queried_predicates}')
         #Having the predicates sorted doesn't matter to neo4j, but it helps in testing b/c we get a consistent string.
         unique_preds.sort()
+        self.types = unique_preds
         self.label = "|".join(
             f"`{predicate}`"
             for predicate in unique_preds
@@ -317,14 +409,46 @@ class EdgeReference:
         self.qualifier_filters = self.__qualifier_filters(edge, edge_id)
 
         props = convert_constraints(edge.pop("attribute_constraints", []))
-        self.prop_string = " {" + ", ".join([
-            f"`{key}`: {cypher_prop_string(value)}"
+        self.properties = PropertyMap([
+            (key, value_expression(value, self.parameters, ('attribute_constraints', edge_id, key)))
             for key, value in props.items()
             if value is not None
-        ]) + "}" if props else ""
+        ]) if props else None
+        self.dialect = (kwargs.get("dialect") or "neo4j").lower()
+
+    def __prune_predicates(self, meta_kg, queried_predicates, subject_categories, object_categories):
+        """Remove the predicates that do not connect the subject and object categories in the meta knowledge graph."""
+        def has_edge(predicate, forward):
+            if self.symmetric:
+                # the cypher edge is undirected
+                return meta_kg.has_edge(subject_categories, predicate, object_categories) or \
+                    meta_kg.has_edge(object_categories, predicate, subject_categories)
+            if forward:
+                return meta_kg.has_edge(subject_categories, predicate, object_categories)
+            return meta_kg.has_edge(object_categories, predicate, subject_categories)
+
+        if not queried_predicates:
+            # any predicate, check that the qnodes can be connected at all
+            if (subject_categories is not None or object_categories is not None) and \
+                    not any(has_edge(predicate, True) for predicate in meta_kg.predicates):
+                raise NoPossibleResultsException(f'There are no edges between {subject_categories or "any node"} '
+                                                 f'and {object_categories or "any node"} in the graph queried.')
+            return
+        if not self.predicates and not self.inverse_predicates:
+            # none of them are in the graph, see PREDICATES_IN_GRAPH
+            return
+        self.predicates = [predicate for predicate in self.predicates if has_edge(predicate, True)]
+        self.inverse_predicates = [predicate for predicate in self.inverse_predicates
+                                   if has_edge(predicate, False)]
+        if not self.predicates and not self.inverse_predicates:
+            raise NoPossibleResultsException(f'A query was made with the following predicates, but none of them or '
+                                             f'their descendants connect {subject_categories or "any node"} and '
+                                             f'{object_categories or "any node"} in the graph queried: '
+                                             f'{queried_predicates}')
 
     def __qualifier_filters(self, edge, edge_id):
         constraints = edge.get("qualifier_constraints", [])
+        biolink = get_biolink_model(self.biolink_version)
         ors = []
         for constraint in constraints:
             ands = []
@@ -337,7 +461,7 @@ class EdgeReference:
                 qualifier_type = constraint_filter['qualifier_type_id'].removeprefix('biolink:')
                 queried_qualifier_value = constraint_filter['qualifier_value']
 
-                if not bmt.is_qualifier(qualifier_type):
+                if not biolink.is_qualifier(qualifier_type):
                     raise InvalidQualifierError(f'Invalid qualifier in query: {qualifier_type}')
 
                 # we should do something like this, it does not work without knowing the association type of the edge
@@ -350,18 +474,19 @@ class EdgeReference:
                 qualifier_value_plus_descendants = [queried_qualifier_value]
                 # qualified_predicate doesn't have an enum as values so the following does not apply
                 if qualifier_type != 'qualified_predicate':
-                    permissible_value = False
-                    for enum_for_qualifier_values in ALL_BIOLINK_ENUMS:
-                        if bmt.is_permissible_value_of_enum(enum_name=enum_for_qualifier_values,
-                                                            value=queried_qualifier_value):
-                            permissible_value = True
-                            qualifier_value_plus_descendants += bmt.get_permissible_value_descendants(
-                                permissible_value=queried_qualifier_value,
-                                enum_name=enum_for_qualifier_values)
-                    if not permissible_value:
+                    qualifier_value_enums = biolink.get_qualifier_value_enums(queried_qualifier_value)
+                    for enum_for_qualifier_values, permissible_value_descendants in qualifier_value_enums:
+                        qualifier_value_plus_descendants += permissible_value_descendants
+                    if not qualifier_value_enums:
                         raise InvalidQualifierValueError(
                             f'Invalid value for qualifier {qualifier_type} in query: {queried_qualifier_value}')
 
+                if self.parameters is not None:
+                    # one list parameter, so the query text doesn't depend on the number of descendants
+                    qualifier_values = self.parameters.bind(list(dict.fromkeys(qualifier_value_plus_descendants)))
+                    ands.append(f" ( `{edge_id}`.{qualifier_type} IN {qualifier_values} ) ")
+                    continue
+
                 # Join qualifier value hierarchy with an or
                 qualifier_where_condition = " ( " + " OR ".join(
                     [f"`{edge_id}`.{qualifier_type} = {cypher_prop_string(qualifier_value)}" for qualifier_value in
@@ -376,21 +501,20 @@ class EdgeReference:
         # join multiple qualifier sets with `OR`
         return ' OR '.join(ors)
 
+    @property
+    def pattern(self) -> RelationshipPattern:
+        return RelationshipPattern(
+            self.name,
+            self.types,
+            None if self.length == (1, 1) else self.length,
+            self.properties,
+            self.directed,
+            self.breadth_first,
+        )
+
     def __str__(self):
         """Return the cypher edge reference."""
-        elements = [
-            f":{self.label}" if self.label else "",
-        ]
-        if not self.length == (1, 1):
-            elements.append("*{}..{}".format(
-                self.length[0] if self.length[0] is not None else "",
-                self.length[1] if self.length[1] is not None else "",
-            ))
-        elements.append(f"{self.prop_string}")
-        return "-[`{0}`{1}]-".format(
-            self.name,
-            "".join(elements),
-        ) + (">" if self.directed else "")
+        return self.pattern.render(self.dialect)
 
 
 def build_match_clause(
@@ -398,36 +522,16 @@ def build_match_clause(
         filters=None,
         hints=None,
         qualifier_filters="",
+        optional=False,
         **kwargs,
-):
+) -> MatchClause:
     """Build MATCH clause (and subclauses) from components."""
-    query = ""
-    query += "MATCH " + ", ".join(patterns)
-    reg_filters_cypher = ""
-    qualifier_filters_cypher = ""
-    combine_op = ""
-    has_filters = False
-    if kwargs.get("use_hints", False) and hints:
-        query += " " + " ".join(hints)
+    if not (kwargs.get("use_hints", False) or use_match_clause_hints(kwargs)):
+        hints = None
+    where = None
     if filters or qualifier_filters:
-        if len(filters):
-            has_filters = True
-            if len(filters) > 1:
-                filters = [f"({f})" for f in filters]
-                reg_filters_cypher += " ( " + " AND ".join(filters) + " ) "
-            else:
-                reg_filters_cypher += " ( " + filters[0] + " ) "
-
-        if len(qualifier_filters):
-            has_filters = True
-            qualifier_filters_cypher += f"({qualifier_filters})"
-
-        if len(filters) and len(qualifier_filters):
-            combine_op = " AND "
-    if has_filters:
-        query += " WHERE " + reg_filters_cypher + combine_op + qualifier_filters_cypher
-
-    return query
+        where = Where([Raw(f) for f in filters or []], Raw(qualifier_filters) if qualifier_filters else None)
+    return MatchClause(patterns, hints=hints or (), where=where, optional=optional)
 
 
 def match_edge(
@@ -435,10 +539,15 @@ def match_edge(
     qedge,
     node_references: Dict[str, NodeReference],
     invert=True,
+    state: Optional[MatchState] = None,
     **kwargs,
 ):
     """Get MATCH clause for edge."""
-    eref = EdgeReference(qedge_id, qedge, invert=invert, **kwargs)
+    state = state or MatchState()
+    eref = EdgeReference(qedge_id, qedge, invert=invert,
+                         subject_categories=node_references[qedge["subject"]].categories,
+                         object_categories=node_references[qedge["object"]].categories,
+                         **kwargs)
     if eref.cypher_invert:
         qedge["_cypher_inverted"] = True
         source_node = node_references[qedge["object"]]
@@ -446,20 +555,162 @@ def match_edge(
     else:
         source_node = node_references[qedge["subject"]]
         target_node = node_references[qedge["object"]]
-    pattern = f"{source_node}{eref}{target_node}"
+    source_pattern, source_filters, source_hints = source_node.match(state)
+    target_pattern, target_filters, target_hints = target_node.match(state)
     edge_filters = [
         f"({c})"
-        for c in source_node.filters + target_node.filters + eref.filters
+        for c in source_filters + target_filters + eref.filters
     ]
     return build_match_clause(
-        pattern,
-        hints=source_node.hints + target_node.hints,
+        PathPattern(source_pattern, eref.pattern, target_pattern),
+        hints=source_hints + target_hints,
         filters=edge_filters,
         qualifier_filters=eref.qualifier_filters,
         **kwargs,
     )
 
 
+def match_subclass_closure(
+    qedge_id,
+    qedge,
+    node_references: Dict[str, NodeReference],
+    state: Optional[MatchState] = None,
+    **kwargs,
+):
+    """Get MATCH clause for a subclass edge from the materialized subclass closure, see subclass_closure.py.
+
+    The subclass node is matched by id from the descendants of the superclass node. The subclass_of edge is only
+    matched for direct subclasses, like the variable length edge it replaces only returns edges of one hop paths.
+    """
+    state = state or MatchState()
+    subclass_node = node_references[qedge["subject"]]
+    superclass_node = node_references[qedge["object"]]
+    superclass_pattern, superclass_filters, superclass_hints = superclass_node.match(state)
+    subclass_pattern, subclass_filters, subclass_hints = subclass_node.match(state)
+    descendants = descendants_expression(superclass_node.name, qedge.get("_length", (0, 1))[1])
+    filters = [
+        f"({c})"
+        for c in superclass_filters + subclass_filters
+    ] + [f"{subclass_node.name}.id IN [{superclass_node.name}.id] + {descendants}"]
+    clause = build_match_clause(
+        superclass_pattern, subclass_pattern,
+        hints=superclass_hints + subclass_hints,
+        filters=filters,
+        **kwargs,
+    )
+    subclass_edge = PathPattern(
+        NodePattern(subclass_node.name),
+        RelationshipPattern(qedge_id, ["biolink:subclass_of"], (1, 1), directed=True, breadth_first=True),
+        NodePattern(superclass_node.name),
+    )
+    return Clauses([clause, MatchClause([subclass_edge], optional=True)])
+
+
+def resolve_subclass_qedge(qgraph_nodes, qedge):
+    """Resolve the subclasses of the superclass qnode of a subclass qedge from the subclass hierarchy.
+
+    Keeps the subclass_of edges of direct subclasses in the qedge for transform_result, see hierarchy.py.
+    """
+    hierarchy = get_subclass_hierarchy()
+    if hierarchy is None:
+        raise ValueError("resolve_subclasses needs a subclass hierarchy, see reasoner_transpiler.hierarchy.")
+    resolved = hierarchy.resolve(ensure_list(qgraph_nodes[qedge["object"]]["ids"]), qedge["_length"][1])
+    qedge["_subclass_edges"] = resolved[3]
+    return resolved
+
+
+def list_value(values: list, parameters: Optional[QueryParameters] = None, source: Optional[tuple] = None):
+    """Convert a list of property values to a cypher list literal, or to a $parameter if parameters are being bound."""
+    if parameters is None:
+        return "[" + ", ".join(cypher_prop_string(value) for value in values) + "]"
+    return parameters.bind(values, source)
+
+
+def match_resolved_subclasses(
+    qedge_id,
+    qedge,
+    node_references: Dict[str, NodeReference],
+    queried_ids: list,
+    resolved: tuple,
+    state: Optional[MatchState] = None,
+    **kwargs,
+):
+    """Get MATCH clause for a subclass edge resolved with the subclass hierarchy, see resolve_subclass_qedge().
+
+    The subclass node is matched by the queried ids of the superclass node and their subclasses, paired with the
+    superclass node unless there is one queried id.
+    """
+    parameters = kwargs.get("parameters")
+    state = state or MatchState()
+    subclass_node = node_references[qedge["subject"]]
+    superclass_node = node_references[qedge["object"]]
+    superclass_pattern, superclass_filters, superclass_hints = superclass_node.match(state)
+    subclass_pattern, subclass_filters, subclass_hints = subclass_node.match(state)
+    filters = [
+        f"({c})"
+        for c in superclass_filters + subclass_filters
+    ]
+    # where each value comes from for parameterized queries, see query_cache.QueryTemplate
+    source = ("subclasses", qedge["object"], qedge["_length"][1])
+    subclass_ids, pair_queried_ids, pair_subclass_ids, _ = resolved
+    filters.append(f"{subclass_node.name}.id IN {list_value(subclass_ids, parameters, source + (0,))}")
+    if len(queried_ids) != 1:
+        # like the superclass node, queries of the same shape have one id or a list of ids
+        pair_queried_ids = list_value(pair_queried_ids, parameters, source + (1,))
+        pair_subclass_ids = list_value(pair_subclass_ids, parameters, source + (2,))
+        filters.append(f"any(i IN range(0, size({pair_queried_ids}) - 1) WHERE "
+                       f"{pair_queried_ids}[i] = {superclass_node.name}.id AND "
+                       f"{pair_subclass_ids}[i] = {subclass_node.name}.id)")
+    return build_match_clause(
+        superclass_pattern, subclass_pattern,
+        hints=superclass_hints + subclass_hints,
+        filters=filters,
+        **kwargs,
+    )
+
+
+class CappedBinding(NamedTuple):
+    """How a node that results are capped for is bound, see get_capped_bindings()."""
+    qnode_id: str  # the pinned qnode
+    key: str  # the qnode bound to the node that results are capped for
+    qid: str  # the qnode or subclass qedge matched to bind it
+    qids: Tuple[str, ...]  # the qnodes and qedges bound by matching qid
+
+
+def get_result_key_qnode_id(qnode_id: str, qgraph_nodes: dict) -> str:
+    """Get the qnode bound to the node a result binds to a qnode, like ResultTransformer.add_paths.
+
+    Superclass qnodes are bound to the queried ids, except for qnodes with set_interpretation ALL, which are bound to
+    the matched node.
+    """
+    superclass_qnode_id = f"{qnode_id}_superclass"
+    if superclass_qnode_id in qgraph_nodes and qgraph_nodes[qnode_id].get("set_interpretation", "BATCH") != "ALL":
+        return superclass_qnode_id
+    return qnode_id
+
+
+def get_capped_bindings(qgraph: dict) -> List[CappedBinding]:
+    """Get how the nodes of pinned qnodes, that max_results_per_node caps results for, are bound before the others.
+
+    Superclass qnodes and pinned qnodes without one are bound by their node. Qnodes with set_interpretation ALL and a
+    superclass qnode are bound by matching their subclass qedge.
+    """
+    qgraph_nodes = qgraph["nodes"]
+    bindings = []
+    for qnode_id, qnode in qgraph_nodes.items():
+        if qnode.get("_superclass", False) or not is_pinned(qnode_id, qgraph_nodes):
+            continue
+        key = get_result_key_qnode_id(qnode_id, qgraph_nodes)
+        if key == qnode_id and f"{qnode_id}_superclass" in qgraph_nodes:
+            qedge_id = f"{qnode_id}_subclass_edge"
+            qedge = qgraph["edges"][qedge_id]
+            qids = (qnode_id, qedge["object"]) + (() if qedge.get("_resolved", False) else (qedge_id,))
+            bindings.append(CappedBinding(qnode_id, key, qedge_id, qids))
+        else:
+            bindings.append(CappedBinding(qnode_id, key, key, (key,)))
+    return bindings
+
+
 def match_query(qgraph, subclass=True, **kwargs):
     """Generate a Cypher MATCH clause.
 
@@ -468,6 +719,10 @@ def match_query(qgraph, subclass=True, **kwargs):
 
     qgraph_nodes = qgraph["nodes"]
     qgraph_edges = qgraph["edges"]
+    # resolve the subclasses of pinned qnodes from the subclass hierarchy instead of the graph, see hierarchy.py
+    resolve_subclasses = kwargs.get("resolve_subclasses", False)
+    if resolve_subclasses and kwargs.get("subclass_closure", False):
+        raise ValueError("Only one of resolve_subclasses and subclass_closure can be used.")
 
     # Subclass is just a flag that can turn subclassing off completely.
     # We also check to make sure there is at least one qedge, because we decided that queries with only nodes shouldn't
@@ -481,6 +736,8 @@ def match_query(qgraph, subclass=True, **kwargs):
             if predicates and ("biolink:subclass_of" in predicates or "biolink:superclass_of" in predicates):
                 qnode_ids_with_hierarchy_edges.add(qedge['subject'])
                 qnode_ids_with_hierarchy_edges.add(qedge['object'])
+        # pinned nodes whose ids have no subclasses don't need superclass nodes, if that is known, see hierarchy.py
+        subclass_parents = get_subclass_parents()
         superclasses = {
             # make superclass nodes for the pinned nodes (except ones with explicit subclass edges attached)
             qnode_id + "_superclass": {
@@ -490,6 +747,7 @@ def match_query(qgraph, subclass=True, **kwargs):
             }
             for qnode_id, qnode in qgraph_nodes.items()
             if qnode.get("ids", None) is not None and qnode_id not in qnode_ids_with_hierarchy_edges
+            and (subclass_parents is None or not subclass_parents.are_leaves(qnode["ids"]))
         }
         if 'subclass_depth' in kwargs:
             subclass_depth = kwargs['subclass_depth']
@@ -509,7 +767,8 @@ def match_query(qgraph, subclass=True, **kwargs):
                 "predicates": ["biolink:subclass_of"],
                 "_length": (0, subclass_depth),
                 "_invert": False,
-                "_subclass": True
+                "_subclass": True,
+                **({"_resolved": True} if resolve_subclasses else {}),
             }
             for qnode_id in superclasses
         }
@@ -532,29 +791,76 @@ def match_query(qgraph, subclass=True, **kwargs):
     }
     for node_id in referenced_nodes - defined_nodes:  # reference-only nodes
         node_references[node_id] = MissingReference(node_id)
+    # the nodes bound so far, and the ones to join on when they are matched again
+    state = MatchState()
+    if use_match_clause_hints(kwargs) and as_hint_policy(kwargs["hint_policy"]).join:
+        state.join_names.update(node_references[node_id].name for node_id in get_join_qnode_ids(qgraph))
 
     clauses = []
 
-    # match orphaned nodes
-    for node_id in defined_nodes - referenced_nodes:
+    def match_qedge(qedge_id):
+        if resolve_subclasses and qgraph_edges[qedge_id].get("_subclass", False):
+            return match_resolved_subclasses(
+                qedge_id,
+                qgraph_edges[qedge_id],
+                node_references,
+                ensure_list(qgraph_nodes[qgraph_edges[qedge_id]["object"]]["ids"]),
+                resolve_subclass_qedge(qgraph_nodes, qgraph_edges[qedge_id]),
+                state=state,
+                **kwargs,
+            )
+        if kwargs.get("subclass_closure", False) and qgraph_edges[qedge_id].get("_subclass", False):
+            return match_subclass_closure(
+                qedge_id,
+                qgraph_edges[qedge_id],
+                node_references,
+                state=state,
+                **kwargs,
+            )
+        return match_edge(
+            qedge_id,
+            qgraph_edges[qedge_id],
+            node_references,
+            state=state,
+            **kwargs,
+        )
+
+    # with max_results_per_node, the nodes that results are capped for are bound first, one clause each, see
+    # cypher.cap_results_per_node()
+    capped_bindings = get_capped_bindings(qgraph) if kwargs.get("max_results_per_node") is not None else []
+    for binding in capped_bindings:
+        if binding.qid in qgraph_edges:
+            clauses.append(match_qedge(binding.qid))
+            continue
+        pattern, filters, hints = node_references[binding.qid].match(state)
         clauses.append(build_match_clause(
-            str(node_references[node_id]),
-            hints=node_references[node_id].hints,
-            filters=node_references[node_id].filters,
+            pattern,
+            hints=hints,
+            filters=filters,
             **kwargs,
         ))
+    bound_qedge_ids = {binding.qid for binding in capped_bindings}
 
-    # match edges
-    for qedge_id, qedge in qgraph_edges.items():
-        clauses.append(match_edge(
-            qedge_id,
-            qedge,
-            node_references,
+    # match orphaned nodes, in qgraph order so that the query text is the same for the same qgraph
+    for node_id in [qnode_id for qnode_id in qgraph_nodes if qnode_id not in referenced_nodes]:
+        if node_references[node_id].name in state.bound:
+            continue
+        pattern, filters, hints = node_references[node_id].match(state)
+        clauses.append(build_match_clause(
+            pattern,
+            hints=hints,
+            filters=filters,
             **kwargs,
         ))
 
+    # match edges, in qgraph order or starting from the most selective qnodes
+    qedge_ids = plan_qedges(qgraph) if kwargs.get("use_planner", False) else list(qgraph_edges)
+    for qedge_id in qedge_ids:
+        if qedge_id not in bound_qedge_ids:
+            clauses.append(match_qedge(qedge_id))
+
     return Query(
-        " ".join(clauses),
+        Clauses(clauses),
         qids=defined_nodes | defined_edges,
         references=defined_nodes | referenced_nodes | defined_edges,
         qgraph=qgraph,
@@ -0,0 +1,103 @@
+"""Meta knowledge graph of the (subject category, predicate, object category) triples in the graph.
+
+When a meta knowledge graph is loaded, EdgeReference only matches the relationship types that exist between the
+categories of its qnodes, and raises NoPossibleResultsException when there are none, before querying the database.
+
+Categories are compared with the labels of graph nodes, so the meta knowledge graph should list every category
+label of the nodes, not only the most specific ones. META_KG_QUERY gets such triples from a graph.
+"""
+import json
+import os
+import threading
+from collections import defaultdict
+from typing import Iterable, Optional
+
+META_KG_FILE = os.environ.get('META_KG_FILE')
+
+META_KG_QUERY = "MATCH (s)-[r]->(o) " \
+                "UNWIND labels(s) AS subject UNWIND labels(o) AS object " \
+                "RETURN DISTINCT subject, type(r) AS predicate, object"
+
+
+class MetaKnowledgeGraph:
+    """Index of (subject category, predicate, object category) triples."""
+
+    def __init__(self, triples: Iterable):
+        """Initialize from (subject category, predicate, object category) triples."""
+        # predicate -> subject category -> object categories
+        index = defaultdict(lambda: defaultdict(set))
+        for subject, predicate, object_ in triples:
+            index[predicate][subject].add(object_)
+        self._index = {
+            predicate: {subject: frozenset(objects) for subject, objects in subjects.items()}
+            for predicate, subjects in index.items()
+        }
+
+    @classmethod
+    def from_trapi(cls, meta_knowledge_graph: dict):
+        """Make a MetaKnowledgeGraph from a TRAPI MetaKnowledgeGraph, with edges of subject, predicate and object."""
+        return cls((edge["subject"], edge["predicate"], edge["object"]) for edge in meta_knowledge_graph["edges"])
+
+    @classmethod
+    def load(cls, path):
+        """Load a TRAPI MetaKnowledgeGraph, or a list of [subject, predicate, object] triples, from a JSON file."""
+        with open(path) as meta_kg_file:
+            meta_knowledge_graph = json.load(meta_kg_file)
+        if isinstance(meta_knowledge_graph, dict):
+            return cls.from_trapi(meta_knowledge_graph)
+        return cls(meta_knowledge_graph)
+
+    @property
+    def predicates(self):
+        return self._index.keys()
+
+    def has_edge(self, subject_categories: Optional[list], predicate: str, object_categories: Optional[list]):
+        """Check if there are predicate edges from subject to object categories, None matches any category."""
+        subjects = self._index.get(predicate)
+        if not subjects:
+            return False
+        if subject_categories is None:
+            subject_categories = subjects.keys()
+        for subject_category in subject_categories:
+            objects = subjects.get(subject_category)
+            if objects and (object_categories is None or not objects.isdisjoint(object_categories)):
+                return True
+        return False
+
+
+_META_KG = None
+_META_KG_LOADED = False
+_META_KG_LOCK = threading.Lock()
+
+
+def get_meta_kg() -> Optional[MetaKnowledgeGraph]:
+    """Get the meta knowledge graph, loading META_KG_FILE the first time if it is set, or None."""
+    global _META_KG, _META_KG_LOADED
+    if not _META_KG_LOADED:
+        with _META_KG_LOCK:
+            if not _META_KG_LOADED:
+                _META_KG = MetaKnowledgeGraph.load(META_KG_FILE) if META_KG_FILE else None
+                _META_KG_LOADED = True
+    return _META_KG
+
+
+def set_meta_kg(meta_kg):
+    """Set the meta knowledge graph, from a MetaKnowledgeGraph, a TRAPI MetaKnowledgeGraph or a list of triples."""
+    global _META_KG, _META_KG_LOADED
+    if isinstance(meta_kg, dict):
+        meta_kg = MetaKnowledgeGraph.from_trapi(meta_kg)
+    elif meta_kg is not None and not isinstance(meta_kg, MetaKnowledgeGraph):
+        meta_kg = MetaKnowledgeGraph(meta_kg)
+    _META_KG = meta_kg
+    _META_KG_LOADED = True
+
+
+def load_meta_kg(path):
+    set_meta_kg(MetaKnowledgeGraph.load(path))
+
+
+def reset_meta_kg():
+    """Forget the meta knowledge graph, META_KG_FILE is loaded again the next time it is needed."""
+    global _META_KG, _META_KG_LOADED
+    _META_KG = None
+    _META_KG_LOADED = False
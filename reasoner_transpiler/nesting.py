@@ -2,6 +2,8 @@
 from functools import reduce
 from operator import and_, or_
 
+from .cypher_ast import CallSubquery, CypherNode, Raw, ReturnClause, Union, WithClause
+
 
 class Query():
     """Cypher query segment."""
@@ -13,7 +15,7 @@ class Query():
             references=None,
             qgraph=None,
     ):
-        """Initialize."""
+        """Initialize, string is cypher text or a CypherNode rendered for the dialect the query is compiled for."""
         self._string = string
         self._qids = qids
         self._references = references
@@ -24,6 +26,11 @@ class Query():
         """Get qgraph."""
         return self._qgraph
 
+    @property
+    def clauses(self):
+        """Get the CypherNode of the query, None if it was given as text."""
+        return self._string if isinstance(self._string, CypherNode) else None
+
     def logic(self, simple=True):
         """Return whether qid is required."""
         if simple:
@@ -45,7 +52,7 @@ class Query():
         clauses = []
         imports = ext_context & self.references
         if imports:
-            clauses.append("WITH " + ", ".join(imports))
+            clauses.append(WithClause(imports).render(kwargs.get("dialect")))
         context = context | ext_context
         kwargs.pop("ext_context", None)
         kwargs["context"] = context
@@ -96,21 +103,22 @@ class Query():
         context = kwargs.pop("context", set())
         inner_context = context & self.references
         return [
-            "CALL {{{query}}}".format(
-                query=(
-                    " ".join(self.compile(
-                        ext_context=inner_context,
-                        return_=True,
-                        **kwargs,
-                    ))
-                    .replace("\\", "\\\\")
-                ),
-            ),
+            CallSubquery([Raw(
+                " ".join(self.compile(
+                    ext_context=inner_context,
+                    return_=True,
+                    **kwargs,
+                ))
+                .replace("\\", "\\\\")
+            )]).render(kwargs.get("dialect")),
         ]
 
     def _compile(self, **kwargs):  # pylint: disable=unused-argument
         """Return query string."""
-        return [self._string] if self._string else []
+        string = self._string
+        if isinstance(string, CypherNode):
+            string = string.render(kwargs.get("dialect"))
+        return [string] if string else []
 
     @property
     def references(self):
@@ -130,12 +138,12 @@ class Query():
     def with_clause(self, **kwargs):
         """Get WITH clause."""
         context = kwargs.get("context", set())
-        return "WITH " + ", ".join(self.qids | context)
+        return WithClause(self.qids | context).render(kwargs.get("dialect"))
 
     def return_clause(self, **kwargs):
         """Get RETURN clause."""
         context = kwargs.get("context", set())
-        return "RETURN " + ", ".join(self.qids - context)
+        return ReturnClause(self.qids - context).render(kwargs.get("dialect"))
 
     def __and__(self, other):
         """AND two queries together."""
@@ -285,12 +293,12 @@ class UnionQuery(CompoundQuery):
             return_=self.return_,
         )
 
-        return [" UNION ".join(
-            " ".join(subquery.compile(
+        return [Union([
+            Raw(" ".join(subquery.compile(
                 **kwargs,
-            ))
+            )))
             for subquery in self.subqueries
-        )]
+        ]).render(kwargs.get("dialect"))]
 
 
 class OrQuery(AltQuery):
@@ -0,0 +1,178 @@
+"""Order the MATCH clauses of a query from its most selective qnodes.
+
+match_query matches qedges in qgraph order by default. With use_planner=True, qedges are matched starting from the
+qnodes expected to match the fewest graph nodes (pinned ids, then rare labels), following the qedges expected to
+expand to the fewest neighbours, so that each MATCH is connected to nodes matched before it.
+
+Estimates use graph statistics when they are available, loaded from a JSON file like:
+{
+    "node_count": 1000000,
+    "relationship_count": 5000000,
+    "label_counts": {"biolink:Gene": 40000, ...},
+    "relationship_type_counts": {"biolink:treats": 12000, ...},
+    "degree_percentiles": {"biolink:Gene": {"50": 12, "90": 140, "99": 2000}, ...}
+}
+Plans only depend on the shape of the qgraph (whether qnodes have ids, not which ones), so that queries of the same
+shape get the same plan and can share a compiled query.
+"""
+import json
+import os
+import threading
+from typing import Optional
+
+from .util import ensure_list
+
+GRAPH_STATISTICS_FILE = os.environ.get('GRAPH_STATISTICS_FILE')
+DEGREE_PERCENTILE = "50"
+
+# estimates used without graph statistics
+DEFAULT_NODE_COUNT = 1_000_000
+DEFAULT_LABEL_COUNT = 100_000
+DEFAULT_RELATIONSHIP_COUNT = 1_000_000
+DEFAULT_RELATIONSHIP_TYPE_COUNT = 100_000
+# the fraction of nodes expected to match attribute constraints
+CONSTRAINT_SELECTIVITY = 0.1
+
+GENERIC_LABEL = "biolink:NamedThing"
+
+
+class GraphStatistics:
+    """Counts of nodes and relationships in the graph, used to estimate how selective qnodes and qedges are."""
+
+    def __init__(self, node_count: Optional[int] = None, relationship_count: Optional[int] = None,
+                 label_counts: Optional[dict] = None, relationship_type_counts: Optional[dict] = None,
+                 degree_percentiles: Optional[dict] = None):
+        """Initialize."""
+        self.node_count = node_count or DEFAULT_NODE_COUNT
+        self.relationship_count = relationship_count or DEFAULT_RELATIONSHIP_COUNT
+        self.label_counts = dict(label_counts or {})
+        self.relationship_type_counts = dict(relationship_type_counts or {})
+        self.degree_percentiles = {label: {str(percentile): degree for percentile, degree in percentiles.items()}
+                                   for label, percentiles in (degree_percentiles or {}).items()}
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as statistics_file:
+            return cls(**json.load(statistics_file))
+
+    def label_count(self, label: str):
+        if label in self.label_counts:
+            return self.label_counts[label]
+        return self.node_count if label == GENERIC_LABEL else min(DEFAULT_LABEL_COUNT, self.node_count)
+
+    def relationship_type_count(self, predicates):
+        if not predicates:
+            return self.relationship_count
+        return sum(self.relationship_type_counts.get(
+            predicate, min(DEFAULT_RELATIONSHIP_TYPE_COUNT, self.relationship_count)
+        ) for predicate in predicates)
+
+    def degree(self, label: str):
+        """Get the expected number of relationships of a node with label, None if it is not known."""
+        return self.degree_percentiles.get(label, {}).get(DEGREE_PERCENTILE)
+
+
+_GRAPH_STATISTICS = None
+_GRAPH_STATISTICS_LOCK = threading.Lock()
+DEFAULT_GRAPH_STATISTICS = GraphStatistics()
+
+
+def get_graph_statistics() -> GraphStatistics:
+    """Get the graph statistics, loading GRAPH_STATISTICS_FILE the first time if it is set."""
+    global _GRAPH_STATISTICS
+    if _GRAPH_STATISTICS is None:
+        with _GRAPH_STATISTICS_LOCK:
+            if _GRAPH_STATISTICS is None:
+                _GRAPH_STATISTICS = GraphStatistics.load(GRAPH_STATISTICS_FILE) if GRAPH_STATISTICS_FILE \
+                    else DEFAULT_GRAPH_STATISTICS
+    return _GRAPH_STATISTICS
+
+
+def set_graph_statistics(statistics):
+    """Set the graph statistics used by the planner, from a GraphStatistics or a dict of its fields."""
+    global _GRAPH_STATISTICS
+    if isinstance(statistics, dict):
+        statistics = GraphStatistics(**statistics)
+    _GRAPH_STATISTICS = statistics
+
+
+def load_graph_statistics(path):
+    set_graph_statistics(GraphStatistics.load(path))
+
+
+def reset_graph_statistics():
+    global _GRAPH_STATISTICS
+    _GRAPH_STATISTICS = None
+
+
+def _ensure_list(value):
+    return [] if value is None else ensure_list(value)
+
+
+def _qnode_label(qnode: dict):
+    """Get the label a qnode is matched with, a list of several categories is matched as NamedThing."""
+    categories = _ensure_list(qnode.get("categories"))
+    return categories[0] if len(categories) == 1 else GENERIC_LABEL
+
+
+def estimate_qnode(qnode: dict, statistics: GraphStatistics):
+    """Estimate the number of graph nodes matching a qnode."""
+    if qnode.get("ids") is not None:
+        # pinned, the number of ids is not part of the shape of the qgraph
+        return 1
+    estimate = statistics.label_count(_qnode_label(qnode))
+    if qnode.get("constraints"):
+        estimate *= CONSTRAINT_SELECTIVITY
+    return max(estimate, 1)
+
+
+def estimate_expansion(qnode: dict, qedge: dict, statistics: GraphStatistics):
+    """Estimate the number of relationships of qedge for each graph node matching qnode."""
+    label = _qnode_label(qnode)
+    relationship_type_count = statistics.relationship_type_count(_ensure_list(qedge.get("predicates")))
+    degree = statistics.degree(label)
+    if degree is None:
+        degree = relationship_type_count / max(statistics.label_count(label), 1)
+    return max(min(degree, relationship_type_count), 1)
+
+
+def plan_qedges(qgraph: dict, statistics: Optional[GraphStatistics] = None):
+    """Get the qedge ids of qgraph in the order to match them, see the module docstring."""
+    statistics = statistics or get_graph_statistics()
+    qgraph_nodes = qgraph["nodes"]
+    qgraph_edges = qgraph["edges"]
+    node_estimates = {
+        qnode_id: estimate_qnode(qgraph_nodes[qnode_id], statistics) if qnode_id in qgraph_nodes
+        else statistics.node_count
+        for qedge in qgraph_edges.values()
+        for qnode_id in (qedge["subject"], qedge["object"])
+    }
+
+    def expansion_cost(bound_qnode_id, other_qnode_id, qedge):
+        expansion = estimate_expansion(qgraph_nodes.get(bound_qnode_id, {}), qedge, statistics)
+        return min(expansion, node_estimates[other_qnode_id])
+
+    bound = set()
+    planned = []
+    remaining = list(qgraph_edges)
+    while remaining:
+        costs = []
+        for index, qedge_id in enumerate(remaining):
+            qedge = qgraph_edges[qedge_id]
+            subject, object_ = qedge["subject"], qedge["object"]
+            if subject in bound and object_ in bound:
+                cost = (0, 0)
+            elif subject in bound:
+                cost = (1, expansion_cost(subject, object_, qedge))
+            elif object_ in bound:
+                cost = (1, expansion_cost(object_, subject, qedge))
+            else:
+                # start a new connected part of the query at its most selective qnode
+                start, other = sorted((subject, object_), key=lambda qnode_id: node_estimates[qnode_id])
+                cost = (2, node_estimates[start] * expansion_cost(start, other, qedge))
+            costs.append((cost, index))
+        _, index = min(costs)
+        qedge_id = remaining.pop(index)
+        planned.append(qedge_id)
+        bound.update((qgraph_edges[qedge_id]["subject"], qgraph_edges[qedge_id]["object"]))
+    return planned
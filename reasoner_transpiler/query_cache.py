@@ -0,0 +1,244 @@
+"""Cache of compiled parameterized queries, keyed by the shape of the qgraph.
+
+Queries with the same qgraph shape (the same nodes, edges, categories, predicates, qualifiers and options, but
+possibly different ids and constraint values) compile to the same parameterized cypher. The first query of a shape
+is compiled as usual and stored as a QueryTemplate. The next ones only replay the qgraph changes made while
+compiling (superclass nodes, subclass edges, inverted edge flags), which transform_result relies on, and read their
+parameter values from the qgraph.
+"""
+import copy
+import os
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+from . import matching
+from .biolink import BIOLINK_MODEL_VERSION
+from .hierarchy import get_subclass_hierarchy, get_subclass_parents
+from .matching import check_parameter_value, convert_constraints, resolve_subclass_qedge
+from .meta_kg import get_meta_kg
+from .planner import get_graph_statistics
+
+QUERY_CACHE_SIZE = int(os.environ.get('QUERY_CACHE_SIZE', 256))
+SUPERCLASS_SUFFIX = "_superclass"
+
+
+class QueryCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    max_size: int
+    size: int
+
+
+def _value_shape(value):
+    """Replace a value bound as a parameter with its type, which decides how it is checked and compiled."""
+    return None if value is None else f"<{type(value).__name__}>"
+
+
+def _constraints_shape(constraints):
+    if not isinstance(constraints, list):
+        return constraints
+    return [
+        {**constraint, "value": _value_shape(constraint["value"])}
+        if isinstance(constraint, dict) and "value" in constraint else constraint
+        for constraint in constraints
+    ]
+
+
+def _unwrap(value):
+    """Unwrap a list of one value, like NodeReference does for ids and categories."""
+    if isinstance(value, list) and len(value) == 1:
+        return value[0]
+    return value
+
+
+def _node_shape(node: dict, meta_kg=None, subclass_parents=None):
+    shape = dict(node)
+    if shape.get("ids") is not None:
+        # a single id is a node property, several ids are a list filter
+        shape["ids"] = "<list>" if isinstance(_unwrap(shape["ids"]), list) else "<id>"
+        if subclass_parents is not None and subclass_parents.are_leaves(node["ids"]):
+            # ids without subclasses don't get a superclass node
+            shape["ids"] = f"<leaf {shape['ids'][1:]}"
+    if isinstance(_unwrap(shape.get("categories")), list) and meta_kg is None:
+        # a single category is a label, several categories are a list filter,
+        # unless the predicates matched depend on the categories with a meta knowledge graph
+        shape["categories"] = "<list>"
+    if "constraints" in shape:
+        shape["constraints"] = _constraints_shape(shape["constraints"])
+    return shape
+
+
+def _edge_shape(edge: dict):
+    shape = dict(edge)
+    if "attribute_constraints" in shape:
+        shape["attribute_constraints"] = _constraints_shape(shape["attribute_constraints"])
+    return shape
+
+
+def get_query_fingerprint(qgraph: dict, kwargs: dict):
+    """Get a key for a qgraph and get_query options that is the same for queries of the same shape."""
+    options = dict(kwargs)
+    max_connectivity = options.get("max_connectivity")
+    if isinstance(max_connectivity, int) and max_connectivity > -1:
+        options["max_connectivity"] = "<int>"
+    for count_option in ("skip", "limit", "max_results_per_node"):
+        value = options.get(count_option)
+        if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+            options[count_option] = "<int>"
+    meta_kg = get_meta_kg()
+    subclass_parents = get_subclass_parents()
+    shape = repr([
+        {qnode_id: _node_shape(qnode, meta_kg, subclass_parents) for qnode_id, qnode in qgraph["nodes"].items()},
+        {qedge_id: _edge_shape(qedge) for qedge_id, qedge in qgraph["edges"].items()},
+        sorted(options.items(), key=lambda option: option[0]),
+    ])
+    # predicate expansions also depend on the biolink model version, the predicates in the graph and the meta
+    # knowledge graph, the order of MATCH clauses on the graph statistics when planned, and resolved subclasses on
+    # the subclass hierarchy
+    statistics = get_graph_statistics() if kwargs.get("use_planner", False) else None
+    hierarchy = get_subclass_hierarchy() if kwargs.get("resolve_subclasses", False) else None
+    return shape, kwargs.get("biolink_version") or BIOLINK_MODEL_VERSION, matching.PREDICATES_IN_GRAPH, meta_kg, \
+        statistics, hierarchy, subclass_parents
+
+
+class QueryTemplate:
+    """A compiled parameterized query and what is needed to reuse it for another qgraph of the same shape."""
+
+    def __init__(self, query: str, parameters: matching.QueryParameters, qnode_ids, qgraph: dict):
+        """Initialize from a compiled query, the qnode ids before compiling and the qgraph after compiling."""
+        self.query = query
+        self.sources = dict(parameters.sources)
+        # parameters without a source in the qgraph, e.g. qualifier values and their descendants
+        self.constants = {name: value for name, value in parameters.items() if self.sources[name] is None}
+        self.superclass_qnode_ids = [qnode_id for qnode_id in qgraph["nodes"] if qnode_id not in qnode_ids]
+        self.subclass_qedges = {
+            # the subclass_of edges of resolved subclasses depend on the ids, see matching.resolve_subclass_qedge()
+            qedge_id: copy.deepcopy({key: value for key, value in qedge.items() if key != "_subclass_edges"})
+            for qedge_id, qedge in qgraph["edges"].items()
+            if qedge.get("_subclass", False)
+        }
+        self.inverted_qedge_ids = [qedge_id for qedge_id, qedge in qgraph["edges"].items()
+                                   if qedge.get("_cypher_inverted", False)]
+
+    def apply(self, qgraph: dict, kwargs: dict):
+        """Make the same changes to qgraph as compiling it would, and get the query and its parameters."""
+        qgraph_nodes = qgraph["nodes"]
+        superclasses = {}
+        for superclass_qnode_id in self.superclass_qnode_ids:
+            qnode = qgraph_nodes[superclass_qnode_id[:-len(SUPERCLASS_SUFFIX)]]
+            superclasses[superclass_qnode_id] = {
+                "ids": qnode.pop("ids"),
+                "categories": qnode.pop("categories", None),
+                "_superclass": True
+            }
+        qgraph_nodes.update(superclasses)
+        qgraph["edges"].update({
+            # predicates is the only mutable value of a subclass qedge
+            qedge_id: {**qedge, "predicates": list(qedge["predicates"])}
+            for qedge_id, qedge in self.subclass_qedges.items()
+        })
+        for qedge_id in self.inverted_qedge_ids:
+            qgraph["edges"][qedge_id]["_cypher_inverted"] = True
+        resolved_subclasses = {
+            qedge["object"]: resolve_subclass_qedge(qgraph_nodes, qgraph["edges"][qedge_id])
+            for qedge_id, qedge in self.subclass_qedges.items()
+            if qedge.get("_resolved", False)
+        }
+
+        constraint_props = {}
+
+        def get_constraint_props(kind, qgraph_elements, element_id):
+            if (kind, element_id) not in constraint_props:
+                constraint_props[kind, element_id] = convert_constraints(qgraph_elements[element_id].get(kind, []))
+            return constraint_props[kind, element_id]
+
+        parameters = {}
+        for name, source in self.sources.items():
+            if source is None:
+                parameters[name] = self.constants[name]
+                continue
+            kind = source[0]
+            if kind in ("max_connectivity", "skip", "limit", "max_results_per_node"):
+                value = kwargs[kind]
+            elif kind == "constraints":
+                value = get_constraint_props(kind, qgraph_nodes, source[1])[source[2]]
+            elif kind == "attribute_constraints":
+                value = get_constraint_props(kind, qgraph["edges"], source[1])[source[2]]
+            elif kind == "subclasses":
+                value = resolved_subclasses[source[1]][source[3]]
+            elif kind == "id":
+                value = str(_unwrap(qgraph_nodes[source[1]]["ids"]))
+            else:
+                # "ids" or "categories" lists
+                value = _unwrap(qgraph_nodes[source[1]][kind])
+            check_parameter_value(value)
+            parameters[name] = value
+        return self.query, parameters
+
+
+class QueryCache:
+    """LRU cache of QueryTemplates by qgraph fingerprint."""
+
+    def __init__(self, max_size: int):
+        """Initialize."""
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, fingerprint):
+        with self._lock:
+            template = self._templates.get(fingerprint)
+            if template is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._templates.move_to_end(fingerprint)
+            return template
+
+    def put(self, fingerprint, template: QueryTemplate):
+        with self._lock:
+            self._templates[fingerprint] = template
+            self._evict()
+
+    def resize(self, max_size: int):
+        with self._lock:
+            self.max_size = max_size
+            self._evict()
+
+    def _evict(self):
+        while len(self._templates) > self.max_size:
+            self._templates.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> QueryCacheInfo:
+        with self._lock:
+            return QueryCacheInfo(self.hits, self.misses, self.max_size, len(self._templates))
+
+
+QUERY_CACHE = QueryCache(QUERY_CACHE_SIZE)
+
+
+def get_query_cache_info() -> QueryCacheInfo:
+    """Get the hits, misses, max size and size of the compiled query cache."""
+    return QUERY_CACHE.info()
+
+
+def clear_query_cache():
+    QUERY_CACHE.clear()
+
+
+def set_query_cache_size(max_size: int):
+    """Set the maximum number of compiled queries kept, 0 disables the cache."""
+    QUERY_CACHE.resize(max_size)
+
+
+def reset_query_cache_size():
+    QUERY_CACHE.resize(int(os.environ.get('QUERY_CACHE_SIZE', 256)))
@@ -0,0 +1,162 @@
+"""Read-only lookup tables stored in a memory-mapped file.
+
+Every process that opens the same file maps the same physical pages, so pre-forked (or independently started)
+workers on one host share a single copy of the tables instead of each holding, and dirtying, their own Python
+objects. Tables are string-keyed hash tables with JSON values, values are decoded on lookup. Hot tables can keep
+their decoded values in each process, so that every key is decoded once.
+
+File layout:
+    MAGIC, header length (uint32), JSON header, then for each table an entries array, a slots array and the
+    key/value data. Entries are (key offset, key length, value offset, value length) uint32s in insertion order.
+    Slots are an open addressing hash table of entry index + 1 (0 is empty) keyed by crc32 of the key.
+"""
+import json
+import mmap
+import os
+import sys
+import zlib
+from array import array
+from collections.abc import Mapping
+from pathlib import Path
+
+MAGIC = b"RTTABLES"
+_UINT32 = "I"
+
+
+def _align(buffer: bytearray):
+    buffer.extend(b"\0" * (-len(buffer) % 4))
+
+
+def write_shared_tables(path, tables: dict):
+    """Write a dict of table name -> mapping of str -> JSON-serializable value to a shared tables file.
+
+    The file is written to a temporary file first and moved into place, so concurrent writers and readers
+    never see a partial file.
+    """
+    path = Path(path)
+    body = bytearray()
+    header = {"byteorder": sys.byteorder, "tables": {}}
+    for table_name, table in tables.items():
+        keys = [key.encode("utf-8") for key in table]
+        values = [json.dumps(value, separators=(",", ":")).encode("utf-8") for value in table.values()]
+        num_slots = 8
+        while num_slots < 2 * len(keys):
+            num_slots *= 2
+
+        data_offset = len(body) + 16 * len(keys) + 4 * num_slots
+        entries = array(_UINT32)
+        data = bytearray()
+        for key, value in zip(keys, values):
+            entries.extend([data_offset + len(data), len(key), data_offset + len(data) + len(key), len(value)])
+            data.extend(key)
+            data.extend(value)
+
+        slots = array(_UINT32, [0] * num_slots)
+        for entry_index, key in enumerate(keys):
+            slot = zlib.crc32(key) & (num_slots - 1)
+            while slots[slot]:
+                slot = (slot + 1) & (num_slots - 1)
+            slots[slot] = entry_index + 1
+
+        header["tables"][table_name] = [len(body), len(keys), len(body) + 16 * len(keys), num_slots]
+        body.extend(entries.tobytes())
+        body.extend(slots.tobytes())
+        body.extend(data)
+        _align(body)
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    prefix = bytearray(MAGIC + array(_UINT32, [len(header_bytes)]).tobytes() + header_bytes)
+    _align(prefix)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(temp_path, "wb") as stream:
+        stream.write(prefix)
+        stream.write(body)
+    os.replace(temp_path, path)
+
+
+def open_shared_tables(path, value_factories=None, cached_tables=()) -> dict:
+    """Map a shared tables file and return a dict of table name -> SharedTable.
+
+    value_factories optionally maps a table name to a function applied to its decoded values. The tables named in
+    cached_tables keep the values they decode, their values must not be modified.
+    """
+    value_factories = value_factories or {}
+    with open(path, "rb") as stream:
+        mapped_file = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    buffer = memoryview(mapped_file)
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a shared tables file")
+    header_length = buffer[len(MAGIC):len(MAGIC) + 4].cast(_UINT32)[0]
+    header_end = len(MAGIC) + 4 + header_length
+    header = json.loads(bytes(buffer[len(MAGIC) + 4:header_end]))
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError(f"{path} was written on a {header['byteorder']} endian machine")
+    body = buffer[header_end + (-header_end % 4):]
+    return {
+        table_name: SharedTable(body, *table_layout,
+                                value_factory=value_factories.get(table_name),
+                                cache_values=table_name in cached_tables)
+        for table_name, table_layout in header["tables"].items()
+    }
+
+
+class SharedTable(Mapping):
+    """Read-only str -> value mapping backed by a memory-mapped shared tables file."""
+
+    def __init__(self, body, entries_offset, num_entries, slots_offset, num_slots, value_factory=None,
+                 cache_values=False):
+        """Initialize."""
+        self._body = body
+        self._entries = body[entries_offset:entries_offset + 16 * num_entries].cast(_UINT32)
+        self._slots = body[slots_offset:slots_offset + 4 * num_slots].cast(_UINT32)
+        self._num_entries = num_entries
+        self._mask = num_slots - 1
+        self._value_factory = value_factory
+        # key -> decoded value, in front of the lookup in the mapped file, private to this process
+        self._values = {} if cache_values else None
+
+    def _find(self, key):
+        """Get the entry index for a key, or -1."""
+        if not isinstance(key, str):
+            return -1
+        key_bytes = key.encode("utf-8")
+        slot = zlib.crc32(key_bytes) & self._mask
+        while True:
+            entry_index = self._slots[slot] - 1
+            if entry_index < 0:
+                return -1
+            key_offset, key_length = self._entries[4 * entry_index], self._entries[4 * entry_index + 1]
+            if self._body[key_offset:key_offset + key_length] == key_bytes:
+                return entry_index
+            slot = (slot + 1) & self._mask
+
+    def _key(self, entry_index):
+        key_offset, key_length = self._entries[4 * entry_index], self._entries[4 * entry_index + 1]
+        return str(self._body[key_offset:key_offset + key_length], "utf-8")
+
+    def _value(self, entry_index):
+        value_offset, value_length = self._entries[4 * entry_index + 2], self._entries[4 * entry_index + 3]
+        value = json.loads(bytes(self._body[value_offset:value_offset + value_length]))
+        return self._value_factory(value) if self._value_factory else value
+
+    def __getitem__(self, key):
+        if self._values is not None and key in self._values:
+            return self._values[key]
+        entry_index = self._find(key)
+        if entry_index < 0:
+            raise KeyError(key)
+        value = self._value(entry_index)
+        if self._values is not None:
+            self._values[key] = value
+        return value
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def __iter__(self):
+        return (self._key(entry_index) for entry_index in range(self._num_entries))
+
+    def __len__(self):
+        return self._num_entries
@@ -0,0 +1,86 @@
+"""Materialized subclass closure, so subclass expansion doesn't need a variable length traversal.
+
+Each node with subclasses gets a subclass_descendants property, the ids of its descendants ordered by depth, and a
+subclass_descendant_counts property, the number of descendants up to each depth. With subclass_closure=True, get_query
+matches the subclasses of pinned qnodes by id from these properties instead of traversing subclass_of edges.
+
+Build the closure from a graph's edges, in the CSV or JSON formats of the test databases, and load it with
+SUBCLASS_CLOSURE_QUERY:
+
+python -m reasoner_transpiler.subclass_closure edges.csv --max-depth 5 -o closure.json
+"""
+import json
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Tuple
+
+from .hierarchy import load_graph_records
+
+DESCENDANTS_PROPERTY = "subclass_descendants"
+DESCENDANT_COUNTS_PROPERTY = "subclass_descendant_counts"
+
+SUBCLASS_CLOSURE_QUERY = "UNWIND $closure AS row MATCH (n {id: row.id}) " \
+                         f"SET n.{DESCENDANTS_PROPERTY} = row.{DESCENDANTS_PROPERTY}, " \
+                         f"n.{DESCENDANT_COUNTS_PROPERTY} = row.{DESCENDANT_COUNTS_PROPERTY} " \
+                         "RETURN count(*)"
+
+
+def descendants_expression(node_name: str, depth: int) -> str:
+    """Get a cypher expression for the ids of the descendants of a node up to depth, not including itself."""
+    if depth < 1:
+        return "[]"
+    descendants = f"{node_name}.{DESCENDANTS_PROPERTY}"
+    # the counts list is as long as the deepest descendant, so the whole list is used past it
+    return f"coalesce({descendants}[..{node_name}.{DESCENDANT_COUNTS_PROPERTY}[{depth - 1}]], {descendants}, [])"
+
+
+def load_edges(path) -> Iterable[Tuple[str, str, str]]:
+    """Load (subject, predicate, object) edges from a CSV file with a header, or a JSON list of edge objects."""
+    return [(edge["subject"], edge["predicate"], edge["object"]) for edge in load_graph_records(path)]
+
+
+def build_subclass_closure(edges: Iterable[Tuple[str, str, str]], max_depth: Optional[int] = None) -> Dict[str, dict]:
+    """Build the subclass closure properties of the nodes with subclasses, by node id.
+
+    Descendants are found through subclass_of edges, at their shortest depth, up to max_depth.
+    """
+    children = defaultdict(set)
+    for subject, predicate, object_ in edges:
+        if predicate == "biolink:subclass_of":
+            children[object_].add(subject)
+
+    closure = {}
+    for node_id in sorted(children):
+        seen = {node_id}
+        descendants = []
+        counts = []
+        level = [node_id]
+        while level and (max_depth is None or len(counts) < max_depth):
+            level = sorted({child for parent in level for child in children.get(parent, ()) if child not in seen})
+            if not level:
+                break
+            seen.update(level)
+            descendants.extend(level)
+            counts.append(len(descendants))
+        closure[node_id] = {DESCENDANTS_PROPERTY: descendants, DESCENDANT_COUNTS_PROPERTY: counts}
+    return closure
+
+
+def main(args=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the subclass closure properties of a graph.")
+    parser.add_argument("edges", help="CSV file with subject, predicate and object columns, or a JSON list of edges")
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("-o", "--output", default=None, help="JSON file for the closure, printed if not given")
+    args = parser.parse_args(args)
+
+    closure = build_subclass_closure(load_edges(args.edges), args.max_depth)
+    rows = [{"id": node_id, **properties} for node_id, properties in closure.items()]
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(rows, output_file, indent=2)
+    else:
+        print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
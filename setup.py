@@ -1,5 +1,27 @@
 """Setup reasoner-transpiler package."""
+import os
+import subprocess
+import sys
+
 from setuptools import setup
+from setuptools.command.build_py import build_py
+
+
+class BuildPy(build_py):
+    """Build the Biolink model snapshot of the default version into the package, if it isn't there.
+
+    Needs the requirements installed and network access, see reasoner_transpiler/biolink_snapshot.py.
+    """
+
+    def run(self):
+        # write to the package biolink_snapshots directory, not BL_SNAPSHOT_DIR
+        env = {key: value for key, value in os.environ.items() if key != "BL_SNAPSHOT_DIR"}
+        subprocess.run([sys.executable, "-m", "reasoner_transpiler.biolink_snapshot", "--skip-existing"],
+                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                       env=env,
+                       check=True)
+        super().run()
+
 
 setup(
     name="reasoner-transpiler",
@@ -13,7 +35,8 @@ setup(
     long_description=open('README.md').read(),
     long_description_content_type='text/markdown',
     packages=["reasoner_transpiler"],
-    package_data={"reasoner_transpiler": ["attribute_types.json"]},
+    package_data={"reasoner_transpiler": ["attribute_types.json", "biolink_snapshots/*.json.gz"]},
+    cmdclass={"build_py": BuildPy},
     install_requires=[
         "bmt==1.4.6",
     ],
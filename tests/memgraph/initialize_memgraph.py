@@ -2,11 +2,16 @@
 """Initialize memgraph database."""
 import argparse
 import logging
+import os
 import time
 
 from neo4j import GraphDatabase
 from neo4j.exceptions import ServiceUnavailable, DatabaseUnavailable, ClientError
 
+from reasoner_transpiler.degree import DEGREE_PROPERTY, DEGREE_QUERY, count_degrees
+from reasoner_transpiler.hierarchy import load_graph_records
+from reasoner_transpiler.subclass_closure import SUBCLASS_CLOSURE_QUERY, build_subclass_closure, load_edges
+
 LOGGER = logging.getLogger(__name__)
 
 def get_driver(url):
@@ -68,6 +73,19 @@ def main(hash: str = None):
                             "->(o)"
                              "RETURN count(*);")
         print(f'Edges added: {result.single()["count(*)"]}')
+        # materialized subclass closure, for queries with subclass_closure=True
+        closure = build_subclass_closure(load_edges(os.path.join(os.path.dirname(__file__), "memgraph_json", "edges.json")))
+        result = session.run(SUBCLASS_CLOSURE_QUERY,
+                             closure=[{"id": node_id, **properties} for node_id, properties in closure.items()])
+        print(f'Subclass closures added: {result.single()["count(*)"]}')
+        # node degrees, for queries with use_degree_property=True
+        graph_dir = os.path.join(os.path.dirname(__file__), "memgraph_json")
+        degrees = count_degrees(((edge["subject"], edge["object"]) for edge in
+                                 load_graph_records(os.path.join(graph_dir, "edges.json"))),
+                                [node["id"] for node in load_graph_records(os.path.join(graph_dir, "nodes.json"))])
+        result = session.run(DEGREE_QUERY,
+                             degrees=[{"id": node_id, DEGREE_PROPERTY: degree} for node_id, degree in degrees.items()])
+        print(f'Node degrees added: {result.single()["count(*)"]}')
     driver.close()
     LOGGER.info("Done. Memgraph is ready for testing.")
 
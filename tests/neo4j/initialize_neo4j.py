@@ -2,12 +2,17 @@
 """Initialize neo4j database."""
 import argparse
 import logging
+import os
 import time
 
 import neo4j.exceptions
 from neo4j import GraphDatabase
 from neo4j.exceptions import ServiceUnavailable, DatabaseUnavailable, ClientError
 
+from reasoner_transpiler.degree import DEGREE_PROPERTY, DEGREE_QUERY, count_degrees
+from reasoner_transpiler.hierarchy import load_graph_records
+from reasoner_transpiler.subclass_closure import SUBCLASS_CLOSURE_QUERY, build_subclass_closure, load_edges
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -65,6 +70,19 @@ def main(hash: str = None):
                     "RETURN count(*)")
         print(f'Edges added: {result.single()["count(*)"]}')
         result.consume()  # this looks like it doesn't do anything, but it's needed to throw errors if they occur
+        # materialized subclass closure, for queries with subclass_closure=True
+        closure = build_subclass_closure(load_edges(os.path.join(os.path.dirname(__file__), "neo4j_csv", "edges.csv")))
+        result = session.run(SUBCLASS_CLOSURE_QUERY,
+                             closure=[{"id": node_id, **properties} for node_id, properties in closure.items()])
+        print(f'Subclass closures added: {result.single()["count(*)"]}')
+        # node degrees, for queries with use_degree_property=True
+        graph_dir = os.path.join(os.path.dirname(__file__), "neo4j_csv")
+        degrees = count_degrees(((edge["subject"], edge["object"]) for edge in
+                                 load_graph_records(os.path.join(graph_dir, "edges.csv"))),
+                                [node["id"] for node in load_graph_records(os.path.join(graph_dir, "nodes.csv"))])
+        result = session.run(DEGREE_QUERY,
+                             degrees=[{"id": node_id, DEGREE_PROPERTY: degree} for node_id, degree in degrees.items()])
+        print(f'Node degrees added: {result.single()["count(*)"]}')
 
     driver.close()
     LOGGER.info("Done. Neo4j is ready for testing.")
@@ -0,0 +1,79 @@
+"""Test batches of same-shape qgraphs run as one query."""
+import copy
+
+import pytest
+
+from reasoner_transpiler.cypher import compile_batch_query, compile_query, transform_batch_result, \
+    transform_result
+from .fixtures import fixture_db_driver
+from .test_compiled_query import QGRAPH, make_record
+
+
+def make_qgraph(curie):
+    qgraph = copy.deepcopy(QGRAPH)
+    qgraph["nodes"]["n0"]["ids"] = [curie]
+    return qgraph
+
+
+def test_compile_batch_query():
+    """Test that a batch query unwinds the parameters of each qgraph of the batch."""
+    qgraphs = [make_qgraph("MONDO:0000001"), make_qgraph("MONDO:0005148")]
+    batch_query = compile_batch_query(qgraphs, dialect="memgraph")
+    assert len(batch_query) == 2
+    assert batch_query.query.startswith("UNWIND range(0, size($batch) - 1) AS __batch_index ")
+    assert "MONDO:" not in batch_query.query
+    assert "__batch.p0" in batch_query.query and "$p0" not in batch_query.query
+    assert batch_query.query.endswith("RETURN collect(__batch_index) AS batch_indexes, collect(nodes) AS nodes, "
+                                      "collect(edges) AS edges, collect(paths) AS paths")
+    assert [parameters["p0"] for parameters in batch_query.parameters["batch"]] == ["MONDO:0000001",
+                                                                                    "MONDO:0005148"]
+    # the qgraphs are left as they are
+    assert qgraphs[0] == QGRAPH
+
+
+def test_batch_different_shapes():
+    """Test that qgraphs of different shapes cannot be batched."""
+    other_qgraph = copy.deepcopy(QGRAPH)
+    other_qgraph["edges"]["e01"]["predicates"] = ["biolink:affects"]
+    with pytest.raises(ValueError):
+        compile_batch_query([QGRAPH, other_qgraph])
+    with pytest.raises(ValueError):
+        compile_batch_query([])
+
+
+def test_transform_batch_result():
+    """Test that a batch record is split into a TRAPI response for each qgraph, in batch order."""
+    batch_query = compile_batch_query([make_qgraph("MONDO:0005148"), QGRAPH, QGRAPH])
+    record = make_record()
+    # only the second qgraph of the batch has results
+    batch_record = {
+        "batch_indexes": [1],
+        "nodes": [record["nodes"]],
+        "edges": [record["edges"]],
+        "paths": [record["paths"]],
+    }
+    responses = transform_batch_result(batch_record, batch_query)
+    assert len(responses) == 3
+    assert responses[1] == transform_result(make_record(), compile_query(QGRAPH))
+    assert responses[0]["results"] == [] and responses[2]["results"] == []
+
+
+def test_batch_results(db_driver):
+    """Test that a batch query gives the same results as running each qgraph of the batch."""
+    dialect, driver = db_driver
+    qgraphs = [
+        {
+            "nodes": {"n0": {"ids": [curie]}, "n1": {"categories": ["biolink:Gene"]}},
+            "edges": {"e01": {"subject": "n0", "object": "n1"}},
+        }
+        for curie in ["MONDO:0005148", "CHEBI:6801", "MONDO:0000000"]
+    ]
+    expected = []
+    for qgraph in qgraphs:
+        compiled_query = compile_query(qgraph, dialect=dialect, parameterized=True)
+        record = driver.run(compiled_query.query, query_parameters=compiled_query.parameters)[0]
+        expected.append(transform_result(record, compiled_query))
+    batch_query = compile_batch_query(qgraphs, dialect=dialect)
+    record = driver.run(batch_query.query, query_parameters=batch_query.parameters)[0]
+    assert transform_batch_result(record, batch_query) == expected
+    assert expected[0]["results"]
@@ -0,0 +1,96 @@
+"""Micro-benchmarks for hot paths in query compilation and result transformation."""
+import time
+
+from reasoner_transpiler import attributes
+from reasoner_transpiler.attributes import transform_attributes
+from reasoner_transpiler.biolink import BiolinkModel, get_biolink_model
+from reasoner_transpiler.cypher import get_query
+from reasoner_transpiler.query_cache import clear_query_cache, get_query_cache_info, set_query_cache_size, \
+    reset_query_cache_size
+
+NUM_EDGES = 10000
+NUM_QUERIES = 1000
+
+
+def make_edge_properties(edge_index):
+    return {
+        "primary_knowledge_source": "infores:test",
+        "aggregator_knowledge_source": ["infores:aggregator"],
+        "object_aspect_qualifier": "activity",
+        "object_direction_qualifier": "increased",
+        "qualified_predicate": "biolink:causes",
+        "publications": [f"PMID:{edge_index}"],
+        "knowledge_level": "knowledge_assertion",
+        "agent_type": "manual_agent",
+        "p_value": 0.01,
+        "score": edge_index,
+    }
+
+
+def test_edge_qualifier_detection_benchmark(monkeypatch):
+    """Measure the per-edge cost of transforming edge properties, most of which are checked for qualifiers."""
+    biolink = get_biolink_model()
+    edges = [make_edge_properties(edge_index) for edge_index in range(NUM_EDGES)]
+    transform_attributes(make_edge_properties(0), node=False)  # populate attribute types before timing
+
+    start = time.perf_counter()
+    for edge in edges:
+        [key for key in edge if key in biolink.qualifiers]
+    qualifier_detection_cost = (time.perf_counter() - start) / NUM_EDGES
+
+    start = time.perf_counter()
+    transformed_edges = [transform_attributes(edge, node=False) for edge in edges]
+    transform_cost = (time.perf_counter() - start) / NUM_EDGES
+
+    print(f"\nqualifier detection: {qualifier_detection_cost * 1e6:.2f} us/edge, "
+          f"transform_attributes: {transform_cost * 1e6:.2f} us/edge")
+    assert len(transformed_edges[0]["qualifiers"]) == 3
+
+    # timings vary too much between machines to assert on, check that keys are not looked up in the model instead
+    lookups = []
+
+    def count_lookups(*args, **kwargs):
+        lookups.append(args)
+        return biolink
+
+    def no_per_key_lookups(*args, **kwargs):
+        raise AssertionError("transform_attributes looked a key up in the biolink model")
+
+    monkeypatch.setattr(attributes, "get_biolink_model", count_lookups)
+    for method in ("is_qualifier", "get_element", "get_predicate"):
+        monkeypatch.setattr(BiolinkModel, method, no_per_key_lookups)
+    edges = [make_edge_properties(edge_index) for edge_index in range(10)]
+    assert [transform_attributes(edge, node=False) for edge in edges] == transformed_edges[:10]
+    # once for each edge, not for each key
+    assert len(lookups) == 10
+
+
+def test_query_cache_benchmark():
+    """Measure compiling queries of one shape with and without the compiled query cache."""
+    clear_query_cache()
+
+    def make_qgraph(query_index):
+        return {
+            "nodes": {
+                "n0": {"categories": ["biolink:Disease"], "ids": [f"MONDO:{query_index:07d}"]},
+                "n1": {"categories": ["biolink:ChemicalEntity", "biolink:Drug"]},
+            },
+            "edges": {
+                "e01": {"subject": "n1", "object": "n0", "predicates": ["biolink:treats"]},
+            },
+        }
+
+    start = time.perf_counter()
+    for query_index in range(NUM_QUERIES):
+        get_query(make_qgraph(query_index), parameterized=True, max_connectivity=1000)
+    cached_cost = (time.perf_counter() - start) / NUM_QUERIES
+
+    set_query_cache_size(0)
+    start = time.perf_counter()
+    for query_index in range(NUM_QUERIES):
+        get_query(make_qgraph(query_index), parameterized=True, max_connectivity=1000)
+    uncached_cost = (time.perf_counter() - start) / NUM_QUERIES
+    reset_query_cache_size()
+
+    print(f"\nget_query: {cached_cost * 1e6:.2f} us/query cached, {uncached_cost * 1e6:.2f} us/query uncached")
+    assert get_query_cache_info().hits == NUM_QUERIES - 1
@@ -0,0 +1,74 @@
+"""Test precomputed biolink model snapshots."""
+import pytest
+from bmt import Toolkit
+
+from reasoner_transpiler.biolink import BiolinkModel, build_biolink_tables, load_biolink_model, BIOLINK_MODEL_VERSION, \
+    BIOLINK_MODEL_SCHEMA_URL, PREDICATE_MAP_URL
+from reasoner_transpiler.biolink_snapshot import build_snapshot, get_snapshot_path, read_snapshot, write_snapshot, \
+    PACKAGE_SNAPSHOT_DIR
+
+
+def test_snapshot_matches_toolkit(tmp_path):
+    """Test that a snapshot written to disk and read back gives the same answers as the toolkit."""
+    try:
+        # downloads the biolink model
+        toolkit = Toolkit(schema=BIOLINK_MODEL_SCHEMA_URL, predicate_map=PREDICATE_MAP_URL)
+    except Exception as error:  # pylint: disable=broad-except
+        pytest.skip(f"The toolkit can't load the biolink model: {error!r}")
+    snapshot_path = get_snapshot_path(BIOLINK_MODEL_VERSION, tmp_path)
+    write_snapshot(build_snapshot(toolkit, BIOLINK_MODEL_VERSION), snapshot_path)
+    biolink = BiolinkModel(build_biolink_tables(read_snapshot(snapshot_path)))
+    assert biolink.version == BIOLINK_MODEL_VERSION
+
+    for predicate in ["affects", "affected by", "correlated with", "treats", "related to"]:
+        element = toolkit.get_element(predicate)
+        assert biolink.get_predicate(predicate)["inverse"] == element.inverse
+        assert biolink.get_predicate(predicate)["symmetric"] == bool(element.symmetric)
+        assert set(biolink.get_descendants(predicate)) == set(toolkit.get_descendants(predicate))
+    assert biolink.get_predicate("invalid predicate") is None
+
+    for qualifier in ["object_aspect_qualifier", "qualified_predicate", "publications", "knowledge_level"]:
+        assert biolink.is_qualifier(qualifier) == toolkit.is_qualifier(qualifier)
+
+    assert set(biolink.enums) == set(toolkit.view.all_enums())
+    enum_name = "GeneOrGeneProductOrChemicalEntityAspectEnum"
+    assert biolink.is_permissible_value_of_enum(enum_name, "activity")
+    assert not biolink.is_permissible_value_of_enum(enum_name, "not_a_value")
+    assert set(biolink.get_permissible_value_descendants("activity_or_abundance", enum_name)) == \
+        set(toolkit.get_permissible_value_descendants("activity_or_abundance", enum_name))
+
+    assert biolink.get_element("publications") == {"slot_uri": "biolink:publications"}
+    assert biolink.get_element("gene") == {"class_uri": "biolink:Gene"}
+    assert biolink.get_element("not_a_biolink_element") is None
+
+
+def test_load_biolink_model_from_snapshot(tmp_path):
+    """Test that an available snapshot is used instead of the toolkit."""
+    snapshot = {
+        "format_version": 1,
+        "biolink_version": "0.0.1",
+        "predicates": {
+            "related to": {"descendants": ["related to", "treats"], "inverse": None,
+                           "symmetric": True, "canonical": False},
+            "treats": {"descendants": ["treats"], "inverse": "treated by", "symmetric": False, "canonical": True},
+            "treated by": {"descendants": ["treated by"], "inverse": "treats", "symmetric": False, "canonical": False},
+        },
+        "qualifiers": ["object aspect qualifier"],
+        "enums": {"AspectEnum": {"activity": ["activity"]}},
+        "elements": {"treats": {"slot_uri": "biolink:treats"}},
+        "aliases": {"cures": "treats"},
+    }
+    write_snapshot(snapshot, get_snapshot_path("0.0.1", tmp_path))
+    biolink = load_biolink_model("0.0.1", snapshot_dir=tmp_path)
+    assert biolink.version == "0.0.1"
+    assert biolink.get_descendants("related to") == ["related to", "treats"]
+    assert biolink.get_predicate("biolink:treats")["canonical"]
+    assert biolink.is_qualifier("biolink:object_aspect_qualifier")
+    assert biolink.get_element("Cures") == {"slot_uri": "biolink:treats"}
+
+
+def test_packaged_snapshot():
+    """Test that the package ships the snapshot of the default biolink model version, built by setup.py."""
+    snapshot_path = get_snapshot_path(BIOLINK_MODEL_VERSION, PACKAGE_SNAPSHOT_DIR)
+    assert snapshot_path.exists()
+    assert read_snapshot(snapshot_path)["biolink_version"] == BIOLINK_MODEL_VERSION
@@ -0,0 +1,119 @@
+"""Test using several Biolink model versions in one process."""
+import threading
+from collections import OrderedDict
+
+import pytest
+
+from reasoner_transpiler import attributes, biolink, biolink_snapshot, cypher
+from reasoner_transpiler.attributes import transform_attributes
+from reasoner_transpiler.biolink import get_biolink_model, get_loaded_biolink_versions, \
+    set_biolink_model_cache_size, reset_biolink_model_cache_size
+from reasoner_transpiler.biolink_snapshot import get_snapshot_path, write_snapshot
+from reasoner_transpiler.cypher import get_query, transform_result
+from reasoner_transpiler.exceptions import InvalidPredicateError
+
+
+def make_snapshot(biolink_version, predicates, qualifiers):
+    """Make a minimal snapshot with "related to" and the given predicates."""
+    return {
+        "format_version": biolink_snapshot.SNAPSHOT_FORMAT_VERSION,
+        "biolink_version": biolink_version,
+        "predicates": {
+            "related to": {"descendants": ["related to", *predicates], "inverse": None,
+                           "symmetric": True, "canonical": False},
+            **{predicate: {"descendants": [predicate], "inverse": None, "symmetric": False, "canonical": True}
+               for predicate in predicates},
+        },
+        "qualifiers": qualifiers,
+        "enums": {},
+        "elements": {predicate: {"slot_uri": f"biolink:{predicate.replace(' ', '_')}"} for predicate in predicates},
+        "aliases": {},
+    }
+
+
+@pytest.fixture
+def biolink_versions(tmp_path, monkeypatch):
+    """Two made up biolink versions and an empty biolink model registry."""
+    write_snapshot(make_snapshot("1.0.0", ["treats"], ["object aspect qualifier"]),
+                   get_snapshot_path("1.0.0", tmp_path))
+    write_snapshot(make_snapshot("2.0.0", ["treats", "ameliorates condition"], ["object direction qualifier"]),
+                   get_snapshot_path("2.0.0", tmp_path))
+    monkeypatch.setattr(biolink_snapshot, "SNAPSHOT_DIR", tmp_path)
+    monkeypatch.setattr(biolink, "_BIOLINK_MODELS", OrderedDict())
+    yield
+    reset_biolink_model_cache_size()
+
+
+def test_query_biolink_version(biolink_versions):
+    """Test that get_query expands predicates with the requested biolink model version."""
+    qgraph = {
+        "nodes": {"n0": {}, "n1": {}},
+        "edges": {"e01": {"subject": "n0", "object": "n1", "predicates": ["biolink:ameliorates_condition"]}},
+    }
+    with pytest.raises(InvalidPredicateError):
+        get_query(qgraph, biolink_version="1.0.0")
+    assert "`biolink:ameliorates_condition`" in get_query(qgraph, biolink_version="2.0.0")
+
+
+def test_transform_attributes_biolink_version(biolink_versions):
+    """Test that qualifiers and attribute types come from the requested biolink model version."""
+    edge = {"object_aspect_qualifier": "activity", "object_direction_qualifier": "increased", "treats": True}
+    old_entity = transform_attributes(dict(edge), biolink_version="1.0.0")
+    new_entity = transform_attributes(dict(edge), biolink_version="2.0.0")
+    assert [qualifier["qualifier_type_id"] for qualifier in old_entity["qualifiers"]] == \
+        ["biolink:object_aspect_qualifier"]
+    assert [qualifier["qualifier_type_id"] for qualifier in new_entity["qualifiers"]] == \
+        ["biolink:object_direction_qualifier"]
+    assert new_entity["attributes"][-1]["attribute_type_id"] == "biolink:treats"
+
+
+def test_biolink_model_lru(biolink_versions):
+    """Test that the least recently used biolink model versions are evicted."""
+    set_biolink_model_cache_size(2)
+    old_model = get_biolink_model("1.0.0")
+    new_model = get_biolink_model("2.0.0")
+    assert get_biolink_model("1.0.0") is old_model
+    assert get_loaded_biolink_versions() == ["2.0.0", "1.0.0"]
+
+    set_biolink_model_cache_size(1)
+    assert get_biolink_model("1.0.0") is old_model
+    assert get_loaded_biolink_versions() == ["1.0.0"]
+    assert get_biolink_model("2.0.0") is not new_model
+    assert get_loaded_biolink_versions() == ["2.0.0"]
+
+
+def test_biolink_model_locks(biolink_versions, monkeypatch):
+    """Test that loaded models are got without locking, and loading a version doesn't block the others."""
+    old_model = get_biolink_model("1.0.0")
+    loading = threading.Event()
+    loaded = threading.Event()
+    load_biolink_model = biolink.load_biolink_model
+
+    def slow_load_biolink_model(biolink_version):
+        loading.set()
+        assert loaded.wait(5)
+        return load_biolink_model(biolink_version)
+
+    monkeypatch.setattr(biolink, "load_biolink_model", slow_load_biolink_model)
+    thread = threading.Thread(target=get_biolink_model, args=("2.0.0",))
+    thread.start()
+    assert loading.wait(5)
+    # 2.0.0 is being loaded
+    assert get_biolink_model("1.0.0") is old_model
+    with biolink._BIOLINK_MODELS_LOCK:
+        assert get_biolink_model("1.0.0") is old_model
+    loaded.set()
+    thread.join()
+    assert get_loaded_biolink_versions() == ["1.0.0", "2.0.0"]
+
+
+def test_transform_result_biolink_model(biolink_versions, monkeypatch):
+    """Test that transforming results looks the biolink model up once, not for every node and edge."""
+    lookups = []
+    monkeypatch.setattr(attributes, "get_biolink_model", lambda *args: lookups.append(args))
+    monkeypatch.setattr(cypher, "get_biolink_model", lambda *args: lookups.append(args) or get_biolink_model(*args))
+    qgraph = {"nodes": {"n0": {}, "n1": {}}, "edges": {"e01": {"subject": "n0", "object": "n1"}}}
+    edges = [[f"element{index}", "CURIE:0", "biolink:treats", "CURIE:1", {"treats": True}] for index in range(3)]
+    response = transform_result({"nodes": [], "edges": [edges], "paths": []}, qgraph, biolink_version="2.0.0")
+    assert len(response["knowledge_graph"]["edges"]) == 3
+    assert lookups == [("2.0.0",)]
@@ -0,0 +1,79 @@
+"""Test compiling queries without changing the qgraph."""
+import copy
+
+from reasoner_transpiler.cypher import compile_query, get_query, transform_result
+
+QGRAPH = {
+    "nodes": {
+        "n0": {"ids": ["MONDO:0000001"], "categories": ["biolink:Disease"]},
+        "n1": {"categories": ["biolink:ChemicalEntity"]},
+    },
+    "edges": {
+        "e01": {
+            "subject": "n0",
+            "object": "n1",
+            "predicates": ["biolink:treated_by"],
+            "attribute_constraints": [{"id": "biolink:fda_approved", "value": True}],
+        },
+    },
+}
+
+
+class BoltNode(dict):
+    """Stand-in for a neo4j driver Node."""
+
+    def __init__(self, labels, **properties):
+        super().__init__(properties)
+        self.labels = labels
+
+
+def make_record():
+    """A cypher record for QGRAPH, where the result is bound to n0 through a subclass of MONDO:0000001."""
+    return {
+        "nodes": [
+            BoltNode(["biolink:Disease"], id="MONDO:0000001", name="disease"),
+            BoltNode(["biolink:Disease"], id="MONDO:0000002", name="subclass of disease"),
+            BoltNode(["biolink:ChemicalEntity"], id="CHEBI:1", name="chemical"),
+        ],
+        "edges": [
+            ["element_1", "CHEBI:1", "biolink:treats", "MONDO:0000002", {"primary_knowledge_source": "infores:a"}],
+            [["element_2", "MONDO:0000002", "biolink:subclass_of", "MONDO:0000001", {}]],
+        ],
+        # qnodes n0, n1, n0_superclass then qedges e01, n0_subclass_edge
+        "paths": [["MONDO:0000002", "CHEBI:1", "MONDO:0000001", "element_1", ["element_2"]]],
+    }
+
+
+def test_compile_query_leaves_qgraph():
+    """Test that compile_query gives the same query as get_query without changing the qgraph."""
+    qgraph = copy.deepcopy(QGRAPH)
+    compiled_query = compile_query(qgraph, dialect="memgraph")
+    assert qgraph == QGRAPH
+    legacy_qgraph = copy.deepcopy(QGRAPH)
+    assert compiled_query.query == get_query(legacy_qgraph, dialect="memgraph")
+    assert compiled_query.qgraph == legacy_qgraph
+    assert compiled_query.parameters is None
+    assert compiled_query.bindings.qnodes_with_superclass_nodes == {"n0"}
+    assert compiled_query.bindings.inverted_qedge_ids == {"e01"}
+
+    compiled_query = compile_query(qgraph, parameterized=True)
+    assert qgraph == QGRAPH
+    assert "MONDO:0000001" in compiled_query.parameters.values()
+
+
+def test_transform_compiled_query():
+    """Test that results are transformed the same way with a CompiledQuery, which is left unchanged."""
+    legacy_qgraph = copy.deepcopy(QGRAPH)
+    get_query(legacy_qgraph)
+    expected = transform_result(make_record(), legacy_qgraph)
+
+    compiled_query = compile_query(QGRAPH)
+    compiled_qgraph = copy.deepcopy(compiled_query.qgraph)
+    assert transform_result(make_record(), compiled_query) == expected
+    assert transform_result(make_record(), compiled_query) == expected
+    assert compiled_query.qgraph == compiled_qgraph
+
+    # the inferred edge keeps the direction of the edge in the graph
+    inferred_edge = expected["knowledge_graph"]["edges"]["e_1_e_2"]
+    assert (inferred_edge["subject"], inferred_edge["object"]) == ("CHEBI:1", "MONDO:0000001")
+    assert expected["results"][0]["node_bindings"]["n0"] == [{"id": "MONDO:0000001", "attributes": []}]
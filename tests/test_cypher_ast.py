@@ -0,0 +1,129 @@
+"""Test the cypher tree of queries and rendering it."""
+import copy
+
+import pytest
+
+from reasoner_transpiler.cypher import get_query
+from reasoner_transpiler.cypher_ast import Clauses, Exists, IndexHint, Literal, MatchClause, NodePattern, Parameter, \
+    PathPattern, PropertyMap, Raw, RelationshipPattern, Where, parameter_names
+from reasoner_transpiler.matching import QueryParameters, match_query
+
+QGRAPH = {
+    "nodes": {
+        "n0": {"ids": ["MONDO:0005148"], "categories": ["biolink:Disease"]},
+        "n1": {"categories": ["biolink:Gene"]},
+    },
+    "edges": {
+        "e01": {"subject": "n1", "object": "n0", "predicates": ["biolink:gene_associated_with_condition"]},
+    },
+}
+
+EDGE = PathPattern(
+    NodePattern("n1", ["biolink:Gene"]),
+    RelationshipPattern("e01", ["biolink:gene_associated_with_condition"], directed=True),
+    NodePattern("n0", ["biolink:Disease"], PropertyMap([("id", Literal("MONDO:0005148"))])),
+)
+
+
+def test_render():
+    """Test rendering a MATCH clause."""
+    clause = MatchClause(
+        [EDGE],
+        hints=[IndexHint("n0", "biolink:Disease")],
+        where=Where([Raw("`n1`.taxon = 9606")], Raw("`e01`.negated = false")),
+    )
+    for dialect in ("neo4j", "memgraph"):
+        assert clause.render(dialect) == \
+            "MATCH (`n1`:`biolink:Gene`)-[`e01`:`biolink:gene_associated_with_condition`]->" \
+            "(`n0`:`biolink:Disease` {`id`: \"MONDO:0005148\"}) USING INDEX `n0`:`biolink:Disease`(id) " \
+            "WHERE  ( `n1`.taxon = 9606 )  AND (`e01`.negated = false)"
+    subclass_edge = MatchClause([PathPattern(
+        NodePattern("n0"),
+        RelationshipPattern("n0_subclass_edge", ["biolink:subclass_of"], (0, 1), directed=True),
+        NodePattern("n0_superclass"),
+    )], optional=True)
+    assert subclass_edge.render() == \
+        "OPTIONAL MATCH (`n0`)-[`n0_subclass_edge`:`biolink:subclass_of`*0..1]->(`n0_superclass`)"
+    with pytest.raises(ValueError):
+        subclass_edge.render("sparql")
+
+
+def test_exists():
+    """Test rendering a pattern condition for each dialect."""
+    condition = Exists(PathPattern(NodePattern("n1"), RelationshipPattern("", ["biolink:treats"]), NodePattern("")))
+    assert condition.render("neo4j") == "EXISTS { (`n1`)-[``:`biolink:treats`]-(``) }"
+    assert condition.render("memgraph") == "exists((`n1`)-[``:`biolink:treats`]-(``))"
+
+
+def test_memoized():
+    """Test that nodes render once for each dialect."""
+    clause = MatchClause([EDGE])
+    assert clause.render() is clause.render("neo4j")
+    assert clause.render() == clause.render("memgraph")
+    assert set(clause._rendered) == {"neo4j", "memgraph"}
+
+
+def test_equality():
+    """Test that equal trees are equal, so they can be used as keys."""
+    assert NodePattern("`n0`", ["biolink:Disease"]) == NodePattern("n0", ("biolink:Disease",))
+    assert len({MatchClause([EDGE]), MatchClause([copy.deepcopy(EDGE)])}) == 1
+    assert Literal(1) != Literal(True)
+    assert Literal(1).render() == "1" and Literal(True).render() == "true"
+
+
+def test_match_query_tree():
+    """Test that match_query keeps the tree of its clauses, with the parameters it uses."""
+    parameters = QueryParameters()
+    query = match_query(copy.deepcopy(QGRAPH), parameters=parameters)
+    assert isinstance(query.clauses, Clauses)
+    assert parameter_names(query.clauses) == list(parameters) == ["p0"]
+    assert Parameter("p0") in set(query.clauses.walk())
+    # the bound node is referenced, not matched again
+    assert NodePattern("n0") in set(query.clauses.walk())
+    assert query.clauses.render() == \
+        "MATCH (`n1`:`biolink:Gene`)-[`e01`:`biolink:gene_associated_with_condition`]->(`n0`:`biolink:NamedThing`) " \
+        "MATCH (`n0`)-[`n0_subclass_edge`:`biolink:subclass_of`*0..1]->(`n0_superclass`:`biolink:Disease` {`id`: $p0})"
+
+
+def test_rewrite():
+    """Test rewriting a tree, here matching the subclass edge first."""
+    clauses = match_query(copy.deepcopy(QGRAPH)).clauses
+    rewritten = clauses.replace(clauses=list(reversed(clauses.clauses)))
+    assert rewritten.render().startswith("MATCH (`n0`)-[`n0_subclass_edge`")
+    # the original is left as it is
+    assert clauses.render().startswith("MATCH (`n1`:`biolink:Gene`)")
+
+
+def test_self_loop_filters():
+    """Test that the filters of a node are kept when a qedge connects it to itself."""
+    qgraph = {
+        "nodes": {"n0": {"categories": ["biolink:Gene"]}},
+        "edges": {"e00": {"subject": "n0", "object": "n0", "predicates": ["biolink:gene_associated_with_condition"]}},
+    }
+    query = get_query(qgraph, reasoner=False, max_connectivity=5)
+    assert "MATCH (`n0`:`biolink:Gene`)-[`e00`:`biolink:gene_associated_with_condition`]->(`n0`) " \
+           "WHERE  ( (COUNT { (`n0`)-[]-() } < 5 + 1) ) " in query
+
+
+def test_breadth_first():
+    """Test that memgraph expands breadth first patterns with BFS, unless they can match zero length paths."""
+    def render(length, dialect="memgraph"):
+        return RelationshipPattern("e", ["biolink:subclass_of"], length, directed=True, breadth_first=True) \
+            .render(dialect)
+    assert render((1, 1)) == "-[`e`:`biolink:subclass_of`*BFS ..1]->"
+    assert render((2, 3)) == "-[`e`:`biolink:subclass_of`*BFS 2..3]->"
+    assert render((None, None)) == "-[`e`:`biolink:subclass_of`*BFS]->"
+    assert render((0, 1)) == render((0, 1), "neo4j") == "-[`e`:`biolink:subclass_of`*0..1]->"
+    assert render((1, 2), "neo4j") == "-[`e`:`biolink:subclass_of`*1..2]->"
+    assert RelationshipPattern("e", length=(1, 2)).render("memgraph") == "-[`e`*1..2]-"
+
+
+def test_memgraph_subclasses():
+    """Test that memgraph keeps the variable length subclass edge, connected to the pinned superclass node."""
+    query = get_query(copy.deepcopy(QGRAPH), dialect="memgraph", subclass_depth=2)
+    assert "MATCH (`n0`)-[`n0_subclass_edge`:`biolink:subclass_of`*0..2]->" \
+           "(`n0_superclass`:`biolink:Disease` {`id`: \"MONDO:0005148\"})" in query
+    assert "*BFS" not in query and "WITH *" not in query
+    # the subclass_of edge of direct subclasses from the closure is expanded breadth first
+    query = get_query(copy.deepcopy(QGRAPH), dialect="memgraph", subclass_closure=True)
+    assert "OPTIONAL MATCH (`n0`)-[`n0_subclass_edge`:`biolink:subclass_of`*BFS ..1]->(`n0_superclass`)" in query
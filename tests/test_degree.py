@@ -0,0 +1,71 @@
+"""Test filtering hub nodes on a stored degree property."""
+import copy
+import json
+import os
+
+from reasoner_transpiler.attributes import transform_attributes
+from reasoner_transpiler.cypher import get_query
+from reasoner_transpiler.degree import DEGREE_PROPERTY, count_degrees, main
+from reasoner_transpiler.index_advisor import NODE, Index, advise_indexes
+from .fixtures import fixture_db_driver
+
+TESTS_DIR = os.path.dirname(__file__)
+
+QGRAPH = {
+    "nodes": {
+        "n0": {"categories": "biolink:Disease"},
+        "n1": {"categories": "biolink:ChemicalSubstance", "ids": ["CHEBI:6801"]},
+    },
+    "edges": {
+        "e01": {"predicates": "biolink:treats", "subject": "n1", "object": "n0"},
+    },
+}
+
+
+def test_count_degrees():
+    """Test counting the relationships of each node."""
+    assert count_degrees([("a", "b"), ("b", "c"), ("c", "c")], ["a", "d"]) == {"a": 1, "b": 2, "c": 3, "d": 0}
+
+
+def test_degree_property_query():
+    """Test that max_connectivity compares the stored degree instead of counting relationships."""
+    for dialect in ("neo4j", "memgraph"):
+        query = get_query(copy.deepcopy(QGRAPH), dialect=dialect, max_connectivity=5, use_degree_property=True)
+        assert f"`n0`.`{DEGREE_PROPERTY}` <= 5" in query
+        assert "COUNT {" not in query and "degree (" not in query
+    query, parameters = get_query(copy.deepcopy(QGRAPH), max_connectivity=5, use_degree_property=True,
+                                  parameterized=True)
+    assert f"`n0`.`{DEGREE_PROPERTY}` <= $p" in query
+    assert 5 in parameters.values()
+    # without max_connectivity there is no filter
+    assert DEGREE_PROPERTY not in get_query(copy.deepcopy(QGRAPH), use_degree_property=True)
+
+
+def test_degree_property():
+    """Test the recommended index, and that the property is not returned as an attribute."""
+    advice = advise_indexes([QGRAPH], max_connectivity=5, use_degree_property=True)
+    assert Index(NODE, "biolink:Disease", DEGREE_PROPERTY) in [item.index for item in advice]
+    assert all(item.index.property != DEGREE_PROPERTY for item in advise_indexes([QGRAPH], max_connectivity=5))
+    assert not transform_attributes({DEGREE_PROPERTY: 3}, node=True).get("attributes")
+
+
+def test_degree_cli(tmp_path):
+    """Test computing the degrees of a graph export, including nodes without edges."""
+    output_path = tmp_path / "degrees.json"
+    main([os.path.join(TESTS_DIR, "neo4j", "neo4j_csv", "edges.csv"),
+          "--nodes", os.path.join(TESTS_DIR, "memgraph", "memgraph_json", "nodes.json"), "-o", str(output_path)])
+    degrees = {row["id"]: row[DEGREE_PROPERTY] for row in json.loads(output_path.read_text())}
+    assert degrees["MONDO:0014488"] == 1
+    assert min(degrees.values()) >= 0
+
+
+def test_degree_property_results(db_driver):
+    """Test that the stored degree filters the same hub nodes as counting relationships."""
+    dialect, driver = db_driver
+    outputs = []
+    for use_degree_property in (False, True):
+        qgraph = copy.deepcopy(QGRAPH)
+        query = get_query(qgraph, dialect=dialect, max_connectivity=5, use_degree_property=use_degree_property)
+        outputs.append(driver.run(query, convert_to_trapi=True, qgraph=qgraph))
+    assert len(outputs[1]["results"]) == 2
+    assert sorted(outputs[1]["results"], key=str) == sorted(outputs[0]["results"], key=str)
@@ -1,5 +1,6 @@
 import pytest
 from ast import literal_eval
+from reasoner_transpiler.biolink import get_biolink_model
 from reasoner_transpiler.matching import EdgeReference, set_predicates_in_graph, reset_predicates_in_graph
 from reasoner_transpiler.exceptions import NoPossibleResultsException
 
@@ -224,3 +225,28 @@ def test_predicates_in_graph_setting_no_results():
     with pytest.raises(NoPossibleResultsException):
         ref = EdgeReference("e0", edge, invert=True)
     reset_predicates_in_graph()
+
+
+def test_predicate_expansion_table():
+    """The predicate expansion table is built once per set of predicates in the graph and can't be modified."""
+    biolink = get_biolink_model()
+    expansions = biolink.get_predicate_expansions()
+    assert biolink.get_predicate_expansions() is expansions
+    with pytest.raises(TypeError):
+        expansions["biolink:affects"] = None
+
+    affected_by = expansions["biolink:affected_by"]
+    assert not affected_by.symmetric
+    assert affected_by.predicates == ()
+    assert "biolink:has_side_effect" in affected_by.inverse_predicates
+    correlated_with = expansions["biolink:correlated_with"]
+    assert correlated_with.symmetric
+    assert set(correlated_with.predicates) <= set(correlated_with.inverse_predicates)
+
+    filtered_expansions = biolink.get_predicate_expansions(frozenset(["affects", "regulates"]))
+    assert filtered_expansions is not expansions
+    assert set(filtered_expansions["biolink:affects"].predicates) == {"biolink:affects", "biolink:regulates"}
+    assert biolink.get_predicate_expansions(frozenset(["regulates", "affects"])) is filtered_expansions
+
+    assert biolink.expand_predicate("biolink:affects") is expansions["biolink:affects"]
+    assert biolink.expand_predicate("biolink:invalid_predicate") is None
@@ -0,0 +1,152 @@
+"""Test resolving subclasses with an in-process subclass hierarchy."""
+import copy
+import json
+import os
+
+import pytest
+
+from reasoner_transpiler.cypher import compile_query, get_query, transform_result
+from reasoner_transpiler.hierarchy import SubclassHierarchy, SubclassParents, get_subclass_hierarchy, \
+    get_subclass_parents, load_subclass_hierarchy, load_subclass_parents, main, reset_subclass_hierarchy, \
+    reset_subclass_parents, set_subclass_hierarchy, set_subclass_parents
+from reasoner_transpiler.query_cache import clear_query_cache
+from .fixtures import fixture_db_driver
+from .test_compiled_query import QGRAPH, make_record
+
+TESTS_DIR = os.path.dirname(__file__)
+
+
+@pytest.fixture(autouse=True)
+def subclass_hierarchy():
+    set_subclass_hierarchy([
+        {"subject": "MONDO:0000002", "predicate": "biolink:subclass_of", "object": "MONDO:0000001"},
+    ])
+    yield
+    reset_subclass_hierarchy()
+    reset_subclass_parents()
+    clear_query_cache()
+
+
+def test_load_subclass_hierarchy(tmp_path):
+    """Test that the test graph formats give the same hierarchy, and writing a snapshot of it."""
+    load_subclass_hierarchy(os.path.join(TESTS_DIR, "neo4j", "neo4j_csv", "edges.csv"))
+    hierarchy = get_subclass_hierarchy()
+    assert hierarchy.descendants("MONDO:0000000", 2) == ["MONDO:0000001", "MONDO:0005148", "MONDO:0015967"]
+    assert hierarchy.descendants("MONDO:0000000", 0) == []
+    edges = sorted(hierarchy.edges(), key=lambda edge: edge["id"])
+    assert {"id": "t2d_isa_disease", "subject": "MONDO:0005148", "predicate": "biolink:subclass_of",
+            "object": "MONDO:0000001", "primary_knowledge_source": "infores:test"} in edges
+    memgraph_hierarchy = SubclassHierarchy.load(os.path.join(TESTS_DIR, "memgraph", "memgraph_json", "edges.json"))
+    assert sorted(memgraph_hierarchy.edges(), key=lambda edge: edge["id"]) == edges
+
+    snapshot_path = tmp_path / "hierarchy.json"
+    main([os.path.join(TESTS_DIR, "neo4j", "neo4j_csv", "edges.csv"), "-o", str(snapshot_path)])
+    load_subclass_hierarchy(snapshot_path)
+    assert sorted(get_subclass_hierarchy().edges(), key=lambda edge: edge["id"]) == edges
+
+
+def test_resolved_subclasses_query():
+    """Test that subclasses are matched by id instead of a variable length traversal."""
+    query = get_query(copy.deepcopy(QGRAPH), resolve_subclasses=True)
+    assert "`biolink:subclass_of`*" not in query
+    assert "`n0`.id IN [\"MONDO:0000001\", \"MONDO:0000002\"]" in query
+    assert "any(i IN range" not in query
+
+    qgraph = copy.deepcopy(QGRAPH)
+    qgraph["nodes"]["n0"]["ids"] = ["MONDO:0000001", "MONDO:0000003"]
+    compiled_query = compile_query(qgraph, parameterized=True, resolve_subclasses=True)
+    assert "any(i IN range(0, size($p3) - 1) WHERE $p3[i] = `n0_superclass`.id AND $p4[i] = `n0`.id)" \
+        in compiled_query.query
+    assert compiled_query.parameters["p2"] == ["MONDO:0000001", "MONDO:0000002", "MONDO:0000003"]
+    # cached queries resolve the subclasses of their own ids
+    qgraph["nodes"]["n0"]["ids"] = ["MONDO:0000003", "MONDO:0000004"]
+    cached_query = compile_query(qgraph, parameterized=True, resolve_subclasses=True)
+    assert cached_query.query == compiled_query.query
+    assert cached_query.parameters["p2"] == ["MONDO:0000003", "MONDO:0000004"]
+    assert cached_query.qgraph["edges"]["n0_subclass_edge"]["_subclass_edges"] == {}
+
+    with pytest.raises(ValueError):
+        get_query(copy.deepcopy(QGRAPH), resolve_subclasses=True, subclass_closure=True)
+    reset_subclass_hierarchy()
+    with pytest.raises(ValueError):
+        get_query(copy.deepcopy(QGRAPH), resolve_subclasses=True)
+
+
+def test_resolved_subclasses_transform():
+    """Test that the superclass node bindings and auxiliary graphs are the same as with the traversal."""
+    expected = transform_result(make_record(), compile_query(QGRAPH))
+
+    record = make_record()
+    # the subclass_of edge isn't matched
+    record["edges"] = record["edges"][:1]
+    record["paths"] = [path[:-1] + [[]] for path in record["paths"]]
+    response = transform_result(record, compile_query(QGRAPH, resolve_subclasses=True))
+    assert response["results"] == expected["results"]
+    assert response["auxiliary_graphs"] == expected["auxiliary_graphs"]
+    assert response["knowledge_graph"] == expected["knowledge_graph"]
+    assert response["auxiliary_graphs"]
+
+
+@pytest.mark.parametrize("subclass_depth", [1, 2])
+def test_resolved_subclasses_results(db_driver, subclass_depth):
+    """Test that resolving subclasses gives the same TRAPI results as the traversal."""
+    load_subclass_hierarchy(os.path.join(TESTS_DIR, "neo4j", "neo4j_csv", "edges.csv"))
+    dialect, driver = db_driver
+    outputs = []
+    for resolve_subclasses in (False, True):
+        qgraph = {"nodes": {"n0": {"ids": ["MONDO:0000000", "MONDO:0005148"]}, "n1": {}},
+                  "edges": {"e01": {"subject": "n0", "object": "n1"}}}
+        query = get_query(qgraph, dialect=dialect, subclass_depth=subclass_depth,
+                          resolve_subclasses=resolve_subclasses)
+        outputs.append(driver.run(query, convert_to_trapi=True, qgraph=qgraph))
+    assert outputs[1]["results"]
+    assert sorted(outputs[1]["results"], key=str) == sorted(outputs[0]["results"], key=str)
+    assert outputs[1]["auxiliary_graphs"] == outputs[0]["auxiliary_graphs"]
+    assert outputs[1]["knowledge_graph"] == outputs[0]["knowledge_graph"]
+
+
+def test_leaf_ids():
+    """Test that pinned qnodes with ids without subclasses don't get superclass qnodes and subclass qedges."""
+    set_subclass_parents(get_subclass_hierarchy())
+    assert "MONDO:0000001" in get_subclass_parents()
+    assert get_subclass_parents().are_leaves(["MONDO:0000002", "MONDO:0000003"])
+    assert not get_subclass_parents().are_leaves(["MONDO:0000002", "MONDO:0000001"])
+
+    qgraph = copy.deepcopy(QGRAPH)
+    qgraph["nodes"]["n0"]["ids"] = ["MONDO:0000002"]
+    compiled_query = compile_query(qgraph)
+    assert "subclass" not in compiled_query.query
+    assert "n0_superclass" not in compiled_query.qgraph["nodes"]
+    assert compiled_query.query == compile_query(qgraph, subclass=False).query
+    assert "n0_subclass_edge" in compile_query(QGRAPH).query
+
+    # leaf and non-leaf ids are different query shapes
+    parameterized_query = compile_query(qgraph, parameterized=True)
+    assert "n0_superclass" not in parameterized_query.query
+    qgraph["nodes"]["n0"]["ids"] = ["MONDO:0000001"]
+    assert "n0_superclass" in compile_query(qgraph, parameterized=True).query
+
+
+def test_load_subclass_parents(tmp_path):
+    """Test writing and loading the ids of the nodes with subclasses."""
+    parents_path = tmp_path / "parents.json"
+    main([os.path.join(TESTS_DIR, "neo4j", "neo4j_csv", "edges.csv"), "--parents", "-o", str(parents_path)])
+    load_subclass_parents(parents_path)
+    assert isinstance(get_subclass_parents(), SubclassParents)
+    assert get_subclass_parents().ids == ["HP:0000118", "MONDO:0000000", "MONDO:0000001", "MONDO:0005148"]
+    reset_subclass_parents()
+    assert get_subclass_parents() is None
+
+
+def test_leaf_ids_results(db_driver):
+    """Test that leaving out the subclass expansion of leaf ids gives the same TRAPI results."""
+    dialect, driver = db_driver
+    outputs = []
+    for parents in (None, SubclassHierarchy.load(os.path.join(TESTS_DIR, "neo4j", "neo4j_csv", "edges.csv"))):
+        set_subclass_parents(parents)
+        qgraph = {"nodes": {"n0": {"ids": ["MONDO:0014488"]}, "n1": {}},
+                  "edges": {"e01": {"subject": "n0", "object": "n1"}}}
+        outputs.append(driver.run(get_query(qgraph, dialect=dialect), convert_to_trapi=True, qgraph=qgraph))
+    assert outputs[1]["results"]
+    assert sorted(outputs[1]["results"], key=str) == sorted(outputs[0]["results"], key=str)
+    assert outputs[1]["knowledge_graph"] == outputs[0]["knowledge_graph"]
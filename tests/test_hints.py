@@ -0,0 +1,122 @@
+"""Test planner hints chosen by a hint policy."""
+import copy
+
+import pytest
+
+from reasoner_transpiler.cypher import compile_batch_query, get_query
+from reasoner_transpiler.hints import HintPolicy, get_join_qnode_ids
+from reasoner_transpiler.query_cache import clear_query_cache, get_query_cache_info
+
+# two pinned qnodes joined on a qnode without ids
+QGRAPH = {
+    "nodes": {
+        "n0": {"ids": ["MONDO:0005148"], "categories": ["biolink:Disease"]},
+        "n1": {"categories": ["biolink:PhenotypicFeature"]},
+        "n2": {"ids": ["NCBIGene:3630"], "categories": ["biolink:Gene"]},
+    },
+    "edges": {
+        "e01": {"subject": "n0", "object": "n1"},
+        "e21": {"subject": "n2", "object": "n1", "predicates": ["biolink:has_phenotype"]},
+    },
+}
+
+MATCH_E01 = "MATCH (`n0`:`biolink:Disease` {`id`: \"MONDO:0005148\"})-[`e01`]-(`n1`:`biolink:PhenotypicFeature`)"
+MATCH_E21 = "MATCH (`n2`:`biolink:Gene` {`id`: \"NCBIGene:3630\"})-[`e21`:`biolink:has_phenotype`]->(`n1`)"
+
+
+@pytest.fixture(autouse=True)
+def query_cache():
+    yield
+    clear_query_cache()
+
+
+def hinted_query(qgraph=None, **kwargs):
+    """Get the query of a qgraph without subclasses, up to its RETURN clause."""
+    query = get_query(copy.deepcopy(qgraph or QGRAPH), reasoner=False, subclass=False, **kwargs)
+    return query[:query.index(" RETURN")]
+
+
+def test_neo4j_hints():
+    """Test index hints on pinned qnodes and a join hint on the qnode between them."""
+    assert hinted_query(hint_policy=True) == \
+        f"{MATCH_E01} USING INDEX `n0`:`biolink:Disease`(id) " \
+        f"{MATCH_E21} USING INDEX `n2`:`biolink:Gene`(id) USING JOIN ON `n1`"
+
+
+def test_memgraph_hints():
+    """Test that memgraph gets the index hints in front of the query, and no join hints."""
+    assert hinted_query(hint_policy=True, dialect="memgraph") == \
+        "USING INDEX :`biolink:Disease`(id), :`biolink:Gene`(id) " \
+        f"{MATCH_E01} {MATCH_E21}"
+    assert hinted_query(hint_policy={"index": False}, dialect="memgraph") == f"{MATCH_E01} {MATCH_E21}"
+
+
+def test_policy():
+    """Test turning each kind of hint off."""
+    assert hinted_query(hint_policy={"join": False}) == \
+        f"{MATCH_E01} USING INDEX `n0`:`biolink:Disease`(id) " \
+        f"{MATCH_E21} USING INDEX `n2`:`biolink:Gene`(id)"
+    assert hinted_query(hint_policy=HintPolicy(index=False)) == f"{MATCH_E01} {MATCH_E21} USING JOIN ON `n1`"
+    for hint_policy in (None, False):
+        assert hinted_query(hint_policy=hint_policy) == f"{MATCH_E01} {MATCH_E21}"
+
+
+def test_join_qnodes():
+    """Test that only qnodes without ids between two pinned qnodes are joined on."""
+    qgraph = copy.deepcopy(QGRAPH)
+    assert get_join_qnode_ids(qgraph) == ["n1"]
+    del qgraph["nodes"]["n2"]["ids"]
+    assert get_join_qnode_ids(qgraph) == []
+    assert "USING JOIN" not in hinted_query(qgraph, hint_policy=True)
+    # qnodes matched from their superclass qnodes count as pinned
+    query = get_query(copy.deepcopy(QGRAPH), reasoner=False, hint_policy=True)
+    assert "USING INDEX `n0_superclass`:`biolink:Disease`(id)" in query
+    assert "->(`n1`) USING JOIN ON `n1` MATCH" in query
+    assert query.count("USING JOIN") == 1
+
+
+def test_runtime():
+    """Test the runtime in front of large neo4j queries."""
+    hint_policy = HintPolicy(runtime="parallel", runtime_min_qedges=2)
+    assert hinted_query(hint_policy=hint_policy).startswith(f"CYPHER runtime=parallel {MATCH_E01} USING INDEX")
+    assert hinted_query(hint_policy=hint_policy, dialect="memgraph").startswith("USING INDEX")
+    assert hinted_query(hint_policy={"runtime": "parallel"}).startswith("MATCH")
+    qgraph = copy.deepcopy(QGRAPH)
+    del qgraph["nodes"]["n0"]["ids"]
+    del qgraph["nodes"]["n2"]["ids"]
+    assert hinted_query(qgraph, hint_policy={"runtime": "parallel"}) == \
+        "CYPHER runtime=parallel MATCH (`n0`:`biolink:Disease`)-[`e01`]-(`n1`:`biolink:PhenotypicFeature`) " \
+        "MATCH (`n2`:`biolink:Gene`)-[`e21`:`biolink:has_phenotype`]->(`n1`)"
+    assert hinted_query(qgraph, hint_policy={"runtime": "parallel", "runtime_unpinned": False}).startswith("MATCH")
+    with pytest.raises(ValueError):
+        hinted_query(hint_policy={"runtime": "parallel; MATCH"})
+    with pytest.raises(TypeError):
+        hinted_query(hint_policy="parallel")
+
+
+def test_use_hints_unchanged():
+    """Test that use_hints still hints every pinned qnode and nothing else."""
+    assert hinted_query(use_hints=True) == \
+        f"{MATCH_E01} USING INDEX `n0`:`biolink:Disease`(id) " \
+        f"{MATCH_E21} USING INDEX `n2`:`biolink:Gene`(id)"
+
+
+def test_parameterized():
+    """Test that queries of the same shape share hints and a cached query, however the policy is given."""
+    query, _ = get_query(copy.deepcopy(QGRAPH), parameterized=True, hint_policy=True)
+    qgraph = copy.deepcopy(QGRAPH)
+    qgraph["nodes"]["n0"]["ids"] = ["MONDO:0005015"]
+    assert get_query(qgraph, parameterized=True, hint_policy=HintPolicy())[0] == query
+    assert get_query_cache_info().hits == 1
+    assert "USING JOIN ON `n1`" in query
+
+
+def test_batch():
+    """Test that hints in front of the query stay in front of a batch query."""
+    for dialect, prefix in (("neo4j", "CYPHER runtime=parallel UNWIND"),
+                            ("memgraph", "USING INDEX :`biolink:Disease`(id), :`biolink:Gene`(id) UNWIND")):
+        batch_query = compile_batch_query([copy.deepcopy(QGRAPH), copy.deepcopy(QGRAPH)], dialect=dialect,
+                                          hint_policy={"runtime": "parallel", "runtime_min_qedges": 2})
+        assert batch_query.query.startswith(prefix)
+        assert batch_query.query.count(prefix.split(" UNWIND")[0]) == 1
+        assert " MATCH (`n0`)-[`n0_subclass_edge`" in batch_query.query
@@ -0,0 +1,43 @@
+"""Test that importing the transpiler stays cheap."""
+import subprocess
+import sys
+from pathlib import Path
+
+from reasoner_transpiler.biolink import BiolinkModel, get_biolink_model, warm_up
+
+# budget for `import reasoner_transpiler.cypher`, in seconds, for the fastest of IMPORT_TIME_RUNS imports, so a slow
+# cold start on a CI runner doesn't fail the test
+IMPORT_TIME_BUDGET = 0.1
+IMPORT_TIME_RUNS = 5
+
+IMPORT_SCRIPT = """
+import sys
+import time
+start = time.perf_counter()
+import reasoner_transpiler.cypher
+elapsed = time.perf_counter() - start
+print(elapsed, "bmt" in sys.modules, "reasoner_transpiler.biolink" in sys.modules)
+"""
+
+
+def test_import_time():
+    """Test that importing the cypher module doesn't load the biolink model and stays within budget."""
+    elapsed_times = []
+    for _ in range(IMPORT_TIME_RUNS):
+        result = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT],
+                                cwd=Path(__file__).parent.parent,
+                                capture_output=True,
+                                text=True,
+                                check=True)
+        elapsed, bmt_imported, biolink_imported = result.stdout.split()
+        assert biolink_imported == "True"
+        assert bmt_imported == "False"
+        elapsed_times.append(float(elapsed))
+    assert min(elapsed_times) < IMPORT_TIME_BUDGET
+
+
+def test_warm_up():
+    """Test that warm_up loads the biolink model once and shares it."""
+    biolink = warm_up()
+    assert isinstance(biolink, BiolinkModel)
+    assert get_biolink_model() is biolink
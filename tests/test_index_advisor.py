@@ -0,0 +1,97 @@
+"""Test recommending indexes for a workload of qgraphs."""
+import copy
+import json
+
+import pytest
+
+from reasoner_transpiler.index_advisor import NODE, RELATIONSHIP, Index, advise_indexes, index_ddl, main
+
+WORKLOAD = [
+    {
+        "nodes": {
+            "n0": {"ids": ["MONDO:0005148"], "categories": ["biolink:Disease"]},
+            "n1": {"categories": ["biolink:ChemicalEntity"]},
+        },
+        "edges": {
+            "e01": {
+                "subject": "n1",
+                "object": "n0",
+                "predicates": ["biolink:treats"],
+                "attribute_constraints": [{"id": "biolink:knowledge_level", "operator": "==", "value": "prediction"}],
+            },
+        },
+    },
+    {
+        "nodes": {
+            "n0": {"ids": ["MONDO:0005015"], "categories": ["biolink:Disease"]},
+            "n1": {"categories": ["biolink:Gene"]},
+        },
+        "edges": {
+            "e01": {
+                "subject": "n1",
+                "object": "n0",
+                "predicates": ["biolink:genetically_associated_with"],
+            },
+        },
+    },
+    {
+        "nodes": {
+            "n0": {"categories": ["biolink:Gene"], "constraints": [{"id": "biolink:name", "operator": "==",
+                                                                    "value": "CASP3"}]},
+            "n1": {"categories": ["biolink:ChemicalEntity"]},
+        },
+        "edges": {
+            "e01": {
+                "subject": "n1",
+                "object": "n0",
+                "predicates": ["biolink:affects"],
+                "qualifier_constraints": [{"qualifier_set": [
+                    {"qualifier_type_id": "biolink:object_aspect_qualifier", "qualifier_value": "activity"},
+                ]}],
+            },
+        },
+    },
+]
+
+
+def test_advise_indexes():
+    """Test that the indexes used by the workload are ranked by the number of queries using them."""
+    workload = copy.deepcopy(WORKLOAD)
+    advice = advise_indexes(workload)
+    assert workload == WORKLOAD
+    assert advice[0].index == Index(NODE, "biolink:Disease", "id")
+    assert advice[0].query_count == 2
+    assert advice[0].ddl == "CREATE INDEX node_biolink_Disease_id IF NOT EXISTS FOR (n:`biolink:Disease`) ON (n.`id`)"
+    indexes = {item.index: item.query_count for item in advice}
+    assert indexes[Index(NODE, "biolink:Gene", "name")] == 1
+    assert indexes[Index(RELATIONSHIP, "biolink:treats", "knowledge_level")] == 1
+    assert indexes[Index(RELATIONSHIP, "biolink:affects", "object_aspect_qualifier")] == 1
+    # label lookup indexes exist by default in neo4j
+    assert all(item.index.property is not None for item in advice)
+    # each index once
+    assert len({item.ddl for item in advice}) == len(advice)
+    assert [item.query_count for item in advice] == sorted((item.query_count for item in advice), reverse=True)
+
+
+def test_memgraph_ddl():
+    """Test memgraph index syntax, which needs label indexes."""
+    advice = advise_indexes(WORKLOAD, dialect="memgraph")
+    ddl = [item.ddl for item in advice]
+    assert ddl[:2] == ["CREATE INDEX ON :`biolink:ChemicalEntity`;", "CREATE INDEX ON :`biolink:Disease`;"]
+    assert "CREATE INDEX ON :`biolink:Disease`(`id`);" in ddl
+    assert "CREATE EDGE INDEX ON :`biolink:treats`(`knowledge_level`);" in ddl
+    assert index_ddl(Index(RELATIONSHIP, "biolink:treats", "knowledge_level")) == \
+        "CREATE INDEX relationship_biolink_treats_knowledge_level IF NOT EXISTS " \
+        "FOR ()-[r:`biolink:treats`]-() ON (r.`knowledge_level`)"
+    with pytest.raises(ValueError):
+        index_ddl(Index(NODE, "biolink:Gene", "id"), dialect="sql")
+
+
+def test_index_advisor_cli(tmp_path, capsys):
+    """Test the command line interface with a workload of TRAPI messages."""
+    workload_path = tmp_path / "workload.json"
+    workload_path.write_text(json.dumps([{"message": {"query_graph": qgraph}} for qgraph in WORKLOAD]))
+    main([str(workload_path)])
+    output = capsys.readouterr().out.splitlines()
+    assert output[0] == "// used by 2 of 3 queries"
+    assert output[1] == advise_indexes(WORKLOAD)[0].ddl
@@ -0,0 +1,100 @@
+"""Test pruning predicates with a meta knowledge graph."""
+import copy
+import json
+
+import pytest
+
+from reasoner_transpiler.cypher import get_query
+from reasoner_transpiler.exceptions import NoPossibleResultsException
+from reasoner_transpiler.matching import EdgeReference
+from reasoner_transpiler.meta_kg import MetaKnowledgeGraph, get_meta_kg, load_meta_kg, reset_meta_kg, set_meta_kg
+from reasoner_transpiler.query_cache import clear_query_cache
+
+TRIPLES = [
+    ["biolink:ChemicalEntity", "biolink:treats", "biolink:Disease"],
+    ["biolink:Drug", "biolink:ameliorates_condition", "biolink:Disease"],
+    ["biolink:Gene", "biolink:interacts_with", "biolink:Gene"],
+]
+
+
+@pytest.fixture(autouse=True)
+def meta_kg():
+    set_meta_kg(TRIPLES)
+    yield
+    reset_meta_kg()
+    clear_query_cache()
+
+
+def edge_label(subject_categories, predicates, object_categories):
+    edge = {"subject": "s", "object": "o", "predicates": predicates}
+    return EdgeReference("e0", edge, subject_categories=subject_categories,
+                         object_categories=object_categories).label
+
+
+def test_prune_predicates():
+    """Test that only the predicates between the categories of the qnodes are matched."""
+    assert edge_label(["biolink:ChemicalEntity"], ["biolink:treats"], ["biolink:Disease"]) == "`biolink:treats`"
+    assert edge_label(["biolink:Drug"], ["biolink:treats"], ["biolink:Disease"]) == \
+        "`biolink:ameliorates_condition`"
+    assert edge_label(None, ["biolink:treats"], None) == \
+        "`biolink:ameliorates_condition`|`biolink:treats`"
+    # treated_by is matched as treats from the object to the subject
+    edge = {"subject": "s", "object": "o", "predicates": ["biolink:treated_by"]}
+    reference = EdgeReference("e0", edge, subject_categories=["biolink:Disease"],
+                              object_categories=["biolink:Drug", "biolink:SmallMolecule"])
+    assert reference.label == "`biolink:ameliorates_condition`"
+    assert reference.cypher_invert
+    # undirected edges can be stored either way around
+    assert edge_label(["biolink:Gene"], ["biolink:interacts_with"], None) == "`biolink:interacts_with`"
+
+
+def test_no_possible_results():
+    """Test that queries that can't have results raise before querying the database."""
+    with pytest.raises(NoPossibleResultsException):
+        edge_label(["biolink:Gene"], ["biolink:treats"], ["biolink:Disease"])
+    with pytest.raises(NoPossibleResultsException):
+        edge_label(["biolink:Disease"], ["biolink:treats"], ["biolink:ChemicalEntity"])
+    with pytest.raises(NoPossibleResultsException):
+        edge_label(["biolink:Gene"], [], ["biolink:Disease"])
+    assert edge_label(["biolink:Drug"], [], ["biolink:Disease"]) == ""
+
+    qgraph = {
+        "nodes": {"n0": {"ids": ["MONDO:0005148"], "categories": ["biolink:Disease"]},
+                  "n1": {"categories": ["biolink:Gene"]}},
+        "edges": {"e01": {"subject": "n1", "object": "n0", "predicates": ["biolink:treats"]}},
+    }
+    with pytest.raises(NoPossibleResultsException):
+        get_query(qgraph)
+
+
+def test_meta_kg_query_cache():
+    """Test that the categories of qnodes are part of the shape of parameterized queries with a meta knowledge graph."""
+    qgraph = {
+        "nodes": {"n0": {"categories": ["biolink:Disease"]},
+                  "n1": {"categories": ["biolink:Drug", "biolink:SmallMolecule"]}},
+        "edges": {"e01": {"subject": "n1", "object": "n0", "predicates": ["biolink:treats"]}},
+    }
+    query, _ = get_query(copy.deepcopy(qgraph), parameterized=True)
+    assert "`biolink:ameliorates_condition`]" in query
+    qgraph["nodes"]["n1"]["categories"] = ["biolink:Gene", "biolink:Protein"]
+    with pytest.raises(NoPossibleResultsException):
+        get_query(copy.deepcopy(qgraph), parameterized=True)
+
+
+def test_load_meta_kg(tmp_path):
+    """Test loading a TRAPI meta knowledge graph or a list of triples."""
+    trapi_path = tmp_path / "meta_kg.json"
+    trapi_path.write_text(json.dumps({
+        "nodes": {},
+        "edges": [{"subject": subject, "predicate": predicate, "object": object_}
+                  for subject, predicate, object_ in TRIPLES],
+    }))
+    triples_path = tmp_path / "triples.json"
+    triples_path.write_text(json.dumps(TRIPLES))
+    for path in (trapi_path, triples_path):
+        load_meta_kg(path)
+        assert isinstance(get_meta_kg(), MetaKnowledgeGraph)
+        assert get_meta_kg().has_edge(["biolink:Drug"], "biolink:ameliorates_condition", None)
+        assert not get_meta_kg().has_edge(None, "biolink:ameliorates_condition", ["biolink:Drug"])
+    reset_meta_kg()
+    assert get_meta_kg() is None
@@ -0,0 +1,125 @@
+"""Test parameterized queries."""
+import copy
+
+import pytest
+
+from reasoner_transpiler.cypher import get_query
+from reasoner_transpiler.exceptions import UnsupportedError
+from .fixtures import fixture_db_driver
+
+QGRAPHS = [
+    {
+        "nodes": {
+            "n0": {"categories": ["biolink:Disease", "biolink:PhenotypicFeature"], "ids": ["MONDO:0005148"]},
+            "n1": {"categories": "biolink:ChemicalSubstance"},
+        },
+        "edges": {
+            "e01": {
+                "subject": "n1",
+                "object": "n0",
+                "predicates": "biolink:treats",
+                "attribute_constraints": [{"id": "fda_approved", "value": True, "operator": "==="}],
+            },
+        },
+    },
+    {
+        "nodes": {
+            "n0": {"categories": "biolink:Gene", "constraints": [{"id": "length", "value": 277, "operator": "==="}]},
+        },
+        "edges": {},
+    },
+    {
+        "nodes": {
+            "n0": {},
+            "n1": {"ids": ["NCBIGene:283871", "NCBIGene:836"]},
+        },
+        "edges": {
+            "e10a": {
+                "subject": "n0",
+                "object": "n1",
+                "predicates": "biolink:affects",
+                "qualifier_constraints": [{
+                    "qualifier_set": [
+                        {"qualifier_type_id": "biolink:qualified_predicate", "qualifier_value": "biolink:causes"},
+                        {"qualifier_type_id": "biolink:object_aspect_qualifier", "qualifier_value": "activity"},
+                    ]
+                }],
+            },
+        },
+    },
+]
+
+
+def test_same_shape_same_text():
+    """Test that queries of the same shape have the same text, with the literal values bound as parameters."""
+    qgraph = {
+        "nodes": {
+            "n0": {"categories": "biolink:Disease", "ids": ["MONDO:0005148"]},
+            "n1": {"categories": ["biolink:ChemicalSubstance", "biolink:Drug"]},
+        },
+        "edges": {
+            "e01": {"subject": "n1", "object": "n0", "predicates": "biolink:treats"},
+        },
+    }
+    other_qgraph = copy.deepcopy(qgraph)
+    other_qgraph["nodes"]["n0"]["ids"] = ["MONDO:0004993"]
+    other_qgraph["nodes"]["n1"]["categories"] = ["biolink:SmallMolecule", "biolink:Drug", "biolink:Food"]
+    for dialect in ["neo4j", "memgraph"]:
+        query, parameters = get_query(copy.deepcopy(qgraph), dialect=dialect, max_connectivity=5,
+                                      parameterized=True)
+        other_query, other_parameters = get_query(copy.deepcopy(other_qgraph), dialect=dialect, max_connectivity=10,
+                                                  parameterized=True)
+        assert query == other_query
+        assert "MONDO:" not in query and "biolink:Drug" not in query and "5" not in query
+        assert sorted(parameters.values(), key=str) == \
+            sorted([5, 5, 5, "MONDO:0005148", ["biolink:ChemicalSubstance", "biolink:Drug"]], key=str)
+        assert "MONDO:0004993" in other_parameters.values()
+        assert get_query(copy.deepcopy(qgraph), dialect=dialect) != query
+
+
+def test_qualifier_parameters():
+    """Test that a qualifier value and its descendants are bound as one list parameter."""
+    query, parameters = get_query(copy.deepcopy(QGRAPHS[2]), parameterized=True)
+    assert "`e10a`.object_aspect_qualifier IN $" in query
+    assert "`e10a`.qualified_predicate IN $" in query
+    assert ["biolink:causes"] in parameters.values()
+    assert ["activity"] in parameters.values()
+    assert ["NCBIGene:283871", "NCBIGene:836"] in parameters.values()
+
+
+def test_unsupported_parameter():
+    """Test that unsupported property types are rejected when parameterized too."""
+    qgraph = {
+        "nodes": {"n0": {"constraints": [{"id": "length", "value": {"not": "supported"}, "operator": "==="}]}},
+        "edges": {},
+    }
+    with pytest.raises(UnsupportedError):
+        get_query(copy.deepcopy(qgraph), parameterized=True)
+
+
+@pytest.mark.parametrize("parameterized", [False, True])
+def test_list_constraint_value(parameterized):
+    """Test that list values of === constraints are rejected whether they are inlined or parameterized."""
+    node_qgraph = {
+        "nodes": {"n0": {"constraints": [{"id": "length", "value": [277, 278], "operator": "==="}]}},
+        "edges": {},
+    }
+    edge_qgraph = copy.deepcopy(QGRAPHS[0])
+    edge_qgraph["edges"]["e01"]["attribute_constraints"][0]["value"] = [True, False]
+    for qgraph in [node_qgraph, edge_qgraph]:
+        with pytest.raises(UnsupportedError):
+            get_query(copy.deepcopy(qgraph), parameterized=parameterized)
+
+
+@pytest.mark.parametrize("qgraph", QGRAPHS)
+def test_parameterized_results(db_driver, qgraph):
+    """Test that parameterized queries give the same results as queries with inlined values."""
+    dialect, driver = db_driver
+    inline_qgraph = copy.deepcopy(qgraph)
+    output = driver.run(get_query(inline_qgraph, dialect=dialect), convert_to_trapi=True, qgraph=inline_qgraph)
+    parameterized_qgraph = copy.deepcopy(qgraph)
+    query, parameters = get_query(parameterized_qgraph, dialect=dialect, parameterized=True)
+    parameterized_output = driver.run(query, query_parameters=parameters, convert_to_trapi=True,
+                                      qgraph=parameterized_qgraph)
+    assert output["results"]
+    assert parameterized_output == output
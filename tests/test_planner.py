@@ -0,0 +1,104 @@
+"""Test ordering MATCH clauses with the planner."""
+import copy
+import json
+
+import pytest
+
+from reasoner_transpiler.cypher import get_query
+from reasoner_transpiler.planner import GraphStatistics, load_graph_statistics, plan_qedges, reset_graph_statistics, \
+    set_graph_statistics
+from reasoner_transpiler.query_cache import clear_query_cache
+from .fixtures import fixture_db_driver
+
+QGRAPH = {
+    "nodes": {
+        "n0": {"categories": ["biolink:Gene"]},
+        "n1": {"categories": ["biolink:ChemicalEntity"]},
+        "n2": {"categories": ["biolink:Disease"]},
+    },
+    "edges": {
+        "e01": {"subject": "n0", "object": "n1"},
+        "e12": {"subject": "n1", "object": "n2", "predicates": ["biolink:treats"]},
+    },
+}
+
+STATISTICS = {
+    "node_count": 10000,
+    "relationship_count": 100000,
+    "label_counts": {"biolink:Gene": 5000, "biolink:ChemicalEntity": 1000, "biolink:Disease": 50},
+    "relationship_type_counts": {"biolink:treats": 200},
+    "degree_percentiles": {"biolink:Disease": {"50": 4, "90": 100}},
+}
+# a graph with few genes and many treats edges
+GENE_STATISTICS = {
+    "node_count": 10000,
+    "relationship_count": 100000,
+    "label_counts": {"biolink:Gene": 1, "biolink:ChemicalEntity": 1000, "biolink:Disease": 5000},
+    "relationship_type_counts": {"biolink:treats": 90000},
+}
+
+
+@pytest.fixture(autouse=True)
+def graph_statistics():
+    yield
+    reset_graph_statistics()
+    clear_query_cache()
+
+
+def match_order(query):
+    return [query.index(f"[`{qedge_id}`") for qedge_id in ("e01", "e12")]
+
+
+def test_pinned_first():
+    """Test that matching starts from pinned qnodes and the qedges connected to them."""
+    qgraph = copy.deepcopy(QGRAPH)
+    qgraph["nodes"]["n2"]["ids"] = ["MONDO:0005148"]
+    assert plan_qedges(copy.deepcopy(qgraph)) == ["e12", "e01"]
+    query = get_query(copy.deepcopy(qgraph), use_planner=True)
+    assert query.startswith("MATCH (`n2`:`biolink:NamedThing`)-[`n2_subclass_edge`")
+    e01, e12 = match_order(query)
+    assert e12 < e01
+    # qgraph order without the planner
+    e01, e12 = match_order(get_query(copy.deepcopy(qgraph)))
+    assert e01 < e12
+
+
+def test_statistics(tmp_path):
+    """Test that matching starts from the rarest labels and predicates when there are graph statistics."""
+    # without statistics, qedges with predicates are expected to be more selective
+    assert plan_qedges(QGRAPH) == ["e12", "e01"]
+    set_graph_statistics(GENE_STATISTICS)
+    assert plan_qedges(QGRAPH) == ["e01", "e12"]
+
+    statistics_path = tmp_path / "statistics.json"
+    statistics_path.write_text(json.dumps(STATISTICS))
+    load_graph_statistics(statistics_path)
+    assert plan_qedges(QGRAPH) == ["e12", "e01"]
+    assert plan_qedges(QGRAPH, GraphStatistics(**GENE_STATISTICS)) == ["e01", "e12"]
+
+
+def test_planned_query_cache():
+    """Test that cached queries are planned again when the graph statistics change."""
+    query, _ = get_query(copy.deepcopy(QGRAPH), use_planner=True, parameterized=True)
+    e01, e12 = match_order(query)
+    assert e12 < e01
+    set_graph_statistics(GENE_STATISTICS)
+    query, _ = get_query(copy.deepcopy(QGRAPH), use_planner=True, parameterized=True)
+    e01, e12 = match_order(query)
+    assert e01 < e12
+
+
+def test_planner_results(db_driver):
+    """Test that planned queries give the same results."""
+    dialect, driver = db_driver
+    qgraph = copy.deepcopy(QGRAPH)
+    qgraph["nodes"]["n2"]["ids"] = ["MONDO:0005148"]
+    qgraph["nodes"]["n1"]["categories"] = ["biolink:ChemicalSubstance"]
+    qgraph["nodes"]["n0"]["categories"] = ["biolink:NamedThing"]
+    outputs = []
+    for use_planner in (False, True):
+        planned_qgraph = copy.deepcopy(qgraph)
+        query = get_query(planned_qgraph, dialect=dialect, use_planner=use_planner)
+        outputs.append(driver.run(query, convert_to_trapi=True, qgraph=planned_qgraph))
+    assert outputs[1]["results"]
+    assert sorted(outputs[1]["results"], key=str) == sorted(outputs[0]["results"], key=str)
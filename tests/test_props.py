@@ -2,7 +2,8 @@
 import pytest
 from .fixtures import fixture_db_driver
 from reasoner_transpiler.attributes import set_custom_attribute_types, set_custom_attribute_skip_list, \
-    reset_custom_attribute_types, DEFAULT_ATTRIBUTE_TYPE
+    reset_custom_attribute_types, DEFAULT_ATTRIBUTE_TYPE, get_attribute_types, transform_attributes
+from reasoner_transpiler.biolink import BiolinkModel
 from reasoner_transpiler.cypher import get_query
 
 
@@ -309,3 +310,36 @@ def test_props_customization(db_driver):
         "value_type_id": "transpiler:custom_value_type"
     } for attribute in attributes])
     reset_custom_attribute_types()
+
+
+def test_attribute_type_registry(monkeypatch):
+    """Test that attribute types come from a registry built on start up, without biolink lookups per attribute."""
+    def fail_get_element(*args, **kwargs):
+        raise AssertionError("transform_attributes should not look up biolink elements")
+    monkeypatch.setattr(BiolinkModel, "get_element", fail_get_element)
+
+    attribute_types = get_attribute_types()
+    assert get_attribute_types() is attribute_types
+    with pytest.raises(TypeError):
+        attribute_types["p_value"] = DEFAULT_ATTRIBUTE_TYPE
+
+    attributes = transform_attributes({"publications": ["PMID:1"],
+                                       "p_value": 0.01,
+                                       "gene": "NCBIGene:841",
+                                       "non_biolink_attribute": "xxx"}, node=True)["attributes"]
+    attribute_types_by_name = {attribute["original_attribute_name"]: attribute for attribute in attributes}
+    assert attribute_types_by_name["publications"]["value_type_id"] == "linkml:Uriorcurie"
+    assert attribute_types_by_name["p_value"]["attribute_type_id"] == "biolink:p_value"
+    assert attribute_types_by_name["gene"]["attribute_type_id"] == "biolink:Gene"
+    assert attribute_types_by_name["non_biolink_attribute"]["attribute_type_id"] == \
+        DEFAULT_ATTRIBUTE_TYPE["attribute_type_id"]
+    assert get_attribute_types() is attribute_types
+
+    set_custom_attribute_types({"p_value": {"attribute_type_id": "transpiler:custom_attribute_type"}})
+    custom_attribute_types = get_attribute_types()
+    assert custom_attribute_types is not attribute_types
+    assert custom_attribute_types["p_value"] == {"attribute_type_id": "transpiler:custom_attribute_type"}
+    assert custom_attribute_types["publications"]["attribute_type_id"] == "biolink:publications"
+    reset_custom_attribute_types()
+    assert get_attribute_types()["publications"]["value_type_id"] == "linkml:Uriorcurie"
+
@@ -1,6 +1,8 @@
 import pytest
 
+from reasoner_transpiler.biolink import get_biolink_model
 from reasoner_transpiler.cypher import get_query
+from reasoner_transpiler.matching import EdgeReference
 from .fixtures import fixture_db_driver
 
 
@@ -184,3 +186,37 @@ def test_empty_qualifier_set(db_driver):
     dialect, driver = db_driver
     output = driver.run(get_query(qgraph, dialect=dialect), convert_to_trapi=True, qgraph=qgraph)
     assert len(output["results"]) == 1
+
+
+def test_qualifier_value_index():
+    """Test that the qualifier value index gives the same enums and descendants as checking every enum"""
+    biolink = get_biolink_model()
+    permissible_values = {permissible_value
+                          for enum_name in biolink.enums
+                          for permissible_value in biolink._enums[enum_name]}
+    for permissible_value in permissible_values:
+        expected = [(enum_name, biolink.get_permissible_value_descendants(permissible_value, enum_name))
+                    for enum_name in biolink.enums
+                    if biolink.is_permissible_value_of_enum(enum_name, permissible_value)]
+        assert [(enum_name, list(descendants)) for enum_name, descendants in
+                biolink.get_qualifier_value_enums(permissible_value)] == expected
+    assert biolink.get_qualifier_value_enums("not_a_permissible_value") == ()
+
+
+def test_qualifier_value_hierarchy_filter():
+    """Test that a qualifier value is expanded to its descendants in the WHERE clause"""
+    edge = {
+        "subject": "n0",
+        "object": "n1",
+        "predicates": "biolink:affects",
+        "qualifier_constraints": [{
+            "qualifier_set": [{
+                "qualifier_type_id": "biolink:object_aspect_qualifier",
+                "qualifier_value": "activity_or_abundance"
+            }]
+        }]
+    }
+    ref = EdgeReference("e0", edge)
+    for qualifier_value in ["activity_or_abundance", "activity", "abundance"]:
+        assert f'`e0`.object_aspect_qualifier = "{qualifier_value}"' in ref.qualifier_filters
+
@@ -1,6 +1,9 @@
 """Test query arguments."""
+import copy
+
 import pytest
 from reasoner_transpiler.cypher import get_query
+from reasoner_transpiler.exceptions import UnsupportedError
 from .fixtures import fixture_db_driver
 
 
@@ -26,17 +29,10 @@ def test_skip_limit(db_driver):
     }
     dialect, driver = db_driver
     all_results = []
-    with pytest.raises(NotImplementedError):
-        output = driver.run(get_query(qgraph, dialect=dialect, limit=2), convert_to_trapi=True, qgraph=qgraph)
-    with pytest.raises(NotImplementedError):
-        output = driver.run(get_query(qgraph, dialect=dialect,  skip=2), convert_to_trapi=True, qgraph=qgraph)
-
-    """
-    the following should pass if skip and limit are implemented
-    output = neo4j_driver.run(get_query(qgraph, limit=2), convert_to_trapi=True, qgraph=qgraph)
+    output = driver.run(get_query(qgraph, dialect=dialect, limit=2), convert_to_trapi=True, qgraph=qgraph)
     all_results.extend(output["results"])
     assert len(output["results"]) == 2
-    output = neo4j_driver.run(get_query(qgraph, skip=2, limit=2), convert_to_trapi=True, qgraph=qgraph)
+    output = driver.run(get_query(qgraph, dialect=dialect, skip=2, limit=2), convert_to_trapi=True, qgraph=qgraph)
     all_results.extend(output["results"])
     assert len(output["results"]) == 1
     assert {
@@ -45,7 +41,46 @@ def test_skip_limit(db_driver):
         result["node_bindings"]["n1"][0]["id"]
         for result in all_results
     )
-    """
+    output = driver.run(get_query(qgraph, dialect=dialect, skip=3), convert_to_trapi=True, qgraph=qgraph)
+    assert output["results"] == []
+
+    # without the reasoner assembly, each row is a path of a result on the page
+    rows = driver.run(get_query(qgraph, dialect=dialect, reasoner=False, skip=1, limit=1))
+    assert len(rows) == 1
+    assert rows[0]["n1"]["id"] == sorted(result["node_bindings"]["n1"][0]["id"] for result in all_results)[1]
+
+
+def test_pagination_query():
+    """Test that pages are ordered by the node bindings of results, and that SKIP and LIMIT can be parameters."""
+    qgraph = {
+        "nodes": {
+            "n0": {"ids": ["MONDO:0005148"]},
+            "n1": {"categories": "biolink:ChemicalSubstance"},
+        },
+        "edges": {"e01": {"subject": "n1", "object": "n0", "predicates": "biolink:treats"}},
+    }
+    query = get_query(copy.deepcopy(qgraph), skip=10, limit=5)
+    assert "ORDER BY __page_key0, __page_key1 SKIP 10 LIMIT 5" in query
+    # the pinned node is bound to the queried id, not to its subclasses
+    assert "`n0_superclass`.id AS __page_key0, `n1`.id AS __page_key1" in query
+    # unless it has set_interpretation ALL, then it is bound to the matched node
+    all_qgraph = copy.deepcopy(qgraph)
+    all_qgraph["nodes"]["n0"]["set_interpretation"] = "ALL"
+    query = get_query(all_qgraph, skip=10, limit=5, max_results_per_node=2)
+    assert "`n0`.id AS __page_key0, `n1`.id AS __page_key1" in query
+    assert "`n0`.id AS __cap_key0, `n1`.id AS __cap_key1" in query
+    assert "_superclass`.id AS" not in query
+
+    query, parameters = get_query(copy.deepcopy(qgraph), skip=10, limit=5, parameterized=True)
+    other_query, other_parameters = get_query(copy.deepcopy(qgraph), skip=15, limit=5, parameterized=True)
+    assert query == other_query
+    assert 10 in parameters.values() and 15 in other_parameters.values()
+
+    for pagination in [{"skip": -1}, {"limit": "5"}]:
+        with pytest.raises(ValueError):
+            get_query(copy.deepcopy(qgraph), **pagination)
+    with pytest.raises(UnsupportedError):
+        get_query(copy.deepcopy(qgraph), limit=5, batch=True)
 
 
 def test_max_connectivity(db_driver):
@@ -84,6 +119,62 @@ def test_max_connectivity(db_driver):
         assert node["name"] == expected_nodes[ind]
 
 
+def test_max_results_per_node(db_driver):
+    """Test that max_results_per_node caps the results of a pinned node instead of dropping it."""
+    qgraph = {
+        "nodes": {
+            "n0": {"categories": "biolink:Disease"},
+            "n1": {"categories": "biolink:ChemicalSubstance", "ids": ["CHEBI:6801"]},
+        },
+        "edges": {"e01": {"predicates": "biolink:treats", "subject": "n1", "object": "n0"}},
+    }
+    dialect, driver = db_driver
+    output = driver.run(get_query(copy.deepcopy(qgraph), dialect=dialect, max_connectivity=1),
+                        convert_to_trapi=True, qgraph=qgraph)
+    assert output["results"] == []
+    capped_qgraph = copy.deepcopy(qgraph)
+    output = driver.run(get_query(capped_qgraph, dialect=dialect, max_results_per_node=1),
+                        convert_to_trapi=True, qgraph=capped_qgraph)
+    assert len(output["results"]) == 1
+
+
+def test_max_results_per_node_query():
+    """Test that results are capped for each pinned qnode, ordered by an edge property."""
+    qgraph = {
+        "nodes": {
+            "n0": {"ids": ["MONDO:0005148"]},
+            "n1": {"categories": "biolink:ChemicalSubstance"},
+            "n2": {"ids": ["NCBIGene:841"]},
+        },
+        "edges": {
+            "e01": {"subject": "n1", "object": "n0", "predicates": "biolink:treats"},
+            "e12": {"subject": "n1", "object": "n2"},
+        },
+    }
+    query = get_query(copy.deepcopy(qgraph), max_results_per_node=10, order_results_by="biolink:score")
+    # the pinned nodes are matched first, and the rest of the query is capped in a subquery for each of them
+    assert query.startswith("MATCH (`n0_superclass`:`biolink:NamedThing` {`id`: \"MONDO:0005148\"}) "
+                            "CALL {WITH `n0_superclass` MATCH (`n2_superclass`:")
+    assert "CALL {WITH `n0_superclass`, `n2_superclass` MATCH " in query
+    assert query.count(" LIMIT 10 UNWIND __cap_rows AS __cap_row RETURN ") == 2
+    assert "collect(__cap_rows)" not in query
+    assert "max(`e01`.`score`) AS __cap_score0 ORDER BY __cap_score0 IS NULL, __cap_score0 DESC, " \
+           "__cap_key0, __cap_key1, __cap_key2 LIMIT 10" in query
+    assert "max(`e12`.`score`) AS __cap_score0 ORDER BY __cap_score0 IS NULL, __cap_score0 DESC, " \
+           "__cap_key0, __cap_key1, __cap_key2 LIMIT 10" in query
+
+    # the property name is escaped
+    query = get_query(copy.deepcopy(qgraph), max_results_per_node=10, order_results_by="biolink:score` DESC")
+    assert "max(`e01`.`score`` DESC`) AS __cap_score0" in query
+
+    query, parameters = get_query(copy.deepcopy(qgraph), max_results_per_node=10, parameterized=True)
+    assert query == get_query(copy.deepcopy(qgraph), max_results_per_node=20, parameterized=True)[0]
+    assert 10 in parameters.values()
+
+    with pytest.raises(ValueError):
+        get_query(copy.deepcopy(qgraph), max_results_per_node=-1)
+
+
 def test_use_hints():
     """Test unusual curie formats."""
     qgraph = {
@@ -0,0 +1,108 @@
+"""Test the compiled query cache."""
+import copy
+
+import pytest
+
+from reasoner_transpiler.cypher import get_query
+from reasoner_transpiler.exceptions import UnsupportedError
+from reasoner_transpiler.query_cache import clear_query_cache, get_query_cache_info, set_query_cache_size, \
+    reset_query_cache_size
+
+QGRAPH = {
+    "nodes": {
+        "n0": {"categories": ["biolink:Disease"], "ids": ["MONDO:0005148"]},
+        "n1": {
+            "categories": ["biolink:ChemicalSubstance", "biolink:Drug"],
+            "constraints": [{"id": "biolink:chromosome", "value": "17", "operator": "==="}],
+        },
+    },
+    "edges": {
+        "e01": {
+            "subject": "n0",
+            "object": "n1",
+            "predicates": ["biolink:treated_by"],
+            "attribute_constraints": [{"id": "fda_approved", "value": True}],
+        },
+    },
+}
+
+
+@pytest.fixture(autouse=True)
+def empty_query_cache():
+    clear_query_cache()
+    yield
+    reset_query_cache_size()
+    clear_query_cache()
+
+
+def compile_uncached(qgraph, **kwargs):
+    """Compile a query with the cache disabled, returning the query, its parameters and the changed qgraph."""
+    set_query_cache_size(0)
+    query, parameters = get_query(qgraph, parameterized=True, **kwargs)
+    reset_query_cache_size()
+    return query, parameters, qgraph
+
+
+def test_same_shape_hit():
+    """Test that a query of a cached shape gives the same query, parameters and qgraph as compiling it."""
+    qgraph = copy.deepcopy(QGRAPH)
+    qgraph["nodes"]["n0"]["ids"] = ["MONDO:0004993"]
+    qgraph["nodes"]["n1"]["categories"] = ["biolink:SmallMolecule", "biolink:Drug", "biolink:Food"]
+    qgraph["nodes"]["n1"]["constraints"][0]["value"] = "13"
+    qgraph["edges"]["e01"]["attribute_constraints"][0]["value"] = False
+    expected_query, expected_parameters, expected_qgraph = compile_uncached(copy.deepcopy(qgraph),
+                                                                            max_connectivity=7)
+
+    get_query(copy.deepcopy(QGRAPH), parameterized=True, max_connectivity=5)
+    assert get_query_cache_info().misses == 1
+    query, parameters = get_query(qgraph, parameterized=True, max_connectivity=7)
+    assert get_query_cache_info().hits == 1
+    assert query == expected_query
+    assert parameters == expected_parameters
+    # the superclass node, subclass edge and inverted edge flag used to transform results
+    assert qgraph == expected_qgraph
+    assert qgraph["nodes"]["n0_superclass"]["ids"] == ["MONDO:0004993"]
+    assert qgraph["edges"]["e01"]["_cypher_inverted"]
+
+
+@pytest.mark.parametrize("change", [
+    lambda qgraph: qgraph["nodes"]["n0"].update(ids=["MONDO:0004993", "MONDO:0005148"]),
+    lambda qgraph: qgraph["nodes"]["n0"].update(categories=["biolink:Disease", "biolink:PhenotypicFeature"]),
+    lambda qgraph: qgraph["nodes"]["n1"]["constraints"][0].update(value=17),
+    lambda qgraph: qgraph["edges"]["e01"].update(predicates=["biolink:affects"]),
+    lambda qgraph: qgraph["nodes"].update(n2={}),
+])
+def test_different_shape_miss(change):
+    """Test that queries with a different shape are compiled again."""
+    qgraph = copy.deepcopy(QGRAPH)
+    change(qgraph)
+    expected_query, expected_parameters, _ = compile_uncached(copy.deepcopy(qgraph))
+    get_query(copy.deepcopy(QGRAPH), parameterized=True)
+    assert get_query(qgraph, parameterized=True) == (expected_query, expected_parameters)
+    assert get_query_cache_info().hits == 0
+    assert get_query_cache_info().misses == 2
+
+
+def test_unsupported_value_hit():
+    """Test that values are checked when the query comes from the cache."""
+    get_query(copy.deepcopy(QGRAPH), parameterized=True)
+    qgraph = copy.deepcopy(QGRAPH)
+    qgraph["nodes"]["n1"]["categories"] = ["biolink:SmallMolecule", {"not": "a category"}]
+    with pytest.raises(UnsupportedError):
+        get_query(qgraph, parameterized=True)
+
+
+def test_cache_size():
+    """Test that the least recently used shapes are evicted and that a size of 0 disables the cache."""
+    set_query_cache_size(2)
+    for predicate in ["biolink:treats", "biolink:affects", "biolink:treats", "biolink:interacts_with"]:
+        qgraph = copy.deepcopy(QGRAPH)
+        qgraph["edges"]["e01"]["predicates"] = [predicate]
+        get_query(qgraph, parameterized=True)
+    assert get_query_cache_info() == (1, 3, 2, 2)
+
+    set_query_cache_size(0)
+    assert get_query_cache_info().size == 0
+    get_query(copy.deepcopy(QGRAPH), parameterized=True)
+    get_query(copy.deepcopy(QGRAPH), parameterized=True)
+    assert get_query_cache_info() == (1, 3, 0, 0)
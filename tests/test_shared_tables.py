@@ -0,0 +1,108 @@
+"""Test biolink model tables shared between processes."""
+import multiprocessing
+import os
+from pathlib import Path
+
+import pytest
+
+from reasoner_transpiler.biolink import load_biolink_model
+from reasoner_transpiler.shared_tables import open_shared_tables, write_shared_tables
+
+SMAPS_ROLLUP = Path("/proc/self/smaps_rollup")
+NUM_WORKERS = 4
+
+
+def test_shared_table_round_trip(tmp_path):
+    """Test that a shared table behaves like the read-only dict it was written from."""
+    tables = {
+        "numbers": {"one": 1, "two": [2, "two"], "none": None, "ünïcode": {"nested": True}},
+        "empty": {},
+    }
+    write_shared_tables(tmp_path / "tables.bin", tables)
+    shared_tables = open_shared_tables(tmp_path / "tables.bin", {"numbers": lambda value: ("decoded", value)})
+    assert list(shared_tables["numbers"]) == list(tables["numbers"])
+    assert shared_tables["numbers"]["two"] == ("decoded", [2, "two"])
+    assert shared_tables["numbers"].get("three") is None
+    assert 2 not in shared_tables["numbers"]
+    assert dict(shared_tables["empty"]) == {}
+    with pytest.raises(TypeError):
+        shared_tables["numbers"]["three"] = 3
+
+
+def test_shared_table_cached_values(tmp_path):
+    """Test that a cached shared table decodes each value once."""
+    decoded = []
+
+    def decode(value):
+        decoded.append(value)
+        return value
+
+    write_shared_tables(tmp_path / "tables.bin", {"cached": {"one": [1]}, "uncached": {"one": [1]}})
+    shared_tables = open_shared_tables(tmp_path / "tables.bin", {"cached": decode, "uncached": decode},
+                                       cached_tables=("cached",))
+    assert shared_tables["cached"]["one"] is shared_tables["cached"]["one"]
+    assert len(decoded) == 1
+    assert shared_tables["uncached"]["one"] is not shared_tables["uncached"]["one"]
+    assert len(decoded) == 3
+    assert shared_tables["cached"].get("two") is None
+
+
+def test_shared_biolink_model(tmp_path):
+    """Test that a biolink model backed by shared tables gives the same answers as one backed by dicts."""
+    biolink = load_biolink_model(shared_tables=False)
+    shared_biolink = load_biolink_model(shared_tables=True, shared_tables_dir=tmp_path)
+    assert shared_biolink.version == biolink.version
+    assert shared_biolink.qualifiers == biolink.qualifiers
+    assert dict(shared_biolink.get_predicate_expansions()) == dict(biolink.get_predicate_expansions())
+    for predicate in ["biolink:affects", "biolink:related_to", "biolink:Treats", "biolink:not_a_predicate"]:
+        assert shared_biolink.expand_predicate(predicate) == biolink.expand_predicate(predicate)
+    predicates_in_graph = frozenset(["treats", "affects"])
+    assert shared_biolink.expand_predicate("biolink:related_to", predicates_in_graph) == \
+        biolink.expand_predicate("biolink:related_to", predicates_in_graph)
+    assert shared_biolink.get_qualifier_value_enums("activity_or_abundance") == \
+        biolink.get_qualifier_value_enums("activity_or_abundance")
+    assert dict(shared_biolink.attribute_types["publications"]) == dict(biolink.attribute_types["publications"])
+    assert shared_biolink.get_element("gene") == biolink.get_element("gene")
+
+    # the tables file is reused rather than rewritten
+    tables_files = list(tmp_path.iterdir())
+    assert len(tables_files) == 1
+    modified = tables_files[0].stat().st_mtime_ns
+    load_biolink_model(shared_tables=True, shared_tables_dir=tmp_path)
+    assert tables_files[0].stat().st_mtime_ns == modified
+
+
+def private_memory_kb():
+    """Get the memory only this process uses, in kB."""
+    private = 0
+    for line in SMAPS_ROLLUP.read_text().splitlines():
+        if line.startswith(("Private_Clean:", "Private_Dirty:")):
+            private += int(line.split()[1])
+    return private
+
+
+def touch_biolink_model(args):
+    """Load the biolink model in a forked worker, read every table and report the private memory it took."""
+    shared_tables, shared_tables_dir = args
+    before = private_memory_kb()
+    biolink = load_biolink_model(shared_tables=shared_tables, shared_tables_dir=shared_tables_dir)
+    for table in [biolink._predicates, biolink._enums, biolink._elements, biolink._element_names,
+                  biolink._qualifier_value_index, biolink.attribute_types, biolink.get_predicate_expansions()]:
+        for key in table:
+            table[key]
+    return private_memory_kb() - before
+
+
+@pytest.mark.skipif(not SMAPS_ROLLUP.exists() or "fork" not in multiprocessing.get_all_start_methods(),
+                    reason="needs /proc/self/smaps_rollup and fork")
+def test_shared_tables_worker_memory(tmp_path):
+    """Test that forked workers using shared tables take less private memory than workers with their own dicts."""
+    # write the tables file up front, like a server warming up before forking its workers
+    load_biolink_model(shared_tables=True, shared_tables_dir=tmp_path)
+    context = multiprocessing.get_context("fork")
+    with context.Pool(NUM_WORKERS) as pool:
+        dict_memory = pool.map(touch_biolink_model, [(False, tmp_path)] * NUM_WORKERS)
+    with context.Pool(NUM_WORKERS) as pool:
+        shared_memory = pool.map(touch_biolink_model, [(True, tmp_path)] * NUM_WORKERS)
+    print(f"\nprivate memory per worker (kB): dict tables {dict_memory}, shared tables {shared_memory}")
+    assert sum(shared_memory) < sum(dict_memory)
@@ -0,0 +1,66 @@
+"""Test streaming a row for each path instead of one collected record."""
+import copy
+
+import pytest
+
+from reasoner_transpiler.cypher import compile_query, get_query, transform_result, transform_result_stream
+from reasoner_transpiler.exceptions import UnsupportedError
+from .fixtures import fixture_db_driver
+from .test_compiled_query import QGRAPH, BoltNode, make_record
+
+
+def make_rows():
+    """Rows for each path of make_record, with a second chemical treating the subclass of MONDO:0000001."""
+    record = make_record()
+    disease, subclass, chemical = record["nodes"]
+    edge, subclass_edge = record["edges"]
+    other_chemical = BoltNode(["biolink:ChemicalEntity"], id="CHEBI:2", name="other chemical")
+    other_edge = ["element_3", "CHEBI:2", "biolink:treats", "MONDO:0000002", {"primary_knowledge_source": "infores:b"}]
+    return [
+        {"nodes": [subclass, chemical, disease], "edges": [edge, subclass_edge], "paths": record["paths"]},
+        {"nodes": [subclass, other_chemical, disease], "edges": [other_edge, subclass_edge],
+         "paths": [["MONDO:0000002", "CHEBI:2", "MONDO:0000001", "element_3", ["element_2"]]]},
+    ]
+
+
+def test_stream_query():
+    """Test that streamed queries return a row for each path."""
+    query = get_query(copy.deepcopy(QGRAPH), stream=True)
+    assert "collect(" not in query
+    assert query.endswith("ELSE [] END ]] AS paths")
+    with pytest.raises(UnsupportedError):
+        get_query(copy.deepcopy(QGRAPH), stream=True, batch=True)
+
+
+def test_transform_result_stream():
+    """Test that streamed rows are transformed like the record collecting them."""
+    rows = make_rows()
+    collected_record = {
+        "nodes": [node for row in rows for node in row["nodes"]],
+        "edges": [edge for row in rows for edge in row["edges"]],
+        "paths": [path for row in rows for path in row["paths"]],
+    }
+    compiled_query = compile_query(QGRAPH, stream=True)
+    expected = transform_result(collected_record, compiled_query)
+    assert transform_result_stream(iter(rows), compiled_query) == expected
+    assert len(expected["results"]) == 2
+    assert len(expected["knowledge_graph"]["nodes"]) == 4
+
+
+def test_stream_results(db_driver):
+    """Test that streamed queries give the same results as collected queries."""
+    dialect, driver = db_driver
+    qgraph = {
+        "nodes": {
+            "n0": {"categories": "biolink:Disease", "ids": ["MONDO:0005148"]},
+            "n1": {"categories": "biolink:ChemicalSubstance"},
+        },
+        "edges": {"e01": {"subject": "n1", "object": "n0", "predicates": "biolink:treats"}},
+    }
+    compiled_query = compile_query(qgraph, dialect=dialect)
+    expected = transform_result(driver.run(compiled_query.query)[0], compiled_query)
+    streamed_query = compile_query(qgraph, dialect=dialect, stream=True)
+    output = transform_result_stream(driver.run(streamed_query.query), streamed_query)
+    assert output["results"]
+    assert sorted(output["results"], key=str) == sorted(expected["results"], key=str)
+    assert output["knowledge_graph"] == expected["knowledge_graph"]
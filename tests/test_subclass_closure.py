@@ -0,0 +1,96 @@
+"""Test subclass expansion from the materialized subclass closure."""
+import copy
+import json
+import os
+
+import pytest
+
+from reasoner_transpiler.attributes import transform_attributes
+from reasoner_transpiler.cypher import get_query
+from reasoner_transpiler.subclass_closure import DESCENDANT_COUNTS_PROPERTY, DESCENDANTS_PROPERTY, \
+    build_subclass_closure, load_edges, main
+from .fixtures import fixture_db_driver
+
+TESTS_DIR = os.path.dirname(__file__)
+
+QGRAPH = {
+    "nodes": {
+        "n0": {"ids": ["MONDO:0000001"]},
+        "n1": {},
+    },
+    "edges": {
+        "e01": {
+            "subject": "n0",
+            "object": "n1",
+        },
+    },
+}
+
+
+def test_build_subclass_closure():
+    """Test that descendants are ordered by their shortest depth, and the test graph formats agree."""
+    closure = build_subclass_closure(load_edges(os.path.join(TESTS_DIR, "neo4j", "neo4j_csv", "edges.csv")))
+    assert closure["MONDO:0000000"] == {
+        DESCENDANTS_PROPERTY: ["MONDO:0000001", "MONDO:0005148", "MONDO:0015967", "MONDO:0014488"],
+        DESCENDANT_COUNTS_PROPERTY: [1, 3, 4],
+    }
+    assert "MONDO:0014488" not in closure
+    assert closure == build_subclass_closure(
+        load_edges(os.path.join(TESTS_DIR, "memgraph", "memgraph_json", "edges.json")))
+
+    edges = [("b", "biolink:subclass_of", "a"), ("c", "biolink:subclass_of", "b"), ("a", "biolink:superclass_of", "d"),
+             ("d", "biolink:subclass_of", "c"), ("a", "biolink:treats", "e")]
+    assert build_subclass_closure(edges)["a"] == {DESCENDANTS_PROPERTY: ["b", "c", "d"],
+                                                  DESCENDANT_COUNTS_PROPERTY: [1, 2, 3]}
+    assert build_subclass_closure(edges, max_depth=1)["a"] == {DESCENDANTS_PROPERTY: ["b"],
+                                                               DESCENDANT_COUNTS_PROPERTY: [1]}
+    # like the variable length subclass_of edge, superclass_of edges are not followed
+    edges.append(("e", "biolink:superclass_of", "f"))
+    assert "e" not in build_subclass_closure(edges)
+
+
+def test_subclass_closure_query():
+    """Test that subclasses are matched by id from the closure instead of a variable length traversal."""
+    query = get_query(copy.deepcopy(QGRAPH), subclass_closure=True, subclass_depth=2)
+    assert "`biolink:subclass_of`*0.." not in query
+    assert f"`n0`.id IN [`n0_superclass`.id] + coalesce(`n0_superclass`.{DESCENDANTS_PROPERTY}" \
+           f"[..`n0_superclass`.{DESCENDANT_COUNTS_PROPERTY}[1]]" in query
+    assert "OPTIONAL MATCH (`n0`)-[`n0_subclass_edge`:`biolink:subclass_of`*1..1]->(`n0_superclass`)" in query
+    query = get_query(copy.deepcopy(QGRAPH), subclass_closure=True, subclass_depth=0)
+    assert "`n0`.id IN [`n0_superclass`.id] + []" in query
+    # without the option, or with explicit hierarchy qedges, subclass expansion is the same
+    assert get_query(copy.deepcopy(QGRAPH)) == get_query(copy.deepcopy(QGRAPH), subclass_closure=False)
+    qgraph = copy.deepcopy(QGRAPH)
+    qgraph["edges"]["e01"]["predicates"] = ["biolink:subclass_of"]
+    assert get_query(copy.deepcopy(qgraph)) == get_query(copy.deepcopy(qgraph), subclass_closure=True)
+
+
+def test_subclass_closure_cli(tmp_path):
+    """Test writing the closure of an edges file."""
+    output_path = tmp_path / "closure.json"
+    main([os.path.join(TESTS_DIR, "neo4j", "neo4j_csv", "edges.csv"), "--max-depth", "1", "-o", str(output_path)])
+    rows = {row["id"]: row for row in json.loads(output_path.read_text())}
+    assert rows["MONDO:0000000"][DESCENDANTS_PROPERTY] == ["MONDO:0000001"]
+
+
+@pytest.mark.parametrize("subclass_depth", [1, 2])
+def test_subclass_closure_results(db_driver, subclass_depth):
+    """Test that the closure gives the same TRAPI results and auxiliary graphs as the traversal."""
+    dialect, driver = db_driver
+    outputs = []
+    for subclass_closure in (False, True):
+        qgraph = copy.deepcopy(QGRAPH)
+        qgraph["nodes"]["n0"]["ids"] = ["MONDO:0000000"]
+        query = get_query(qgraph, dialect=dialect, subclass_depth=subclass_depth, subclass_closure=subclass_closure)
+        outputs.append(driver.run(query, convert_to_trapi=True, qgraph=qgraph))
+    assert outputs[1]["results"]
+    assert sorted(outputs[1]["results"], key=str) == sorted(outputs[0]["results"], key=str)
+    assert outputs[1]["auxiliary_graphs"] == outputs[0]["auxiliary_graphs"]
+    assert outputs[1]["knowledge_graph"] == outputs[0]["knowledge_graph"]
+
+
+def test_closure_properties_not_attributes():
+    """Test that the closure properties of nodes are not returned as TRAPI attributes."""
+    attributes = transform_attributes({"chromosome": "1", DESCENDANTS_PROPERTY: ["MONDO:0000001"],
+                                       DESCENDANT_COUNTS_PROPERTY: [1]}, node=True)["attributes"]
+    assert [attribute["original_attribute_name"] for attribute in attributes] == ["chromosome"]